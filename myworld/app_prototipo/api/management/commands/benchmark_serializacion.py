@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializacion_rapida import PlanValores
+from api.serializers import MaquinaListSerializer, AlertaMaquinaSerializer, ConsultaIASerializer
+from ia_assistant.models import ConsultaIA
+from maquinaria.models import Maquina, AlertaMaquina
+
+
+class Command(BaseCommand):
+    help = 'Compara la serialización de DRF con la serialización desde .values() de las listas de la API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=20)
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/'))
+        contexto = {'request': request}
+        casos = [
+            ('/api/maquinas/', MaquinaListSerializer,
+             Maquina.objects.select_related('categoria').order_by('codigo_inventario')),
+            ('/api/alertas/', AlertaMaquinaSerializer,
+             AlertaMaquina.objects.select_related('maquina__categoria').order_by('-fecha_creacion')),
+            ('/api/consultas-ia/', ConsultaIASerializer,
+             ConsultaIA.objects.select_related('usuario__tipo_usuario', 'maquina__categoria').order_by('-fecha_consulta')),
+        ]
+        renderer = JSONRenderer()
+        repeticiones = options['repeticiones']
+
+        for nombre, serializer_class, queryset in casos:
+            def drf():
+                return renderer.render(serializer_class(queryset.all(), many=True, context=contexto).data)
+
+            def rapido():
+                plan = PlanValores(serializer_class(context=contexto))
+                return renderer.render(plan.representar_filas(queryset.values(*plan.columnas)))
+
+            identicos = drf() == rapido()
+            tiempo_drf = self._medir(drf, repeticiones)
+            tiempo_rapido = self._medir(rapido, repeticiones)
+            filas = queryset.count()
+
+            self.stdout.write(
+                f'{nombre}: {filas} filas, DRF {tiempo_drf * 1000:.2f} ms, '
+                f'values() {tiempo_rapido * 1000:.2f} ms, '
+                f'{tiempo_drf / tiempo_rapido if tiempo_rapido else 0:.1f}x, '
+                f'JSON idéntico: {"sí" if identicos else "NO"}'
+            )
+            if not identicos:
+                self.stdout.write(self.style.ERROR(f'{nombre}: las respuestas difieren'))
+
+    @staticmethod
+    def _medir(funcion, repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        return (time.perf_counter() - inicio) / repeticiones
@@ -0,0 +1,43 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from components.paginacion import contar_aproximado
+
+
+class CursorConConteoPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) en tiempo constante.
+    Con ?total=aprox se agrega 'count' con un conteo aproximado cacheado.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.total = None
+        if request.query_params.get('total') == 'aprox':
+            self.total = contar_aproximado(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        respuesta = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.total is not None:
+            respuesta = {'count': self.total, **respuesta}
+        return Response(respuesta)
+
+
+class MaquinaPagination(CursorConConteoPagination):
+    ordering = ('codigo_inventario', 'id')
+
+
+class AlertaPagination(CursorConConteoPagination):
+    ordering = ('-fecha_creacion', '-id')
+
+
+class HistorialPagination(CursorConConteoPagination):
+    page_size = 20
+    ordering = ('-fecha_evento', '-id')
@@ -0,0 +1,185 @@
+"""
+Serialización de listas a partir de filas .values().
+
+PlanValores recorre los campos de un serializer de DRF y deduce qué columnas
+leer y cómo convertir cada una, sin instanciar modelos ni llamar a
+get_*_display() por fila. La salida es la misma que la del serializer:
+mismas claves, mismo orden y los mismos to_representation() para fechas,
+decimales, UUID y archivos.
+"""
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from usuarios.models import Usuario
+
+# Propiedades de modelo que se pueden calcular desde columnas: {(modelo, propiedad): columnas}
+PROPIEDADES_CALCULABLES = {
+    (Usuario, 'nombre_completo'): ('nombres', 'apellidos'),
+}
+
+# Combinaciones (campo de DRF, tipo de columna) cuya representación es el
+# mismo valor que devuelve la base
+TIPOS_TEXTO = {'CharField', 'TextField', 'SlugField', 'EmailField', 'URLField'}
+TIPOS_ENTEROS = {
+    'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField',
+    'BigIntegerField', 'SmallIntegerField', 'PositiveIntegerField',
+    'PositiveBigIntegerField', 'PositiveSmallIntegerField',
+}
+CAMPOS_IDENTIDAD = (
+    (serializers.ChoiceField, TIPOS_TEXTO | TIPOS_ENTEROS),
+    (serializers.CharField, TIPOS_TEXTO),
+    (serializers.IntegerField, TIPOS_ENTEROS),
+    (serializers.BooleanField, {'BooleanField'}),
+    (serializers.JSONField, {'JSONField'}),
+)
+
+# Tipos de nodo del plan
+COLUMNA, ANIDADO = 'columna', 'anidado'
+
+
+class SerializacionNoSoportada(Exception):
+    """El serializer usa campos que no se pueden leer de .values()"""
+
+
+def _sin_conversion(valor):
+    return valor
+
+
+class PlanValores:
+    def __init__(self, serializer):
+        self.columnas = []
+        self.nodos = self._planear(serializer, serializer.Meta.model, '')
+
+    def _columna(self, nombre):
+        if nombre not in self.columnas:
+            self.columnas.append(nombre)
+        return nombre
+
+    def _planear(self, serializer, modelo, prefijo):
+        nodos = []
+        for nombre, campo in serializer.fields.items():
+            if campo.write_only:
+                continue
+            if isinstance(campo, serializers.ListSerializer) or campo.source == '*':
+                raise SerializacionNoSoportada(nombre)
+
+            if isinstance(campo, serializers.BaseSerializer):
+                relacion = self._campo_modelo(modelo, campo.source)
+                relacionado = relacion.related_model
+                sub_prefijo = f'{prefijo}{campo.source}__'
+                presencia = self._columna(f'{sub_prefijo}{relacionado._meta.pk.name}')
+                nodos.append((ANIDADO, nombre, presencia, self._planear(campo, relacionado, sub_prefijo)))
+                continue
+
+            # Relaciones intermedias de un source con puntos ('categoria.nombre')
+            partes = campo.source.split('.')
+            ruta = prefijo
+            presencias = []
+            actual = modelo
+            for parte in partes[:-1]:
+                relacion = self._campo_modelo(actual, parte)
+                if not relacion.is_relation:
+                    raise SerializacionNoSoportada(nombre)
+                actual = relacion.related_model
+                ruta = f'{ruta}{parte}__'
+                presencias.append(self._columna(f'{ruta}{actual._meta.pk.name}'))
+
+            columnas, obtener, convertir = self._leer_atributo(actual, partes[-1], ruta, campo)
+            nodos.append((COLUMNA, nombre, presencias, columnas, obtener, convertir))
+        return nodos
+
+    def _leer_atributo(self, modelo, atributo, ruta, campo):
+        """
+        Devuelve (columnas, obtener, convertir): obtener calcula el atributo a
+        partir de varias columnas (None si es una sola) y convertir lo representa.
+        """
+        if atributo.startswith('get_') and atributo.endswith('_display'):
+            campo_modelo = self._campo_modelo(modelo, atributo[len('get_'):-len('_display')])
+            etiquetas = {clave: str(etiqueta) for clave, etiqueta in campo_modelo.flatchoices}
+            return [self._columna(ruta + campo_modelo.attname)], None, lambda valor: etiquetas.get(valor, str(valor))
+
+        if (modelo, atributo) in PROPIEDADES_CALCULABLES:
+            nombres = PROPIEDADES_CALCULABLES[(modelo, atributo)]
+            propiedad = getattr(modelo, atributo).fget
+            columnas = [self._columna(ruta + nombre) for nombre in nombres]
+            obtener = lambda *valores: propiedad(SimpleNamespace(**dict(zip(nombres, valores))))
+            return columnas, obtener, campo.to_representation
+
+        campo_modelo = self._campo_modelo(modelo, atributo)
+        if campo_modelo.is_relation or not campo_modelo.concrete:
+            raise SerializacionNoSoportada(atributo)
+        columna = [self._columna(ruta + campo_modelo.attname)]
+
+        if isinstance(campo, serializers.FileField):
+            return columna, None, lambda nombre: campo.to_representation(
+                campo_modelo.attr_class(None, campo_modelo, nombre)
+            )
+        tipo = campo_modelo.get_internal_type()
+        for clase, tipos in CAMPOS_IDENTIDAD:
+            if isinstance(campo, clase):
+                if tipo in tipos:
+                    return columna, None, _sin_conversion
+                break
+        return columna, None, campo.to_representation
+
+    @staticmethod
+    def _campo_modelo(modelo, nombre):
+        try:
+            return modelo._meta.get_field(nombre)
+        except FieldDoesNotExist:
+            raise SerializacionNoSoportada(nombre)
+
+    def representar(self, fila, nodos=None):
+        datos = {}
+        for nodo in self.nodos if nodos is None else nodos:
+            if nodo[0] == ANIDADO:
+                _, nombre, presencia, hijos = nodo
+                datos[nombre] = None if fila[presencia] is None else self.representar(fila, hijos)
+                continue
+
+            _, nombre, presencias, columnas, obtener, convertir = nodo
+            # Como en DRF, un source que atraviesa una relación nula omite la clave
+            if any(fila[presencia] is None for presencia in presencias):
+                continue
+            if obtener is None:
+                valor = fila[columnas[0]]
+            else:
+                valor = obtener(*(fila[columna] for columna in columnas))
+            datos[nombre] = None if valor is None else convertir(valor)
+        return datos
+
+    def representar_filas(self, filas):
+        return [self.representar(fila) for fila in filas]
+
+
+class ListaRapidaMixin:
+    """
+    Mixin para viewsets: list() serializa desde .values() cuando
+    API_SERIALIZACION_RAPIDA está activo y el serializer lo permite;
+    en otro caso usa el camino normal de DRF.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, 'API_SERIALIZACION_RAPIDA', True):
+            return super().list(request, *args, **kwargs)
+        try:
+            plan = PlanValores(self.get_serializer())
+        except SerializacionNoSoportada:
+            return super().list(request, *args, **kwargs)
+
+        # La paginación por cursor lee su posición de las columnas de orden
+        columnas = list(plan.columnas)
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        for campo in [ordering] if isinstance(ordering, str) else ordering:
+            if campo.lstrip('-') not in columnas:
+                columnas.append(campo.lstrip('-'))
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*columnas)
+        pagina = self.paginate_queryset(queryset)
+        if pagina is not None:
+            return self.get_paginated_response(plan.representar_filas(pagina))
+        return Response(plan.representar_filas(queryset))
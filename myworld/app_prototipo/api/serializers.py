@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # Import models
 from maquinaria.models import Maquina, CategoriaMaquina, Proveedor, AlertaMaquina, HistorialMaquina
@@ -9,6 +10,47 @@ from documentos.models import Documento, TipoDocumento, CategoriaDocumento
 from reportes.models import Reporte, TipoReporte, MetricasRendimiento
 
 
+class CamposDinamicosMixin:
+    """
+    Permite elegir los campos de un serializer (campos) y agregar objetos
+    anidados declarados en campos_expandibles (expandir). columnas_requeridas()
+    indica qué columnas debe cargar el queryset para esos campos.
+    """
+    campos_expandibles = {}
+    # Columnas del modelo que usa cada campo cuando no se deducen de su source
+    columnas_por_campo = {}
+
+    def __init__(self, *args, campos=None, expandir=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        for nombre in expandir or []:
+            if nombre in self.campos_expandibles:
+                self.fields[nombre] = self.campos_expandibles[nombre](read_only=True)
+        if campos:
+            permitidos = set(campos) | {'id'} | set(expandir or [])
+            for nombre in list(self.fields):
+                if nombre not in permitidos:
+                    self.fields.pop(nombre)
+
+    def columnas_requeridas(self):
+        """Devuelve (columnas para only(), relaciones para select_related())"""
+        columnas = {'id'}
+        relaciones = set()
+        for nombre, campo in self.fields.items():
+            if nombre in self.columnas_por_campo:
+                rutas = self.columnas_por_campo[nombre]
+            elif isinstance(campo, serializers.BaseSerializer):
+                rutas = [f'{campo.source}__{sub}' for sub in campo.fields]
+            elif campo.source.startswith('get_') and campo.source.endswith('_display'):
+                rutas = [campo.source[len('get_'):-len('_display')]]
+            else:
+                rutas = [campo.source.replace('.', '__')]
+            for ruta in rutas:
+                columnas.add(ruta)
+                if '__' in ruta:
+                    relaciones.add(ruta.rsplit('__', 1)[0])
+        return sorted(columnas), sorted(relaciones)
+
+
 class CategoriaMaquinaSerializer(serializers.ModelSerializer):
     class Meta:
         model = CategoriaMaquina
@@ -25,12 +67,14 @@ class ProveedorSerializer(serializers.ModelSerializer):
         ]
 
 
-class MaquinaSerializer(serializers.ModelSerializer):
+class MaquinaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     categoria = CategoriaMaquinaSerializer(read_only=True)
     proveedor = ProveedorSerializer(read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
     condicion_display = serializers.CharField(source='get_condicion_display', read_only=True)
-    necesita_mantenimiento = serializers.BooleanField(read_only=True)
+    necesita_mantenimiento = serializers.SerializerMethodField()
+
+    columnas_por_campo = {'necesita_mantenimiento': ['proximo_mantenimiento']}
 
     class Meta:
         model = Maquina
@@ -45,12 +89,25 @@ class MaquinaSerializer(serializers.ModelSerializer):
             'necesita_mantenimiento', 'imagen', 'observaciones', 'created_at'
         ]
 
+    def get_necesita_mantenimiento(self, obj):
+        # Misma regla que Maquina.necesita_mantenimiento con la fecha calculada una vez
+        if not obj.proximo_mantenimiento:
+            return False
+        if '_hoy' not in self.context:
+            self.context['_hoy'] = timezone.now().date()
+        return obj.proximo_mantenimiento <= self.context['_hoy']
 
-class MaquinaListSerializer(serializers.ModelSerializer):
+
+class MaquinaListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer simplificado para listas"""
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
 
+    campos_expandibles = {
+        'categoria': CategoriaMaquinaSerializer,
+        'proveedor': ProveedorSerializer,
+    }
+
     class Meta:
         model = Maquina
         fields = [
@@ -70,8 +127,9 @@ class AlertaMaquinaSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'maquina', 'tipo', 'tipo_display', 'prioridad', 'prioridad_display',
             'titulo', 'descripcion', 'estado', 'estado_display', 'fecha_creacion',
-            'fecha_resolucion', 'notas_resolucion'
+            'fecha_resolucion', 'notas_resolucion', 'ocurrencias', 'ultima_ocurrencia'
         ]
+        read_only_fields = ['ocurrencias', 'ultima_ocurrencia']
 
 
 class HistorialMaquinaSerializer(serializers.ModelSerializer):
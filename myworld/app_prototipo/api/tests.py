@@ -0,0 +1,244 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.serializacion_rapida import PlanValores
+from ia_assistant.models import ConsultaIA
+from maquinaria.alertas import calcular_huella, registrar_alerta
+from maquinaria.models import AlertaMaquina, CategoriaMaquina, Maquina, Proveedor
+from maquinaria.tests import crear_maquina
+from usuarios.middleware import cache_usuarios
+from usuarios.models import TipoUsuario
+from usuarios.tests import crear_usuario
+
+CACHE_LOCAL = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ClienteAPITestCase(TestCase):
+    def setUp(self):
+        # En TestCase on_commit no se ejecuta: sin limpiar, el cache versionado
+        # conservaría las respuestas de otras pruebas
+        cache.clear()
+        cache_usuarios.limpiar()
+        self.categoria = CategoriaMaquina.objects.create(nombre='Tornos')
+        self.user = User.objects.create_user('api', password='clave-segura')
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user)
+
+
+class InvalidacionCacheTests(ClienteAPITestCase):
+    def test_cambio_en_categoria_invalida_el_listado(self):
+        crear_maquina(self.categoria, 1)
+        respuesta = self.cliente.get('/api/maquinas/')
+        self.assertEqual(respuesta.data['results'][0]['categoria_nombre'], 'Tornos')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.categoria.nombre = 'Tornos CNC'
+            self.categoria.save()
+
+        respuesta = self.cliente.get('/api/maquinas/')
+        self.assertEqual(respuesta.data['results'][0]['categoria_nombre'], 'Tornos CNC')
+
+    def test_cambio_en_proveedor_invalida_el_detalle(self):
+        proveedor = Proveedor.objects.create(
+            nombre='Industrias A', nit='900000001', contacto_nombre='Contacto', contacto_telefono='3000000000',
+            contacto_email='contacto@industrias.co', direccion='Calle 1', ciudad='Medellín',
+        )
+        maquina = crear_maquina(self.categoria, 1, proveedor=proveedor)
+        self.assertEqual(self.cliente.get(f'/api/maquinas/{maquina.pk}/').data['proveedor']['nombre'], 'Industrias A')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            proveedor.nombre = 'Industrias B'
+            proveedor.save()
+
+        self.assertEqual(self.cliente.get(f'/api/maquinas/{maquina.pk}/').data['proveedor']['nombre'], 'Industrias B')
+
+
+class ConsultasIATests(ClienteAPITestCase):
+    def setUp(self):
+        super().setUp()
+        tipo = TipoUsuario.objects.create(nombre='instructor')
+        self.propio = crear_usuario(tipo, user=self.user)
+        otro = crear_usuario(tipo, numero_documento='999', email='otro@sena.edu.co')
+        for usuario, titulo in ((self.propio, 'Propia'), (otro, 'Ajena')):
+            ConsultaIA.objects.create(usuario=usuario, titulo=titulo, consulta_texto='-')
+
+    def test_lista_solo_las_consultas_propias(self):
+        respuesta = self.cliente.get('/api/consultas-ia/')
+        self.assertEqual([fila['titulo'] for fila in respuesta.data['results']], ['Propia'])
+
+    def test_usuario_sin_perfil_no_ve_consultas(self):
+        self.cliente.force_authenticate(User.objects.create_user('sin-perfil'))
+        respuesta = self.cliente.get('/api/consultas-ia/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['results'], [])
+
+
+class PaginacionCursorTests(ClienteAPITestCase):
+    def recorrer(self, url, campo='codigo_inventario', **parametros):
+        """Recorre todas las páginas siguiendo `next` y devuelve `campo` de cada fila"""
+        valores = []
+        respuesta = self.cliente.get(url, parametros)
+        while True:
+            self.assertEqual(respuesta.status_code, 200)
+            valores.extend(fila[campo] for fila in respuesta.data['results'])
+            if not respuesta.data['next']:
+                return valores
+            respuesta = self.cliente.get(respuesta.data['next'])
+
+    def test_recorre_todo_sin_repetir(self):
+        for numero in range(1, 8):
+            crear_maquina(self.categoria, numero)
+        codigos = [f'MAQ-{n:03d}' for n in range(1, 8)]
+
+        # Una sola página exacta y última página incompleta
+        self.assertEqual(self.recorrer('/api/maquinas/', page_size=7), codigos)
+        self.assertEqual(self.recorrer('/api/maquinas/', page_size=2), codigos)
+        with self.captureOnCommitCallbacks(execute=True):
+            Maquina.objects.get(codigo_inventario='MAQ-007').delete()
+        # Páginas exactas después de borrar
+        self.assertEqual(self.recorrer('/api/maquinas/', page_size=3), codigos[:6])
+
+    def test_no_se_desplaza_con_inserciones(self):
+        for numero in (2, 4, 6, 8):
+            crear_maquina(self.categoria, numero)
+        primera = self.cliente.get('/api/maquinas/', {'page_size': 2})
+        self.assertEqual([fila['codigo_inventario'] for fila in primera.data['results']], ['MAQ-002', 'MAQ-004'])
+
+        # Una fila nueva antes del cursor no repite ni salta filas
+        crear_maquina(self.categoria, 1)
+        segunda = self.cliente.get(primera.data['next'])
+        self.assertEqual([fila['codigo_inventario'] for fila in segunda.data['results']], ['MAQ-006', 'MAQ-008'])
+        self.assertIsNone(segunda.data['next'])
+
+    def test_fechas_iguales(self):
+        maquina = crear_maquina(self.categoria, 1)
+        alertas = [
+            AlertaMaquina.objects.create(maquina=maquina, tipo='inspeccion', titulo=f'Alerta {n}', descripcion='-')
+            for n in range(5)
+        ]
+        AlertaMaquina.objects.update(fecha_creacion=timezone.now())
+
+        self.assertEqual(self.recorrer('/api/alertas/', 'id', page_size=2),
+                         sorted((alerta.pk for alerta in alertas), reverse=True))
+
+    def test_conteo_aproximado_opcional(self):
+        crear_maquina(self.categoria, 1)
+        self.assertNotIn('count', self.cliente.get('/api/maquinas/').data)
+        self.assertEqual(self.cliente.get('/api/maquinas/', {'total': 'aprox'}).data['count'], 1)
+
+
+class CamposMaquinaTests(ClienteAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.maquina = crear_maquina(self.categoria, 1, especificaciones_tecnicas='Husillo de 50 mm')
+
+    def test_listado_usa_el_serializer_simplificado(self):
+        for rapida in (True, False):
+            with self.subTest(rapida=rapida), override_settings(API_SERIALIZACION_RAPIDA=rapida):
+                cache.clear()
+                with CaptureQueriesContext(connection) as consultas:
+                    fila = self.cliente.get('/api/maquinas/').data['results'][0]
+                self.assertEqual(fila['categoria_nombre'], 'Tornos')
+                self.assertNotIn('categoria', fila)
+                self.assertNotIn('especificaciones_tecnicas', fila)
+                self.assertFalse(any('especificaciones_tecnicas' in consulta['sql'] for consulta in consultas))
+
+    def test_fields_y_expand(self):
+        for rapida in (True, False):
+            with self.subTest(rapida=rapida), override_settings(API_SERIALIZACION_RAPIDA=rapida):
+                cache.clear()
+                fila = self.cliente.get('/api/maquinas/', {'fields': 'nombre, estado_display'}).data['results'][0]
+                self.assertEqual(list(fila), ['id', 'nombre', 'estado_display'])
+
+                fila = self.cliente.get('/api/maquinas/', {'fields': 'nombre', 'expand': 'categoria'}).data['results'][0]
+                self.assertEqual(list(fila), ['id', 'nombre', 'categoria'])
+                self.assertEqual(fila['categoria']['nombre'], 'Tornos')
+
+    def test_detalle_completo_o_con_fields(self):
+        detalle = self.cliente.get(f'/api/maquinas/{self.maquina.pk}/').data
+        self.assertEqual(detalle['categoria']['nombre'], 'Tornos')
+        self.assertEqual(detalle['especificaciones_tecnicas'], 'Husillo de 50 mm')
+        self.assertIs(detalle['necesita_mantenimiento'], False)
+
+        with CaptureQueriesContext(connection) as consultas:
+            detalle = self.cliente.get(f'/api/maquinas/{self.maquina.pk}/', {'fields': 'codigo_inventario'}).data
+        self.assertEqual(detalle, {'id': self.maquina.pk, 'codigo_inventario': 'MAQ-001'})
+        self.assertFalse(any('especificaciones_tecnicas' in consulta['sql'] for consulta in consultas))
+
+
+class SerializacionRapidaTests(ClienteAPITestCase):
+    def setUp(self):
+        super().setUp()
+        tipo = TipoUsuario.objects.create(nombre='instructor')
+        usuario = crear_usuario(tipo, user=self.user)
+        maquina = crear_maquina(self.categoria, 1, estado='mantenimiento', condicion='regular',
+                                eficiencia=Decimal('87.50'))
+        crear_maquina(self.categoria, 2, nombre='Fresadora "CNC" ñandú')
+        for prioridad, estado in (('critica', 'activa'), ('baja', 'resuelta')):
+            AlertaMaquina.objects.create(maquina=maquina, tipo='mantenimiento', prioridad=prioridad, estado=estado,
+                                         titulo='Revisión', descripcion='-')
+        ConsultaIA.objects.create(usuario=usuario, maquina=maquina, tipo_consulta='diagnostico', titulo='Ruido',
+                                  consulta_texto='-', confianza_respuesta=Decimal('92.5'),
+                                  recomendaciones=['Lubricar', 'Ajustar'], util=True)
+        ConsultaIA.objects.create(usuario=usuario, titulo='Sin máquina', consulta_texto='-')
+
+    def respuestas(self, url, **parametros):
+        """Contenido de la respuesta con el camino rápido y con DRF"""
+        contenidos = []
+        for rapida in (True, False):
+            cache.clear()
+            with override_settings(API_SERIALIZACION_RAPIDA=rapida), \
+                    mock.patch.object(PlanValores, 'representar_filas', autospec=True,
+                                      side_effect=PlanValores.representar_filas) as representar:
+                respuesta = self.cliente.get(url, parametros)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(representar.called, rapida)
+            contenidos.append(respuesta.content)
+        return contenidos
+
+    def test_mismo_json_que_drf(self):
+        for url, parametros in (
+            ('/api/maquinas/', {}),
+            ('/api/maquinas/', {'fields': 'nombre,eficiencia', 'expand': 'categoria,proveedor'}),
+            ('/api/alertas/', {}),
+            ('/api/consultas-ia/', {}),
+        ):
+            with self.subTest(url=url, **parametros):
+                rapida, drf = self.respuestas(url, **parametros)
+                self.assertEqual(rapida, drf)
+                self.assertIn(b'"results":[{', rapida)
+
+
+class ExportarMaquinasTests(ClienteAPITestCase):
+    def test_ndjson_por_defecto_y_formato_invalido(self):
+        crear_maquina(self.categoria, 1)
+        respuesta = self.cliente.get('/api/bulk/exportar-maquinas/')
+        self.assertEqual(respuesta['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertIn(b'"codigo_inventario": "MAQ-001"', b''.join(respuesta.streaming_content))
+
+        self.assertEqual(self.cliente.get('/api/bulk/exportar-maquinas/', {'formato': 'xml'}).status_code, 400)
+
+
+class AlertasAPITests(ClienteAPITestCase):
+    def test_edicion_no_cambia_ocurrencias_y_actualiza_huella(self):
+        maquina = crear_maquina(self.categoria, 1)
+        alerta, _, _ = registrar_alerta(maquina, 'reparacion', 'media', 'Falla en el motor', '-')
+        ultima = alerta.ultima_ocurrencia
+
+        respuesta = self.cliente.patch(f'/api/alertas/{alerta.pk}/', {
+            'titulo': 'Fuga de aceite', 'ocurrencias': 50, 'ultima_ocurrencia': '2020-01-01T00:00:00Z',
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+
+        alerta.refresh_from_db()
+        self.assertEqual((alerta.titulo, alerta.ocurrencias, alerta.ultima_ocurrencia), ('Fuga de aceite', 1, ultima))
+        self.assertEqual(alerta.huella, calcular_huella(maquina.pk, 'reparacion', 'Fuga de aceite'))
@@ -15,9 +15,6 @@ router.register(r'consultas-ia', views.ConsultaIAViewSet, basename='consulta-ia'
 app_name = 'api'
 
 urlpatterns = [
-    # Router URLs
-    path('', include(router.urls)),
-
     # Authentication
     path('auth/token/', obtain_auth_token, name='api_token_auth'),
     path('auth/login/', views.LoginAPIView.as_view(), name='api_login'),
@@ -25,9 +22,15 @@ urlpatterns = [
 
     # Machinery endpoints
     path('maquinas/buscar/', views.BuscarMaquinasAPIView.as_view(), name='buscar_maquinas'),
+    path('maquinas/autocompletar/', views.AutocompletarMaquinasAPIView.as_view(), name='autocompletar_maquinas'),
     path('maquinas/<int:pk>/historial/', views.HistorialMaquinaAPIView.as_view(), name='historial_maquina'),
     path('maquinas/<int:pk>/cambiar-estado/', views.CambiarEstadoMaquinaAPIView.as_view(), name='cambiar_estado_maquina'),
 
+    # Maintenance endpoints
+    path('mantenimientos/asignacion/', views.AsignacionTecnicosAPIView.as_view(), name='asignacion_tecnicos'),
+    path('mantenimientos/calendario/', views.CalendarioMantenimientoAPIView.as_view(), name='calendario_mantenimiento'),
+    path('mantenimientos/conflictos/', views.ConflictosMantenimientoAPIView.as_view(), name='conflictos_mantenimiento'),
+
     # Alerts endpoints
     path('alertas/activas/', views.AlertasActivasAPIView.as_view(), name='alertas_activas'),
     path('alertas/<int:pk>/resolver/', views.ResolverAlertaAPIView.as_view(), name='resolver_alerta'),
@@ -53,4 +56,7 @@ urlpatterns = [
     # Bulk operations
     path('bulk/importar-maquinas/', views.ImportarMaquinasAPIView.as_view(), name='importar_maquinas'),
     path('bulk/exportar-maquinas/', views.ExportarMaquinasAPIView.as_view(), name='exportar_maquinas'),
+
+    # Router URLs (al final para que maquinas/buscar/ y alertas/activas/ no se lean como pk)
+    path('', include(router.urls)),
 ]
\ No newline at end of file
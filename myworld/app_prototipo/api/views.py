@@ -8,24 +8,41 @@ from django.contrib.auth import authenticate
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Q
+from django.db import transaction
 import uuid
+from datetime import date, timedelta
+from django.utils.dateparse import parse_datetime
 
 # Import models
-from maquinaria.models import Maquina, AlertaMaquina, HistorialMaquina
+from maquinaria.models import Maquina, AlertaMaquina, HistorialMaquina, CategoriaMaquina, Proveedor
+from maquinaria.estadisticas import FleetStats
+from maquinaria.busqueda import obtener_backend
+from maquinaria.autocompletado import indice_maquinas
+from maquinaria.importacion import ArchivoInvalido, importar_maquinas
+from maquinaria.exportacion import exportar_maquinas
+from maquinaria.asignacion import aplicar_plan, calcular_plan
+from maquinaria.calendario import calendario as calendario_mantenimiento, conflictos
+from maquinaria.forms import ExportarMaquinasForm
+from components.cache import CacheVersionadoMixin, obtener_o_calcular
+from components.descargas import respuesta_descarga
+from .pagination import MaquinaPagination, AlertaPagination, HistorialPagination
+from .serializacion_rapida import ListaRapidaMixin
 from ia_assistant.models import ConsultaIA, SesionChatIA, MensajeChatIA
 from usuarios.models import Usuario
-from reportes.models import Reporte
+from reportes.models import Reporte, MetricasRendimiento
+from reportes.metricas import resumen_metricas
 
 # Import serializers (we'll create these later)
 from .serializers import (
-    MaquinaSerializer, AlertaMaquinaSerializer, ConsultaIASerializer,
+    MaquinaSerializer, MaquinaListSerializer, AlertaMaquinaSerializer, ConsultaIASerializer,
     HistorialMaquinaSerializer, SesionChatSerializer, MensajeChatSerializer
 )
 
-class MaquinaViewSet(viewsets.ModelViewSet):
+class MaquinaViewSet(CacheVersionadoMixin, ListaRapidaMixin, viewsets.ModelViewSet):
     serializer_class = MaquinaSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = MaquinaPagination
+    modelos_cache = [Maquina, CategoriaMaquina, Proveedor]
 
     def get_queryset(self):
         queryset = Maquina.objects.all()
@@ -42,11 +59,35 @@ class MaquinaViewSet(viewsets.ModelViewSet):
         if centro:
             queryset = queryset.filter(centro_formacion__icontains=centro)
 
-        return queryset.select_related('categoria', 'proveedor').order_by('codigo_inventario')
+        if self.action in ('list', 'retrieve'):
+            # Solo las columnas que usan los campos pedidos (más la del orden)
+            columnas, relaciones = self.get_serializer().columnas_requeridas()
+            if relaciones:
+                queryset = queryset.select_related(*relaciones)
+            queryset = queryset.only('codigo_inventario', *columnas)
+        else:
+            queryset = queryset.select_related('categoria', 'proveedor')
+
+        return queryset.order_by('codigo_inventario')
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return MaquinaListSerializer
+        return MaquinaSerializer
 
-class AlertaMaquinaViewSet(viewsets.ModelViewSet):
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            # ?fields=id,nombre&expand=categoria
+            for parametro, argumento in (('fields', 'campos'), ('expand', 'expandir')):
+                valor = self.request.query_params.get(parametro, '')
+                kwargs.setdefault(argumento, [nombre.strip() for nombre in valor.split(',') if nombre.strip()])
+        return super().get_serializer(*args, **kwargs)
+
+class AlertaMaquinaViewSet(CacheVersionadoMixin, ListaRapidaMixin, viewsets.ModelViewSet):
     serializer_class = AlertaMaquinaSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = AlertaPagination
+    modelos_cache = [AlertaMaquina, Maquina, CategoriaMaquina, Proveedor]
 
     def get_queryset(self):
         queryset = AlertaMaquina.objects.all()
@@ -56,16 +97,19 @@ class AlertaMaquinaViewSet(viewsets.ModelViewSet):
         if estado:
             queryset = queryset.filter(estado=estado)
 
-        return queryset.select_related('maquina').order_by('-fecha_creacion')
+        return queryset.select_related('maquina__categoria').order_by('-fecha_creacion')
 
-class ConsultaIAViewSet(viewsets.ModelViewSet):
+class ConsultaIAViewSet(ListaRapidaMixin, viewsets.ModelViewSet):
     serializer_class = ConsultaIASerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
+        # Sin perfil no hay consultas propias
+        if not self.request.usuario:
+            return ConsultaIA.objects.none()
         return ConsultaIA.objects.filter(
-            usuario=self.request.user
-        ).order_by('-fecha_consulta')
+            usuario=self.request.usuario
+        ).select_related('usuario__tipo_usuario', 'maquina__categoria').order_by('-fecha_consulta')
 
 class LoginAPIView(APIView):
     permission_classes = [AllowAny]
@@ -114,24 +158,41 @@ class BuscarMaquinasAPIView(APIView):
         if len(query) < 2:
             return Response({'results': []})
 
-        maquinas = Maquina.objects.filter(
-            Q(nombre__icontains=query) |
-            Q(codigo_inventario__icontains=query) |
-            Q(marca__icontains=query) |
-            Q(modelo__icontains=query)
-        )[:10]
+        maquinas = obtener_backend().buscar(
+            query, Maquina.objects.select_related('categoria', 'responsable'), limite=10
+        )
 
         serializer = MaquinaSerializer(maquinas, many=True)
         return Response({'results': serializer.data})
 
+class AutocompletarMaquinasAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limite = min(max(int(request.query_params.get('limite', 10)), 1), 50)
+        except ValueError:
+            limite = 10
+        resultados = indice_maquinas.buscar(request.query_params.get('q', ''), limite)
+        return Response({'results': resultados})
+
 class HistorialMaquinaAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
         maquina = get_object_or_404(Maquina, pk=pk)
-        historial = HistorialMaquina.objects.filter(maquina=maquina).order_by('-fecha_evento')[:20]
-        serializer = HistorialMaquinaSerializer(historial, many=True)
-        return Response(serializer.data)
+
+        def serializar():
+            historial = HistorialMaquina.objects.filter(maquina=maquina).select_related('usuario')
+            paginator = HistorialPagination()
+            pagina = paginator.paginate_queryset(historial, request, view=self)
+            serializer = HistorialMaquinaSerializer(pagina, many=True)
+            return paginator.get_paginated_response(serializer.data).data
+
+        datos = obtener_o_calcular(
+            'api:historial_maquina', [HistorialMaquina], serializar, request.build_absolute_uri()
+        )
+        return Response(datos)
 
 class CambiarEstadoMaquinaAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -156,7 +217,7 @@ class CambiarEstadoMaquinaAPIView(APIView):
             descripcion=f'Estado cambiado de {estado_anterior} a {nuevo_estado}',
             valor_anterior=estado_anterior,
             valor_nuevo=nuevo_estado,
-            usuario=request.user
+            usuario=request.usuario or None
         )
 
         return Response({'message': 'Estado actualizado correctamente'})
@@ -181,7 +242,7 @@ class ResolverAlertaAPIView(APIView):
 
         alerta.estado = 'resuelta'
         alerta.fecha_resolucion = timezone.now()
-        alerta.resuelto_por = request.user
+        alerta.resuelto_por = request.usuario or None
         alerta.notas_resolucion = notas
         alerta.save()
 
@@ -303,40 +364,48 @@ class DescargarReporteAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
-        # TODO: Implementar descarga de reportes
-        return Response({
-            'message': 'Descarga de reportes en desarrollo'
-        })
+        reporte = get_object_or_404(Reporte, pk=pk)
+        if not reporte.puede_ver(request.user, request.usuario):
+            # Igual que un reporte inexistente: no revela ids ajenos
+            return Response({'error': 'Reporte no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        if reporte.estado != 'completado' or not reporte.archivo_resultado:
+            return Response({'error': 'El reporte todavía no tiene un archivo para descargar',
+                             'estado': reporte.estado}, status=status.HTTP_409_CONFLICT)
+        try:
+            return respuesta_descarga(request, reporte.archivo_resultado, reporte.nombre_descarga,
+                                      al_descargar=reporte.registrar_descarga)
+        except FileNotFoundError:
+            return Response({'error': 'El archivo del reporte no existe'}, status=status.HTTP_404_NOT_FOUND)
 
 class DatosDashboardAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         # Estadísticas básicas para el dashboard
-        total_maquinas = Maquina.objects.count()
-        maquinas_operativas = Maquina.objects.filter(estado='operativa').count()
-        maquinas_mantenimiento = Maquina.objects.filter(estado='mantenimiento').count()
-        alertas_activas = AlertaMaquina.objects.filter(estado='activa').count()
-
-        return Response({
-            'total_maquinas': total_maquinas,
-            'maquinas_operativas': maquinas_operativas,
-            'maquinas_mantenimiento': maquinas_mantenimiento,
-            'alertas_activas': alertas_activas,
-            'porcentaje_operativas': (maquinas_operativas / total_maquinas * 100) if total_maquinas > 0 else 0
-        })
+        stats = FleetStats.calcular()
+        return Response(stats.as_dict())
 
 class ResumenMetricasAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # TODO: Implementar métricas más detalladas
-        return Response({
-            'eficiencia_promedio': 87.5,
-            'tiempo_promedio_reparacion': 2.3,
-            'costo_mantenimiento_mes': 245000,
-            'satisfaccion_usuario': 94.2
-        })
+        # Filas consolidadas por `manage.py calcular_metricas`
+        periodo = request.query_params.get('periodo', 'mensual')
+        if periodo not in dict(MetricasRendimiento.PERIODO_CHOICES):
+            return Response({'error': 'Periodo no válido'}, status=status.HTTP_400_BAD_REQUEST)
+        fecha = request.query_params.get('fecha')
+        try:
+            fecha = date.fromisoformat(fecha) if fecha else None
+        except ValueError:
+            return Response({'error': 'La fecha debe tener el formato AAAA-MM-DD'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(resumen_metricas(
+            periodo=periodo,
+            fecha=fecha,
+            centro=request.query_params.get('centro'),
+            categoria=request.query_params.get('categoria'),
+        ))
 
 class EstadisticasGeneralesAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -361,23 +430,130 @@ class SystemStatusAPIView(APIView):
             'database': 'connected'
         })
 
+class AsignacionTecnicosAPIView(APIView):
+    """
+    GET: propone técnico y horario para los mantenimientos pendientes de la
+    ventana sin guardar nada. POST: calcula el plan y lo aplica.
+    Parámetros: desde, hasta (fecha y hora ISO), reasignar, vencidos.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @staticmethod
+    def _fecha(valor):
+        if not valor:
+            return None
+        fecha = parse_datetime(valor)
+        if fecha is None:
+            raise ValueError(valor)
+        return fecha if timezone.is_aware(fecha) else timezone.make_aware(fecha)
+
+    def _plan(self, datos, bloquear=False):
+        desde, hasta = self._fecha(datos.get('desde')), self._fecha(datos.get('hasta'))
+        if desde and hasta and desde >= hasta:
+            raise ValueError('desde >= hasta')
+        reasignar = str(datos.get('reasignar', '')).lower() in ('1', 'true', 'on', 'si', 'sí')
+        incluir_vencidos = str(datos.get('vencidos', '1')).lower() in ('1', 'true', 'on', 'si', 'sí')
+        return calcular_plan(desde=desde, hasta=hasta, reasignar=reasignar, incluir_vencidos=incluir_vencidos,
+                             bloquear=bloquear)
+
+    def get(self, request):
+        try:
+            plan = self._plan(request.query_params)
+        except ValueError:
+            return Response({'error': 'Ventana no válida: use fechas ISO con desde anterior a hasta'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        return Response(plan.as_dict())
+
+    def post(self, request):
+        try:
+            # Cálculo y aplicación en la misma transacción, con los pendientes bloqueados
+            with transaction.atomic():
+                plan = self._plan(request.data, bloquear=True)
+                aplicados = aplicar_plan(plan)
+        except ValueError:
+            return Response({'error': 'Ventana no válida: use fechas ISO con desde anterior a hasta'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        return Response({'aplicados': aplicados, **plan.as_dict()})
+
+class CalendarioMantenimientoAPIView(APIView):
+    """
+    Mantenimientos activos entre desde y hasta (fechas, por defecto el mes
+    actual) agrupados por dia, tecnico o maquina, con los solapes de cada
+    máquina y técnico. Filtros opcionales: maquina, tecnico.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        hoy = timezone.localdate()
+        try:
+            desde = date.fromisoformat(request.query_params['desde']) if request.query_params.get('desde') else hoy.replace(day=1)
+            hasta = (date.fromisoformat(request.query_params['hasta']) if request.query_params.get('hasta')
+                     else (desde.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1))
+            maquina = int(request.query_params['maquina']) if request.query_params.get('maquina') else None
+            tecnico = int(request.query_params['tecnico']) if request.query_params.get('tecnico') else None
+            datos = calendario_mantenimiento(desde, hasta, por=request.query_params.get('agrupar', 'dia'),
+                                             maquina=maquina, tecnico=tecnico)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(datos)
+
+class ConflictosMantenimientoAPIView(APIView):
+    """Mantenimientos de una máquina o técnico que se solapan con [inicio, fin)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            inicio = parse_datetime(request.query_params.get('inicio', ''))
+            fin = parse_datetime(request.query_params.get('fin', ''))
+            maquina, tecnico, excluir = (
+                int(request.query_params[nombre]) if request.query_params.get(nombre) else None
+                for nombre in ('maquina', 'tecnico', 'excluir')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if inicio is None or fin is None or fin <= inicio or not (maquina or tecnico):
+            return Response({'error': 'Indique inicio < fin (fecha y hora ISO) y una maquina o un tecnico'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        inicio = inicio if timezone.is_aware(inicio) else timezone.make_aware(inicio)
+        fin = fin if timezone.is_aware(fin) else timezone.make_aware(fin)
+        encontrados = conflictos(inicio, fin, maquina=maquina, tecnico=tecnico, excluir=excluir)
+        return Response({'hay_conflictos': bool(encontrados), 'conflictos': encontrados})
+
 class ImportarMaquinasAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        # TODO: Implementar importación masiva
-        return Response({
-            'message': 'Importación masiva en desarrollo'
-        })
+        archivo = request.FILES.get('archivo') or request.FILES.get('archivo_excel')
+        if archivo is None:
+            return Response({'error': 'Debe adjuntar un archivo .xlsx o .csv'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        sobrescribir = str(request.data.get('sobrescribir', '')).lower() in ('1', 'true', 'on', 'si', 'sí')
+        try:
+            resultado = importar_maquinas(archivo, usuario=request.usuario or None, sobrescribir=sobrescribir)
+        except ArchivoInvalido as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(resultado.as_dict())
 
 class ExportarMaquinasAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # TODO: Implementar exportación masiva
-        return Response({
-            'message': 'Exportación masiva en desarrollo'
-        })
+        """
+        Descarga el inventario en streaming. Parámetros: formato (ndjson por
+        defecto, csv, excel o pdf), categorias (repetible) e incluir_inactivas.
+        """
+        datos = request.query_params.copy()
+        datos.setdefault('formato', 'ndjson')
+        form = ExportarMaquinasForm(datos)
+        if not form.is_valid():
+            return Response(form.errors, status=status.HTTP_400_BAD_REQUEST)
+        return exportar_maquinas(
+            form.cleaned_data['formato'],
+            categorias=form.cleaned_data['categorias'],
+            incluir_inactivas=form.cleaned_data['incluir_inactivas'],
+        )
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
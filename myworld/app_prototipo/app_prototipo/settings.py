@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'reportes',
     'ia_assistant',
     'documentos',
+    'api',
 ]
 
 MIDDLEWARE = [
@@ -55,6 +56,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'usuarios.middleware.UsuarioMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -86,6 +88,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Transactions take the write lock when they begin, so reads inside
+        # them (e.g. the select_for_update in maquinaria.signals) see the
+        # last committed row instead of racing a concurrent writer
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -114,6 +122,10 @@ AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Seconds a login identifier with no matching Usuario is remembered, so
+# repeated attempts with unknown identifiers skip the database lookup
+AUTH_CACHE_NEGATIVO_SEGUNDOS = 60
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -182,12 +194,72 @@ STATICFILES_DIRS = [
 # AUTH_USER_MODEL = 'usuarios.CustomUser'
 
 # Cache configuration (for better performance)
+# Shared between worker processes: file-based by default, set CACHE_BACKEND and
+# CACHE_LOCATION to plug in another backend (e.g. django.core.cache.backends.redis.RedisCache)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
+# In-process cache of Usuario profiles used by usuarios.middleware.UsuarioMiddleware
+USUARIOS_CACHE_TAMANO = 1024
+USUARIOS_CACHE_TTL = 300  # seconds
+
+# Machine search backend (maquinaria.busqueda). Defaults to the FTS5 index on
+# SQLite and to icontains filtering on other databases.
+# MAQUINARIA_BUSQUEDA_BACKEND = 'maquinaria.busqueda.BackendIcontains'
+
+# Machine autocomplete (maquinaria.autocompletado): cached prefix responses per process
+AUTOCOMPLETADO_CACHE_TAMANO = 2048
+
+# Build API list responses from .values() rows (api.serializacion_rapida)
+API_SERIALIZACION_RAPIDA = True
+
+# Seconds an approximate page count (components.paginacion.contar_aproximado) is reused
+PAGINACION_CONTEO_TTL = 300
+
+# Report queue (reportes.cola, `manage.py procesar_reportes`)
+REPORTES_MAX_INTENTOS = 3
+REPORTES_REINTENTO_SEGUNDOS = 60  # doubled on every failed attempt
+REPORTES_TIEMPO_MAXIMO = 1800  # seconds before a 'generando' job is considered abandoned
+
+# Report downloads (components.descargas): let the web server send the file.
+# 'X-Accel-Redirect' (nginx, internal location at DESCARGAS_SENDFILE_PREFIJO
+# mapped to MEDIA_ROOT) or 'X-Sendfile' (Apache mod_xsendfile).
+# DESCARGAS_SENDFILE_HEADER = 'X-Accel-Redirect'
+# DESCARGAS_SENDFILE_PREFIJO = '/protegido/'
+
+# Dashboard analytics snapshot (reportes.analitica): reused for at least this
+# many seconds even if the data changes, and size of the machines table
+ANALITICA_INTERVALO_SEGUNDOS = 60
+ANALITICA_TOP_MAQUINAS = 20
+
+# Dashboard widgets (components.widgets): an expired Widget.datos_cache is
+# served while it is refreshed in background threads, up to this many extra seconds
+WIDGETS_MAX_OBSOLETO_SEGUNDOS = 3600
+WIDGETS_HILOS_REFRESCO = 2
+
+# Automatic fleet alerts (maquinaria.alertas, `manage.py generar_alertas`)
+ALERTAS_EFICIENCIA_MINIMA = 70  # percent
+ALERTAS_HORAS_USO_MES_MAXIMO = 200
+ALERTAS_GARANTIA_DIAS = 30  # warn this many days before the warranty ends
+# Repeats of an open alert (same machine, type and normalized title) within
+# this window add an occurrence instead of a new alert
+ALERTAS_VENTANA_DEDUPLICACION_SEGUNDOS = 3600
+# At most this many new alerts per machine within the limit window
+ALERTAS_MAXIMO_POR_MAQUINA = 10
+ALERTAS_VENTANA_LIMITE_SEGUNDOS = 600
+
+# Versioned cache entries (components.cache) live up to this many seconds;
+# they are invalidated earlier whenever one of their models changes
+CACHE_VERSIONADO_TIMEOUT = 3600
+
 # Session configuration
 SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_SAVE_EVERY_REQUEST = True
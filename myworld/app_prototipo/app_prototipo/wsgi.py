@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app_prototipo.settings')
 
 application = get_wsgi_application()
+
+# Índice de autocompletado de máquinas listo antes de la primera petición
+from maquinaria.autocompletado import precargar_indice  # noqa: E402
+
+precargar_indice()
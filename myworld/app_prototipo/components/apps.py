@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PrototipoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'components'
+
+    def ready(self):
+        from .cache import conectar_senales
+        conectar_senales()
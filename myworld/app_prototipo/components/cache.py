@@ -0,0 +1,188 @@
+"""
+Cache compartido con invalidación por versión de modelo.
+
+Cada modelo registrado tiene una clave de versión en el cache. Las entradas
+versionadas incluyen en su clave la versión de todos los modelos de los que
+dependen, de modo que al guardar o eliminar una instancia basta con
+incrementar la versión del modelo para que esas entradas dejen de usarse.
+"""
+import hashlib
+import secrets
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+# Modelos cuya versión se incrementa automáticamente con post_save/post_delete
+MODELOS_VERSIONADOS = [
+    'maquinaria.Maquina',
+    'maquinaria.CategoriaMaquina',
+    'maquinaria.Proveedor',
+    'maquinaria.AlertaMaquina',
+    'maquinaria.HistorialMaquina',
+    'maquinaria.MantenimientoProgramado',
+    'reportes.Reporte',
+]
+
+
+def _etiqueta(modelo):
+    if isinstance(modelo, str):
+        return modelo.lower()
+    return modelo._meta.label_lower
+
+
+def clave_version(modelo):
+    return f'version:{_etiqueta(modelo)}'
+
+
+def _version_inicial():
+    # Basada en el reloj para no reutilizar entradas antiguas si la clave de
+    # versión fue desalojada del cache; la parte aleatoria evita que dos
+    # incrementos simultáneos produzcan la misma versión
+    return time.time_ns() + secrets.randbelow(1000)
+
+
+def obtener_versiones(*modelos):
+    """Devuelve {etiqueta: versión} con una sola lectura del cache"""
+    claves = {clave_version(modelo): _etiqueta(modelo) for modelo in modelos}
+    encontradas = cache.get_many(list(claves))
+
+    faltantes = {}
+    for clave in claves:
+        if clave not in encontradas:
+            faltantes[clave] = _version_inicial()
+    if faltantes:
+        for clave, version in faltantes.items():
+            cache.add(clave, version, timeout=None)
+        encontradas.update(cache.get_many(list(faltantes)))
+        for clave, version in faltantes.items():
+            encontradas.setdefault(clave, version)
+
+    return {etiqueta: encontradas[clave] for clave, etiqueta in claves.items()}
+
+
+def _escribir_versiones(claves):
+    cache.set_many({clave: _version_inicial() for clave in claves}, timeout=None)
+
+
+def incrementar_version(*modelos):
+    """
+    Invalida todas las entradas versionadas que dependen de los modelos.
+    La versión nueva se escribe al confirmar la transacción en curso, para
+    que nadie guarde datos sin confirmar bajo esa versión. Se escribe con
+    set(timeout=None) y no con incr(), que en los backends sin incremento
+    atómico lee y reescribe la clave con el TIMEOUT por defecto.
+    """
+    claves = [clave_version(modelo) for modelo in modelos]
+    transaction.on_commit(lambda: _escribir_versiones(claves))
+
+
+def clave_versionada(prefijo, modelos, *partes):
+    """Clave de cache que cambia cuando cambia cualquiera de los modelos"""
+    versiones = obtener_versiones(*modelos)
+    firma = '.'.join(str(versiones[_etiqueta(modelo)]) for modelo in modelos)
+    resumen = hashlib.md5('|'.join(str(parte) for parte in partes).encode('utf-8')).hexdigest()
+    return f'{prefijo}:{firma}:{resumen}'
+
+
+def obtener_o_calcular(prefijo, modelos, funcion, *partes, timeout=None):
+    """Devuelve el valor cacheado o lo calcula con funcion() y lo guarda"""
+    clave = clave_versionada(prefijo, modelos, *partes)
+    valor = cache.get(clave)
+    if valor is None:
+        valor = funcion()
+        cache.set(clave, valor, timeout or settings.CACHE_VERSIONADO_TIMEOUT)
+    return valor
+
+
+def cache_versionado(*modelos, timeout=None, por_usuario=False):
+    """
+    Decorador para vistas basadas en funciones.
+    Cachea las respuestas GET exitosas por URL completa (y opcionalmente por
+    usuario) hasta que cambie alguno de los modelos indicados.
+    """
+    def decorador(vista):
+        prefijo = f'vista:{vista.__module__}.{vista.__name__}'
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method != 'GET':
+                return vista(request, *args, **kwargs)
+
+            partes = [request.get_full_path()]
+            if por_usuario:
+                partes.append(request.user.pk)
+            clave = clave_versionada(prefijo, modelos, *partes)
+
+            guardada = cache.get(clave)
+            if guardada is not None:
+                contenido, content_type, status = guardada
+                return HttpResponse(contenido, content_type=content_type, status=status)
+
+            response = vista(request, *args, **kwargs)
+            if response.status_code == 200 and not getattr(response, 'streaming', False):
+                cache.set(
+                    clave,
+                    (response.content, response['Content-Type'], response.status_code),
+                    timeout or settings.CACHE_VERSIONADO_TIMEOUT
+                )
+            return response
+
+        return envoltura
+
+    return decorador
+
+
+class CacheVersionadoMixin:
+    """
+    Mixin para viewsets de DRF que cachea list() y retrieve().
+    Las subclases definen modelos_cache con los modelos de los que depende
+    la respuesta serializada.
+    """
+    modelos_cache = []
+    cache_timeout = None
+
+    def _clave_cache(self, request, accion):
+        prefijo = f'api:{self.__class__.__name__}.{accion}'
+        return clave_versionada(prefijo, self.modelos_cache, request.build_absolute_uri())
+
+    def _respuesta_cacheada(self, request, accion, calcular):
+        from rest_framework.response import Response
+
+        clave = self._clave_cache(request, accion)
+        datos = cache.get(clave)
+        if datos is not None:
+            return Response(datos)
+
+        response = calcular()
+        if response.status_code == 200:
+            cache.set(clave, response.data, self.cache_timeout or settings.CACHE_VERSIONADO_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._respuesta_cacheada(
+            request, 'list', lambda: super(CacheVersionadoMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._respuesta_cacheada(
+            request, 'retrieve', lambda: super(CacheVersionadoMixin, self).retrieve(request, *args, **kwargs)
+        )
+
+
+def invalidar_version_modelo(sender, **kwargs):
+    incrementar_version(sender)
+
+
+def conectar_senales():
+    from django.apps import apps
+    from django.db.models.signals import post_save, post_delete
+
+    for etiqueta in MODELOS_VERSIONADOS:
+        modelo = apps.get_model(etiqueta)
+        uid = f'cache_versionado:{etiqueta}'
+        post_save.connect(invalidar_version_modelo, sender=modelo, dispatch_uid=f'{uid}:save')
+        post_delete.connect(invalidar_version_modelo, sender=modelo, dispatch_uid=f'{uid}:delete')
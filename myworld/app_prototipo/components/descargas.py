@@ -0,0 +1,157 @@
+"""
+Descarga de archivos almacenados (FileField) con validación condicional y
+rangos de bytes.
+
+- ETag y Last-Modified: If-None-Match / If-Modified-Since responden 304 y
+  If-Match / If-Unmodified-Since 412, con get_conditional_response.
+- Range: un único rango "bytes=inicio-fin" responde 206; If-Range que no
+  coincide entrega el archivo completo. Varios rangos se ignoran (se envía
+  el archivo completo, como permite la RFC 9110).
+- El archivo completo se envía con FileResponse, que el servidor WSGI puede
+  transmitir con wsgi.file_wrapper (sendfile).
+- Con DESCARGAS_SENDFILE_HEADER ('X-Accel-Redirect' para nginx o
+  'X-Sendfile' para Apache) la transferencia la hace el servidor web.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+TAMANO_BLOQUE = 64 * 1024
+
+
+class _Tramo:
+    """Lee a lo sumo `longitud` bytes de un archivo ya posicionado"""
+
+    def __init__(self, archivo, longitud):
+        self.archivo = archivo
+        self.restante = longitud
+
+    def read(self, tamano=-1):
+        if self.restante <= 0:
+            return b''
+        if tamano < 0 or tamano > self.restante:
+            tamano = self.restante
+        datos = self.archivo.read(tamano)
+        self.restante -= len(datos)
+        return datos
+
+    def close(self):
+        self.archivo.close()
+
+
+def _metadatos(archivo):
+    """(tamaño, última modificación como timestamp)"""
+    storage = archivo.storage
+    tamano = storage.size(archivo.name)
+    try:
+        modificado = storage.get_modified_time(archivo.name).timestamp()
+    except NotImplementedError:
+        modificado = None
+    return tamano, modificado
+
+
+def calcular_etag(archivo, tamano, modificado):
+    firma = f'{archivo.name}:{tamano}:{modificado}'
+    return '"{}"'.format(hashlib.md5(firma.encode('utf-8')).hexdigest())
+
+
+def rango_solicitado(request, tamano, etag, modificado):
+    """
+    (inicio, fin) inclusivo del rango pedido, None para el archivo completo
+    o False si el rango no se puede satisfacer.
+    """
+    cabecera = request.META.get('HTTP_RANGE', '').strip()
+    coincidencia = RANGO.match(cabecera)
+    if not coincidencia:
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if if_range:
+        if if_range.startswith(('"', 'W/')):
+            if if_range != etag:
+                return None
+        elif modificado is None or parse_http_date_safe(if_range) != int(modificado):
+            return None
+
+    inicio, fin = coincidencia.groups()
+    if not inicio and not fin:
+        return None
+    if not inicio:
+        # Sufijo: los últimos N bytes
+        longitud = int(fin)
+        if longitud == 0:
+            return False
+        return max(tamano - longitud, 0), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or inicio > fin:
+        return False
+    return inicio, fin
+
+
+def _cabeceras_comunes(respuesta, etag, modificado, nombre_descarga):
+    respuesta['ETag'] = etag
+    if modificado is not None:
+        respuesta['Last-Modified'] = http_date(modificado)
+    respuesta['Accept-Ranges'] = 'bytes'
+    respuesta['Content-Disposition'] = content_disposition_header(True, nombre_descarga)
+    return respuesta
+
+
+def respuesta_descarga(request, archivo, nombre_descarga=None, al_descargar=None):
+    """
+    Respuesta para descargar un FieldFile. `al_descargar()` se llama solo cuando
+    se envía el archivo desde el inicio (no en 304, 412, 416 ni en rangos
+    posteriores), para contar descargas sin duplicar las reanudaciones.
+    """
+    nombre_descarga = nombre_descarga or os.path.basename(archivo.name)
+    content_type = mimetypes.guess_type(nombre_descarga)[0] or 'application/octet-stream'
+    tamano, modificado = _metadatos(archivo)
+    etag = calcular_etag(archivo, tamano, modificado)
+
+    condicional = get_conditional_response(request, etag=etag, last_modified=modificado and int(modificado))
+    if condicional is not None:
+        return _cabeceras_comunes(condicional, etag, modificado, nombre_descarga)
+
+    rango = rango_solicitado(request, tamano, etag, modificado)
+    if rango is False:
+        respuesta = HttpResponse(status=416)
+        respuesta['Content-Range'] = f'bytes */{tamano}'
+        return _cabeceras_comunes(respuesta, etag, modificado, nombre_descarga)
+
+    if al_descargar is not None and (rango is None or rango[0] == 0):
+        al_descargar()
+
+    cabecera_sendfile = getattr(settings, 'DESCARGAS_SENDFILE_HEADER', None)
+    if cabecera_sendfile:
+        # El servidor web envía el archivo y resuelve los rangos
+        respuesta = HttpResponse(content_type=content_type)
+        if cabecera_sendfile == 'X-Accel-Redirect':
+            prefijo = getattr(settings, 'DESCARGAS_SENDFILE_PREFIJO', '/protegido/')
+            respuesta[cabecera_sendfile] = prefijo.rstrip('/') + '/' + archivo.name
+        else:
+            respuesta[cabecera_sendfile] = archivo.path
+        return _cabeceras_comunes(respuesta, etag, modificado, nombre_descarga)
+
+    contenido = archivo.storage.open(archivo.name, 'rb')
+    if rango is None:
+        respuesta = FileResponse(contenido, content_type=content_type, as_attachment=True,
+                                 filename=nombre_descarga)
+        respuesta.block_size = TAMANO_BLOQUE
+        return _cabeceras_comunes(respuesta, etag, modificado, nombre_descarga)
+
+    inicio, fin = rango
+    contenido.seek(inicio)
+    respuesta = FileResponse(_Tramo(contenido, fin - inicio + 1), status=206, content_type=content_type)
+    respuesta.block_size = TAMANO_BLOQUE
+    respuesta['Content-Length'] = str(fin - inicio + 1)
+    respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    return _cabeceras_comunes(respuesta, etag, modificado, nombre_descarga)
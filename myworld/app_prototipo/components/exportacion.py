@@ -0,0 +1,165 @@
+"""
+Exportación tabular en streaming.
+
+Cada escritor recibe los encabezados y un iterable de filas (tuplas) y no
+materializa el conjunto completo. CSV y NDJSON se generan por bloques dentro
+de un StreamingHttpResponse. XLSX (openpyxl en modo write_only) y PDF
+(reportlab, página a página) se escriben en un archivo temporal que se envía
+con FileResponse.
+"""
+import csv
+import io
+import tempfile
+from datetime import datetime
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+# Filas que se acumulan antes de enviar un bloque de CSV/NDJSON
+FILAS_POR_BLOQUE = 500
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+}
+
+EXTENSIONES = {'csv': 'csv', 'ndjson': 'ndjson', 'excel': 'xlsx', 'pdf': 'pdf'}
+
+
+def _bloques(filas):
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, FILAS_POR_BLOQUE))
+        if not bloque:
+            return
+        yield bloque
+
+
+def _sin_zona(valor):
+    # Excel no admite fechas con zona horaria
+    if isinstance(valor, datetime) and timezone.is_aware(valor):
+        return timezone.make_naive(valor)
+    return valor
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'isoformat'):
+        return _sin_zona(valor).isoformat()
+    return str(valor)
+
+
+def generar_csv(encabezados, filas):
+    """Texto CSV por bloques; empieza con BOM para que Excel detecte UTF-8"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(encabezados)
+    for bloque in _bloques(filas):
+        escritor.writerows(bloque)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def generar_ndjson(claves, filas):
+    """Un objeto JSON por línea"""
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    for bloque in _bloques(filas):
+        yield ''.join(codificador.encode(dict(zip(claves, fila))) + '\n' for fila in bloque)
+
+
+def escribir_xlsx(archivo, encabezados, filas, titulo_hoja='Datos'):
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(titulo_hoja[:31])
+    hoja.append(list(encabezados))
+    for fila in filas:
+        hoja.append([_sin_zona(valor) for valor in fila])
+    libro.save(archivo)
+
+
+def escribir_pdf(archivo, encabezados, filas, titulo=''):
+    """Tabla simple en hojas horizontales, dibujada fila a fila"""
+    from reportlab.lib.pagesizes import letter, landscape
+    from reportlab.pdfgen import canvas
+
+    ancho, alto = landscape(letter)
+    margen = 30
+    alto_fila = 12
+    ancho_columna = (ancho - 2 * margen) / max(len(encabezados), 1)
+    caracteres = max(int(ancho_columna / 4.2), 4)
+
+    lienzo = canvas.Canvas(archivo, pagesize=(ancho, alto))
+    pagina = 0
+
+    def recortar(valor):
+        texto = _texto(valor)
+        return texto if len(texto) <= caracteres else texto[:caracteres - 1] + '…'
+
+    def nueva_pagina():
+        nonlocal pagina
+        if pagina:
+            lienzo.showPage()
+        pagina += 1
+        y = alto - margen
+        if titulo:
+            lienzo.setFont('Helvetica-Bold', 12)
+            lienzo.drawString(margen, y, titulo)
+            y -= 2 * alto_fila
+        lienzo.setFont('Helvetica-Bold', 7)
+        for posicion, encabezado in enumerate(encabezados):
+            lienzo.drawString(margen + posicion * ancho_columna, y, recortar(encabezado))
+        lienzo.line(margen, y - 3, ancho - margen, y - 3)
+        lienzo.setFont('Helvetica', 7)
+        lienzo.drawRightString(ancho - margen, margen / 2, f'Página {pagina}')
+        return y - alto_fila
+
+    y = nueva_pagina()
+    for fila in filas:
+        if y < margen:
+            y = nueva_pagina()
+        for posicion, valor in enumerate(fila):
+            lienzo.drawString(margen + posicion * ancho_columna, y, recortar(valor))
+        y -= alto_fila
+    lienzo.save()
+
+
+def _adjunto(respuesta, nombre_archivo):
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return respuesta
+
+
+def respuesta_exportacion(formato, encabezados, filas, nombre_base, claves=None, titulo=''):
+    """
+    Respuesta de descarga en el formato pedido ('csv', 'ndjson', 'excel' o
+    'pdf'). `claves` son los nombres de los campos en NDJSON (por defecto los
+    encabezados).
+    """
+    if formato not in EXTENSIONES:
+        raise ValueError(f'Formato de exportación no soportado: {formato}')
+    nombre_archivo = f'{nombre_base}.{EXTENSIONES[formato]}'
+    if formato == 'csv':
+        return _adjunto(StreamingHttpResponse(generar_csv(encabezados, filas),
+                                              content_type=CONTENT_TYPES['csv']), nombre_archivo)
+    if formato == 'ndjson':
+        return _adjunto(StreamingHttpResponse(generar_ndjson(claves or encabezados, filas),
+                                              content_type=CONTENT_TYPES['ndjson']), nombre_archivo)
+
+    # XLSX y PDF son formatos empaquetados: se construyen en disco y se envían en streaming
+    archivo = tempfile.TemporaryFile()
+    if formato == 'excel':
+        escribir_xlsx(archivo, encabezados, filas, titulo_hoja=titulo or 'Datos')
+    else:
+        escribir_pdf(archivo, encabezados, filas, titulo=titulo)
+    archivo.seek(0)
+    return FileResponse(archivo, as_attachment=True, filename=nombre_archivo,
+                        content_type=CONTENT_TYPES[formato])
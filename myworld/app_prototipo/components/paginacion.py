@@ -0,0 +1,142 @@
+"""
+Paginación por cursor (keyset) para vistas HTML.
+
+En lugar de COUNT(*) + OFFSET, cada página se obtiene filtrando a partir de
+los valores de ordenamiento de la última fila vista, por lo que el costo de
+una página no depende de su profundidad.
+"""
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class CursorInvalido(Exception):
+    pass
+
+
+def contar_aproximado(queryset, ttl=None):
+    """
+    Conteo cacheado por consulta durante PAGINACION_CONTEO_TTL segundos.
+    Puede quedar desfasado respecto a escrituras recientes.
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    clave = 'conteo:' + hashlib.md5(f'{sql}|{params}'.encode('utf-8')).hexdigest()
+    total = cache.get(clave)
+    if total is None:
+        total = queryset.order_by().count()
+        cache.set(clave, total, ttl or getattr(settings, 'PAGINACION_CONTEO_TTL', 300))
+    return total
+
+
+class PaginaKeyset:
+    def __init__(self, object_list, cursor_siguiente, cursor_anterior, total=None):
+        self.object_list = object_list
+        self.next_cursor = cursor_siguiente
+        self.previous_cursor = cursor_anterior
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class KeysetPaginator:
+    """
+    Pagina un queryset por los campos de `ordering`, que deben identificar
+    cada fila de forma única (p. ej. ('-fecha_creacion', 'id')).
+    """
+
+    def __init__(self, queryset, ordering, per_page=20, contar=False):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.contar = contar
+        self.campos = [campo.lstrip('-') for campo in self.ordering]
+        self.descendente = [campo.startswith('-') for campo in self.ordering]
+
+    def get_page(self, cursor=None):
+        """Página para el cursor recibido; un cursor inválido vuelve al inicio"""
+        try:
+            valores, hacia_atras = self._decodificar(cursor) if cursor else (None, False)
+        except CursorInvalido:
+            valores, hacia_atras = None, False
+
+        queryset = self.queryset
+        if valores is not None:
+            queryset = queryset.filter(self._filtro_posicion(valores, hacia_atras))
+
+        orden = self.ordering if not hacia_atras else [self._invertir(campo) for campo in self.ordering]
+        filas = list(queryset.order_by(*orden)[:self.per_page + 1])
+        hay_mas = len(filas) > self.per_page
+        filas = filas[:self.per_page]
+        if hacia_atras:
+            filas.reverse()
+
+        if hacia_atras:
+            hay_siguiente, hay_anterior = True, hay_mas
+        else:
+            hay_siguiente, hay_anterior = hay_mas, valores is not None
+
+        cursor_siguiente = self._codificar(filas[-1], False) if hay_siguiente and filas else None
+        cursor_anterior = self._codificar(filas[0], True) if hay_anterior and filas else None
+        total = contar_aproximado(self.queryset) if self.contar else None
+
+        return PaginaKeyset(filas, cursor_siguiente, cursor_anterior, total)
+
+    def _filtro_posicion(self, valores, hacia_atras):
+        # (a, b) > (va, vb)  ==>  a > va OR (a = va AND b > vb), según la dirección de cada campo
+        filtro = Q()
+        igualdad = Q()
+        for campo, descendente, valor in zip(self.campos, self.descendente, valores):
+            mayor = descendente == hacia_atras
+            filtro |= igualdad & Q(**{f'{campo}__{"gt" if mayor else "lt"}': valor})
+            igualdad &= Q(**{campo: valor})
+        return filtro
+
+    def _codificar(self, fila, hacia_atras):
+        valores = []
+        for campo in self.campos:
+            valor = getattr(fila, campo) if not isinstance(fila, dict) else fila[campo]
+            valores.append(valor.isoformat() if hasattr(valor, 'isoformat') else valor)
+        datos = json.dumps({'v': valores, 'a': hacia_atras}, default=str)
+        return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii')
+
+    def _decodificar(self, cursor):
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            valores = datos['v']
+            if len(valores) != len(self.campos):
+                raise ValueError
+            modelo = self.queryset.model
+            valores = [
+                modelo._meta.get_field(campo).to_python(valor)
+                for campo, valor in zip(self.campos, valores)
+            ]
+            return valores, bool(datos.get('a'))
+        except (ValueError, KeyError, TypeError, ValidationError, FieldDoesNotExist):
+            raise CursorInvalido(cursor)
+
+    @staticmethod
+    def _invertir(campo):
+        return campo[1:] if campo.startswith('-') else f'-{campo}'
@@ -1,3 +1,284 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .cache import clave_version, incrementar_version, obtener_o_calcular, obtener_versiones
+from .descargas import respuesta_descarga
+from .models import Widget
+from .paginacion import KeysetPaginator
+from .widgets import PROVEEDORES, datos_widget, datos_widgets
+
+CACHE_LOCAL = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+CONTENIDO = b'abcdefghijklmnopqrstuvwxyz'
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class CacheVersionadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calculos = 0
+
+    def calcular(self):
+        self.calculos += 1
+        return self.calculos
+
+    def obtener(self):
+        return obtener_o_calcular('prueba', ['maquinaria.Maquina', 'maquinaria.CategoriaMaquina'], self.calcular,
+                                  'parametro')
+
+    def test_reutiliza_hasta_que_cambia_un_modelo(self):
+        self.assertEqual((self.obtener(), self.obtener()), (1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            incrementar_version('maquinaria.CategoriaMaquina')
+        self.assertEqual(self.obtener(), 2)
+
+        # Un modelo del que no depende no invalida la entrada
+        with self.captureOnCommitCallbacks(execute=True):
+            incrementar_version('maquinaria.AlertaMaquina')
+        self.assertEqual(self.obtener(), 2)
+
+    def test_version_se_escribe_al_confirmar(self):
+        self.obtener()
+        antes = obtener_versiones('maquinaria.Maquina')
+        with self.captureOnCommitCallbacks(execute=False) as pendientes:
+            incrementar_version('maquinaria.Maquina')
+
+        # Sin confirmar la transacción nadie ve la versión nueva
+        self.assertEqual(obtener_versiones('maquinaria.Maquina'), antes)
+        self.assertEqual(self.obtener(), 1)
+        self.assertEqual(len(pendientes), 1)
+
+        pendientes[0]()
+        self.assertNotEqual(obtener_versiones('maquinaria.Maquina'), antes)
+        self.assertEqual(self.obtener(), 2)
+
+    def test_version_desalojada_no_reutiliza_entradas(self):
+        self.obtener()
+        cache.delete(clave_version('maquinaria.Maquina'))
+        self.assertEqual(self.obtener(), 2)
+
+    def test_guardar_instancias_incrementa_la_version(self):
+        from maquinaria.models import CategoriaMaquina
+
+        antes = obtener_versiones(CategoriaMaquina)
+        with self.captureOnCommitCallbacks(execute=True):
+            CategoriaMaquina.objects.create(nombre='Tornos')
+        despues = obtener_versiones(CategoriaMaquina)
+        self.assertNotEqual(antes, despues)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CategoriaMaquina.objects.all().delete()
+        self.assertNotEqual(obtener_versiones(CategoriaMaquina), despues)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        from maquinaria.models import CategoriaMaquina, Maquina
+        from maquinaria.tests import crear_maquina
+
+        cache.clear()
+        categoria = CategoriaMaquina.objects.create(nombre='Tornos')
+        # Estados repetidos: el id desempata el orden
+        for numero in range(1, 8):
+            crear_maquina(categoria, numero, estado='operativa' if numero % 2 else 'disponible')
+        self.queryset = Maquina.objects.all()
+        self.orden = list(Maquina.objects.order_by('-estado', 'id').values_list('codigo_inventario', flat=True))
+
+    def codigos(self, pagina):
+        return [maquina.codigo_inventario for maquina in pagina]
+
+    def test_recorre_hacia_adelante_y_atras(self):
+        paginator = KeysetPaginator(self.queryset, ('-estado', 'id'), per_page=3)
+        paginas = [paginator.get_page()]
+        while paginas[-1].has_next:
+            paginas.append(paginator.get_page(paginas[-1].next_cursor))
+
+        self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 1])
+        self.assertEqual(sum((self.codigos(pagina) for pagina in paginas), []), self.orden)
+        self.assertFalse(paginas[0].has_previous)
+
+        anterior = paginator.get_page(paginas[2].previous_cursor)
+        self.assertEqual(self.codigos(anterior), self.codigos(paginas[1]))
+        self.assertTrue(anterior.has_next)
+        primera = paginator.get_page(anterior.previous_cursor)
+        self.assertEqual(self.codigos(primera), self.orden[:3])
+        self.assertFalse(primera.has_previous)
+
+    def test_pagina_exacta_no_tiene_siguiente(self):
+        paginator = KeysetPaginator(self.queryset, ('id',), per_page=7)
+        pagina = paginator.get_page()
+        self.assertEqual(len(pagina), 7)
+        self.assertFalse(pagina.has_other_pages())
+
+    def test_cursor_invalido_vuelve_al_inicio(self):
+        paginator = KeysetPaginator(self.queryset, ('-estado', 'id'), per_page=3)
+        for cursor in ('no-es-un-cursor', 'eyJ2IjogWzFdfQ=='):
+            self.assertEqual(self.codigos(paginator.get_page(cursor)), self.orden[:3])
+
+    def test_total_solo_si_se_pide(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(KeysetPaginator(self.queryset, ('id',), per_page=3).get_page().total)
+        self.assertEqual(KeysetPaginator(self.queryset, ('id',), per_page=3, contar=True).get_page().total, 7)
+
+
+class Archivo:
+    """Lo que respuesta_descarga usa de un FieldFile"""
+
+    def __init__(self, storage, name):
+        self.storage = storage
+        self.name = name
+
+    @property
+    def path(self):
+        return self.storage.path(self.name)
+
+
+class RespuestaDescargaTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        storage = FileSystemStorage(location=directorio.name)
+        self.archivo = Archivo(storage, storage.save('reporte.csv', ContentFile(CONTENIDO)))
+        self.factory = RequestFactory()
+        self.descargas = 0
+
+    def contar(self):
+        self.descargas += 1
+
+    def descargar(self, **cabeceras):
+        respuesta = respuesta_descarga(self.factory.get('/descargar/', headers=cabeceras), self.archivo,
+                                       al_descargar=self.contar)
+        cuerpo = b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+        return respuesta, cuerpo
+
+    def test_archivo_completo(self):
+        respuesta, cuerpo = self.descargar()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(cuerpo, CONTENIDO)
+        self.assertEqual(respuesta['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment', respuesta['Content-Disposition'])
+        self.assertEqual(self.descargas, 1)
+
+    def test_rango(self):
+        respuesta, cuerpo = self.descargar(Range='bytes=2-5')
+        self.assertEqual(respuesta.status_code, 206)
+        self.assertEqual(cuerpo, CONTENIDO[2:6])
+        self.assertEqual(respuesta['Content-Range'], f'bytes 2-5/{len(CONTENIDO)}')
+        self.assertEqual(respuesta['Content-Length'], '4')
+        # Las reanudaciones no cuentan como otra descarga
+        self.assertEqual(self.descargas, 0)
+
+    def test_rango_abierto_sufijo_y_fin_mayor_al_tamano(self):
+        self.assertEqual(self.descargar(Range='bytes=20-')[1], CONTENIDO[20:])
+        self.assertEqual(self.descargar(Range='bytes=-4')[1], CONTENIDO[-4:])
+        respuesta, cuerpo = self.descargar(Range='bytes=24-100')
+        self.assertEqual(cuerpo, CONTENIDO[24:])
+        self.assertEqual(respuesta['Content-Range'], f'bytes 24-25/{len(CONTENIDO)}')
+        self.assertEqual(self.descargar(Range='bytes=-100')[1], CONTENIDO)
+
+    def test_rango_desde_el_inicio_cuenta_la_descarga(self):
+        self.assertEqual(self.descargar(Range='bytes=0-9')[0].status_code, 206)
+        self.assertEqual(self.descargas, 1)
+
+    def test_rango_no_satisfacible(self):
+        for rango in (f'bytes={len(CONTENIDO)}-', 'bytes=10-5', 'bytes=-0'):
+            respuesta, _ = self.descargar(Range=rango)
+            self.assertEqual(respuesta.status_code, 416, rango)
+            self.assertEqual(respuesta['Content-Range'], f'bytes */{len(CONTENIDO)}')
+        self.assertEqual(self.descargas, 0)
+
+    def test_rangos_multiples_o_invalidos_envian_todo(self):
+        for rango in ('bytes=0-1,4-5', 'items=0-1', 'bytes=-'):
+            respuesta, cuerpo = self.descargar(Range=rango)
+            self.assertEqual((respuesta.status_code, cuerpo), (200, CONTENIDO), rango)
+
+    def test_if_range(self):
+        completa, _ = self.descargar()
+        etag, modificado = completa['ETag'], completa['Last-Modified']
+
+        self.assertEqual(self.descargar(Range='bytes=2-5', If_Range=etag)[0].status_code, 206)
+        self.assertEqual(self.descargar(Range='bytes=2-5', If_Range=modificado)[0].status_code, 206)
+
+        respuesta, cuerpo = self.descargar(Range='bytes=2-5', If_Range='"otra-version"')
+        self.assertEqual((respuesta.status_code, cuerpo), (200, CONTENIDO))
+        respuesta, cuerpo = self.descargar(Range='bytes=2-5', If_Range='Mon, 01 Jan 2001 00:00:00 GMT')
+        self.assertEqual((respuesta.status_code, cuerpo), (200, CONTENIDO))
+
+    def test_validacion_condicional(self):
+        etag = self.descargar()[0]['ETag']
+        self.assertEqual(self.descargar(If_None_Match=etag)[0].status_code, 304)
+        self.assertEqual(self.descargar(If_Match='"otra-version"')[0].status_code, 412)
+        # Ni 304 ni 412 cuentan como descarga
+        self.assertEqual(self.descargas, 1)
+
+
+@override_settings(CACHES=CACHE_LOCAL, WIDGETS_MAX_OBSOLETO_SEGUNDOS=3600)
+class WidgetsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.llamadas = []
+        PROVEEDORES['prueba'] = self.proveedor
+        self.addCleanup(PROVEEDORES.pop, 'prueba')
+        self.widget = Widget.objects.create(nombre='Contador', tipo='contador', fuente_datos='prueba',
+                                            parametros_datos={'valor': 1}, cache_duracion_segundos=300)
+
+    def proveedor(self, parametros):
+        self.llamadas.append(parametros)
+        return {'valor': parametros['valor'], 'llamada': len(self.llamadas)}
+
+    def envejecer(self, segundos):
+        self.widget.cache_actualizado = timezone.now() - timedelta(seconds=segundos)
+
+    def test_vigente_hasta_el_ttl(self):
+        self.assertEqual(datos_widget(self.widget)['estado'], 'calculado')
+        respuesta = datos_widget(self.widget)
+        self.assertEqual((respuesta['estado'], respuesta['datos']['llamada']), ('vigente', 1))
+
+        # Otra configuración no reutiliza los datos guardados
+        self.widget.parametros_datos = {'valor': 2}
+        self.assertEqual(datos_widget(self.widget)['datos'], {'valor': 2, 'llamada': 2})
+
+    def test_obsoleto_se_refresca_en_segundo_plano(self):
+        datos_widget(self.widget)
+        self.envejecer(301)
+        with mock.patch('components.widgets._programar_refresco') as programar:
+            respuesta = datos_widget(self.widget)
+        self.assertEqual((respuesta['estado'], respuesta['datos']['llamada']), ('obsoleto', 1))
+        programar.assert_called_once_with(self.widget)
+
+        # Demasiado viejo: se recalcula en la petición
+        self.envejecer(300 + 3601)
+        self.assertEqual(datos_widget(self.widget)['estado'], 'calculado')
+        self.assertEqual(len(self.llamadas), 2)
+
+    def test_fuente_desconocida(self):
+        self.widget.fuente_datos = 'no-existe'
+        respuesta = datos_widget(self.widget)
+        self.assertEqual((respuesta['estado'], respuesta['datos']), ('error', None))
+
+    def test_permisos_y_lote(self):
+        from usuarios.models import TipoUsuario
+        from usuarios.tests import crear_usuario
+
+        privado = Widget.objects.create(nombre='Costos', tipo='contador', fuente_datos='prueba',
+                                        parametros_datos={'valor': 3}, requiere_permisos=['ver_costos'])
+        Widget.objects.create(nombre='Inactivo', tipo='contador', fuente_datos='prueba', activo=False)
+        ids = list(Widget.objects.values_list('pk', flat=True))
+        user = User.objects.create_user('widgets')
+
+        def visibles(user, usuario=None):
+            return [fila['widget_id'] for fila in datos_widgets(ids, user, usuario)]
+
+        self.assertEqual(visibles(user), [self.widget.pk])
+        con_permiso = crear_usuario(TipoUsuario.objects.create(nombre='coordinador', permisos={'ver_costos': True}))
+        self.assertEqual(sorted(visibles(user, con_permiso)), [self.widget.pk, privado.pk])
+        self.assertEqual(len(visibles(User.objects.create_superuser('admin'))), 2)
@@ -49,4 +49,5 @@ urlpatterns = [
 
     # Dashboard widgets data
     path('api/widget/<int:widget_id>/actualizar/', views.actualizar_widget_api, name='api_actualizar_widget'),
+    path('api/widgets/datos/', views.datos_widgets_api, name='api_datos_widgets'),
 ]
\ No newline at end of file
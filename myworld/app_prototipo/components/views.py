@@ -1,9 +1,12 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 
+from .models import Widget
+from .widgets import MAX_WIDGETS_POR_PETICION, datos_widget, datos_widgets, permitido
+
 def components_view(request):
     return HttpResponse("Componentes del sistema SENA")
 
@@ -146,5 +149,23 @@ def version_api(request):
     return JsonResponse({'version': '1.0.0', 'build': 'prototype'})
 
 @login_required
+@require_http_methods(["POST"])
 def actualizar_widget_api(request, widget_id):
-    return JsonResponse({'success': True, 'data': {}})
\ No newline at end of file
+    """Recalcula los datos del widget sin esperar a que venza su cache"""
+    widget = get_object_or_404(Widget, pk=widget_id, activo=True)
+    if not permitido(widget, request.user, request.usuario or None):
+        return JsonResponse({'error': 'No tiene permisos para este widget'}, status=403)
+    resultado = datos_widget(widget, forzar=True)
+    return JsonResponse({'success': resultado['estado'] != 'error', **resultado},
+                        status=200 if resultado['estado'] != 'error' else 502)
+
+@login_required
+def datos_widgets_api(request):
+    """Datos de los widgets de un dashboard en una petición: ?ids=1,2,3"""
+    try:
+        ids = [int(valor) for valor in request.GET.get('ids', '').split(',') if valor.strip()]
+    except ValueError:
+        return JsonResponse({'error': 'ids debe ser una lista de números separados por comas'}, status=400)
+    if not ids or len(ids) > MAX_WIDGETS_POR_PETICION:
+        return JsonResponse({'error': f'Indique entre 1 y {MAX_WIDGETS_POR_PETICION} widgets en ids'}, status=400)
+    return JsonResponse({'widgets': datos_widgets(ids, request.user, request.usuario or None)})
@@ -0,0 +1,172 @@
+"""
+Datos de los widgets del dashboard.
+
+Widget.fuente_datos es el nombre de un proveedor registrado con @proveedor
+en el módulo `widgets` de cada aplicación; el proveedor recibe
+Widget.parametros_datos y devuelve datos serializables a JSON.
+
+El resultado se guarda en Widget.datos_cache / cache_actualizado y vale
+cache_duracion_segundos. Vencido ese plazo se sigue entregando el valor
+guardado mientras se recalcula en segundo plano (stale-while-revalidate),
+salvo que tenga más de WIDGETS_MAX_OBSOLETO_SEGUNDOS: entonces se recalcula
+en la misma petición.
+
+Widget.requiere_permisos es una lista de claves de TipoUsuario.permisos
+(cubiertas todas por {'all': true}) o de permisos de Django 'app.codigo';
+un widget solo se entrega a quien las cumple todas.
+"""
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Widget
+
+logger = logging.getLogger(__name__)
+
+# {nombre: función(parametros) -> datos}
+PROVEEDORES = {}
+
+_cargados = False
+_ejecutor = None
+
+# Widgets que se pueden pedir en una sola consulta de datos_widgets
+MAX_WIDGETS_POR_PETICION = 50
+
+
+class FuenteDesconocida(LookupError):
+    pass
+
+
+def proveedor(nombre):
+    def registrar(funcion):
+        PROVEEDORES[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def obtener_proveedor(nombre):
+    global _cargados
+    if not _cargados:
+        autodiscover_modules('widgets')
+        _cargados = True
+    try:
+        return PROVEEDORES[nombre]
+    except KeyError:
+        raise FuenteDesconocida(f'Fuente de datos desconocida: {nombre}')
+
+
+def _firma(widget):
+    """Cambia si cambia la fuente o los parámetros, para no servir datos de otra configuración"""
+    contenido = json.dumps([widget.fuente_datos, widget.parametros_datos], sort_keys=True, default=str)
+    return hashlib.md5(contenido.encode('utf-8')).hexdigest()
+
+
+def _guardado(widget):
+    cache_widget = widget.datos_cache or {}
+    if widget.cache_actualizado is None or cache_widget.get('firma') != _firma(widget):
+        return None
+    return cache_widget.get('datos')
+
+
+def calcular(widget):
+    """Ejecuta el proveedor y guarda el resultado en el widget"""
+    datos = obtener_proveedor(widget.fuente_datos)(dict(widget.parametros_datos or {}))
+    # Normaliza Decimal, fechas, etc. para el JSONField
+    datos = json.loads(json.dumps(datos, cls=DjangoJSONEncoder))
+    ahora = timezone.now()
+    widget.datos_cache = {'firma': _firma(widget), 'datos': datos}
+    widget.cache_actualizado = ahora
+    Widget.objects.filter(pk=widget.pk).update(datos_cache=widget.datos_cache, cache_actualizado=ahora)
+    return datos
+
+
+def _refrescar_en_segundo_plano(widget_id):
+    try:
+        widget = Widget.objects.filter(pk=widget_id, activo=True).first()
+        if widget is not None:
+            calcular(widget)
+    except Exception:
+        logger.exception('Error al refrescar el widget %s', widget_id)
+    finally:
+        cache.delete(f'widget:refrescando:{widget_id}')
+        connection.close()
+
+
+def _programar_refresco(widget):
+    global _ejecutor
+    # Un solo refresco por widget a la vez, también entre procesos
+    if not cache.add(f'widget:refrescando:{widget.pk}', True, timeout=max(widget.cache_duracion_segundos, 30)):
+        return
+    if _ejecutor is None:
+        _ejecutor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'WIDGETS_HILOS_REFRESCO', 2),
+            thread_name_prefix='widgets',
+            initializer=close_old_connections,
+        )
+    _ejecutor.submit(_refrescar_en_segundo_plano, widget.pk)
+
+
+def datos_widget(widget, forzar=False):
+    """
+    {'widget_id', 'datos', 'actualizado', 'estado'} con estado 'vigente',
+    'obsoleto' (se está recalculando), 'calculado' o 'error'.
+    """
+    respuesta = {'widget_id': widget.pk}
+    guardado = None if forzar else _guardado(widget)
+    if guardado is not None:
+        edad = timezone.now() - widget.cache_actualizado
+        maximo = getattr(settings, 'WIDGETS_MAX_OBSOLETO_SEGUNDOS', 3600)
+        if edad < timedelta(seconds=widget.cache_duracion_segundos):
+            estado = 'vigente'
+        elif edad < timedelta(seconds=widget.cache_duracion_segundos + maximo):
+            _programar_refresco(widget)
+            estado = 'obsoleto'
+        else:
+            guardado = None
+        if guardado is not None:
+            respuesta.update(datos=guardado, actualizado=widget.cache_actualizado, estado=estado)
+            return respuesta
+
+    try:
+        datos = calcular(widget)
+    except FuenteDesconocida as e:
+        respuesta.update(datos=None, actualizado=None, estado='error', error=str(e))
+        return respuesta
+    except Exception:
+        logger.exception('Error al calcular el widget %s', widget.pk)
+        anterior = (widget.datos_cache or {}).get('datos')
+        respuesta.update(datos=anterior, actualizado=widget.cache_actualizado, estado='error',
+                         error='No se pudieron calcular los datos')
+        return respuesta
+    respuesta.update(datos=datos, actualizado=widget.cache_actualizado, estado='calculado')
+    return respuesta
+
+
+def permitido(widget, user, usuario=None):
+    """El usuario (User de Django y su Usuario) cumple Widget.requiere_permisos"""
+    requeridos = widget.requiere_permisos or []
+    if isinstance(requeridos, str):
+        requeridos = [requeridos]
+    if not requeridos or user.is_superuser:
+        return True
+    permisos = {}
+    if usuario is not None and usuario.tipo_usuario_id:
+        permisos = usuario.tipo_usuario.permisos or {}
+    if permisos.get('all'):
+        return True
+    return all(permisos.get(permiso) or user.has_perm(permiso) for permiso in requeridos)
+
+
+def datos_widgets(ids, user, usuario=None):
+    """Datos de los widgets activos indicados que el usuario puede ver, con una sola consulta de widgets"""
+    widgets = Widget.objects.filter(activo=True, pk__in=ids)
+    return [datos_widget(widget) for widget in widgets if permitido(widget, user, usuario)]
@@ -0,0 +1,282 @@
+"""
+Generación automática de alertas de la flota.
+
+Cada regla declara el tipo y la prioridad de la alerta, la condición como
+un filtro Q sobre Maquina y el texto de la alerta. La condición se evalúa
+con una sola consulta sobre todas las máquinas activas y se descartan las
+que ya tienen una alerta abierta (activa o en proceso) con la huella de la
+regla; por eso ejecutar de nuevo no duplica alertas, y una alerta manual
+del mismo tipo con otro título no bloquea la automática. Las alertas y sus
+entradas de historial se crean con bulk_create y los contadores de la
+flota se ajustan con un solo aplicar_deltas.
+
+Las alertas manuales pasan por registrar_alerta: la huella (máquina, tipo y
+título normalizado) identifica repeticiones de una alerta abierta, que
+dentro de ALERTAS_VENTANA_DEDUPLICACION_SEGUNDOS solo suman una ocurrencia
+en la alerta existente. Además cada máquina admite como mucho
+ALERTAS_MAXIMO_POR_MAQUINA alertas nuevas por ALERTAS_VENTANA_LIMITE_SEGUNDOS.
+"""
+import calendar
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from components.cache import incrementar_version
+from .estadisticas import claves_alerta
+from .models import AlertaMaquina, ContadorFlota, HistorialMaquina, Maquina
+
+ESTADOS_INACTIVOS = ('fuera_servicio', 'retirada')
+ESTADOS_ABIERTOS = ('activa', 'en_proceso')
+
+ORDEN_PRIORIDAD = {'baja': 0, 'media': 1, 'alta': 2, 'critica': 3, 'emergencia': 4}
+
+
+class LimiteAlertasExcedido(Exception):
+    pass
+
+
+def normalizar_titulo(titulo):
+    """Minúsculas, sin tildes ni signos y con los espacios colapsados"""
+    texto = unicodedata.normalize('NFKD', titulo or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', texto.lower()).split())
+
+
+def calcular_huella(maquina_id, tipo, titulo):
+    contenido = f'{maquina_id}|{tipo}|{normalizar_titulo(titulo)}'
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+
+def _sumar_meses(fecha, meses):
+    mes = fecha.month - 1 + meses
+    anio, mes = fecha.year + mes // 12, mes % 12 + 1
+    return fecha.replace(year=anio, month=mes, day=min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+def _umbral(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+@dataclass
+class Regla:
+    tipo: str
+    prioridad: str
+    condicion: Callable  # (hoy) -> Q sobre Maquina
+    titulo: str
+    descripcion: Callable  # (maquina, hoy) -> str
+    campos: tuple = ()
+
+
+def _mantenimiento_vencido(hoy):
+    return Q(proximo_mantenimiento__lt=hoy)
+
+
+def _baja_eficiencia(hoy):
+    return Q(eficiencia__lt=_umbral('ALERTAS_EFICIENCIA_MINIMA', 70))
+
+
+def _uso_excesivo(hoy):
+    return Q(horas_uso_mes__gt=_umbral('ALERTAS_HORAS_USO_MES_MAXIMO', 200))
+
+
+def _garantia_por_vencer(hoy):
+    """
+    fecha_adquisicion + garantia_meses entre hoy y el aviso. Se traduce a un
+    rango sobre fecha_adquisicion por cada duración de garantía distinta.
+    """
+    limite = hoy + timedelta(days=_umbral('ALERTAS_GARANTIA_DIAS', 30))
+    condicion = Q(pk__in=[])
+    meses_distintos = Maquina.objects.filter(garantia_meses__gt=0).values_list('garantia_meses', flat=True).distinct()
+    for meses in meses_distintos:
+        condicion |= Q(garantia_meses=meses,
+                       fecha_adquisicion__gte=_sumar_meses(hoy, -meses),
+                       fecha_adquisicion__lte=_sumar_meses(limite, -meses))
+    return condicion
+
+
+REGLAS = [
+    Regla(
+        tipo='mantenimiento',
+        prioridad='alta',
+        condicion=_mantenimiento_vencido,
+        titulo='Mantenimiento vencido',
+        descripcion=lambda maquina, hoy: (
+            f'El mantenimiento debía realizarse el {maquina.proximo_mantenimiento:%d/%m/%Y} '
+            f'({(hoy - maquina.proximo_mantenimiento).days} días de retraso).'
+        ),
+        campos=('proximo_mantenimiento',),
+    ),
+    Regla(
+        tipo='eficiencia',
+        prioridad='media',
+        condicion=_baja_eficiencia,
+        titulo='Baja eficiencia',
+        descripcion=lambda maquina, hoy: (
+            f'Eficiencia de {maquina.eficiencia}%, por debajo del mínimo de '
+            f'{_umbral("ALERTAS_EFICIENCIA_MINIMA", 70)}%.'
+        ),
+        campos=('eficiencia',),
+    ),
+    Regla(
+        tipo='uso_excesivo',
+        prioridad='media',
+        condicion=_uso_excesivo,
+        titulo='Uso excesivo',
+        descripcion=lambda maquina, hoy: (
+            f'{maquina.horas_uso_mes} horas de uso este mes, por encima del límite de '
+            f'{_umbral("ALERTAS_HORAS_USO_MES_MAXIMO", 200)}.'
+        ),
+        campos=('horas_uso_mes',),
+    ),
+    Regla(
+        tipo='garantia',
+        prioridad='baja',
+        condicion=_garantia_por_vencer,
+        titulo='Garantía por vencer',
+        descripcion=lambda maquina, hoy: (
+            f'La garantía de {maquina.garantia_meses} meses vence el '
+            f'{_sumar_meses(maquina.fecha_adquisicion, maquina.garantia_meses):%d/%m/%Y}.'
+        ),
+        campos=('fecha_adquisicion', 'garantia_meses'),
+    ),
+]
+
+
+@dataclass
+class ResultadoAlertas:
+    creadas: int = 0
+    por_tipo: dict = field(default_factory=dict)
+
+    def as_dict(self):
+        return {'creadas': self.creadas, 'por_tipo': self.por_tipo}
+
+
+def evaluar_regla(regla, hoy):
+    """
+    Máquinas activas que cumplen la regla y no tienen una alerta abierta con
+    su huella. La huella se calcula aquí desde el título de las alertas
+    abiertas del tipo, así que también cuentan las que no la tienen guardada.
+    """
+    titulo = normalizar_titulo(regla.titulo)
+    con_alerta = {
+        maquina_id
+        for maquina_id, titulo_abierta in AlertaMaquina.objects.filter(
+            tipo=regla.tipo, estado__in=ESTADOS_ABIERTOS).values_list('maquina_id', 'titulo')
+        if normalizar_titulo(titulo_abierta) == titulo
+    }
+    candidatas = (Maquina.objects.exclude(estado__in=ESTADOS_INACTIVOS)
+                  .filter(regla.condicion(hoy))
+                  .only('id', 'codigo_inventario', *regla.campos)
+                  .order_by('pk'))
+    for maquina in candidatas.iterator(chunk_size=2000):
+        if maquina.pk not in con_alerta:
+            yield maquina
+
+
+def generar_alertas(tipos=None, simular=False):
+    """
+    Evalúa las reglas (todas o las de `tipos`) y crea las alertas nuevas.
+    Con `simular` solo cuenta las que se crearían.
+    """
+    hoy = timezone.localdate()
+    ahora = timezone.now()
+    resultado = ResultadoAlertas()
+    nuevas = []
+    for regla in REGLAS:
+        if tipos and regla.tipo not in tipos:
+            continue
+        encontradas = [
+            AlertaMaquina(
+                maquina=maquina,
+                tipo=regla.tipo,
+                prioridad=regla.prioridad,
+                titulo=regla.titulo,
+                descripcion=regla.descripcion(maquina, hoy),
+                estado='activa',
+                huella=calcular_huella(maquina.pk, regla.tipo, regla.titulo),
+                ultima_ocurrencia=ahora,
+            ) for maquina in evaluar_regla(regla, hoy)
+        ]
+        resultado.por_tipo[regla.tipo] = len(encontradas)
+        nuevas.extend(encontradas)
+
+    resultado.creadas = len(nuevas)
+    if simular or not nuevas:
+        return resultado
+
+    with transaction.atomic():
+        AlertaMaquina.objects.bulk_create(nuevas, batch_size=500)
+        HistorialMaquina.objects.bulk_create([
+            HistorialMaquina(
+                maquina_id=alerta.maquina_id,
+                tipo_evento='alerta_creada',
+                descripcion=f'Alerta creada automáticamente: {alerta.titulo} (Prioridad: {alerta.prioridad})',
+            ) for alerta in nuevas
+        ], batch_size=500)
+        # bulk_create no envía señales: los contadores se ajustan aquí
+        deltas = Counter()
+        for alerta in nuevas:
+            deltas.update(claves_alerta(alerta.estado, alerta.prioridad))
+        ContadorFlota.aplicar_deltas(deltas)
+
+    incrementar_version(AlertaMaquina, HistorialMaquina)
+    return resultado
+
+
+def registrar_alerta(maquina, tipo, prioridad, titulo, descripcion, usuario=None):
+    """
+    Crea la alerta o, si hay una abierta con la misma huella y ocurrida
+    dentro de la ventana, le suma una ocurrencia (y sube su prioridad si la
+    nueva es mayor). Devuelve (alerta, creada, prioridad_anterior), esta
+    última solo si se subió la prioridad. Lanza LimiteAlertasExcedido si la
+    máquina superó su límite de alertas nuevas.
+    """
+    ahora = timezone.now()
+    huella = calcular_huella(maquina.pk, tipo, titulo)
+    ventana = timedelta(seconds=_umbral('ALERTAS_VENTANA_DEDUPLICACION_SEGUNDOS', 3600))
+
+    with transaction.atomic():
+        existente = (AlertaMaquina.objects.select_for_update()
+                     .filter(huella=huella, estado__in=ESTADOS_ABIERTOS, ultima_ocurrencia__gte=ahora - ventana)
+                     .order_by('-ultima_ocurrencia').first())
+        if existente is not None:
+            existente.ocurrencias += 1
+            existente.ultima_ocurrencia = ahora
+            campos = ['ocurrencias', 'ultima_ocurrencia']
+            prioridad_anterior = None
+            if ORDEN_PRIORIDAD.get(prioridad, 0) > ORDEN_PRIORIDAD.get(existente.prioridad, 0):
+                prioridad_anterior = existente.prioridad
+                existente.prioridad = prioridad
+                campos.append('prioridad')
+            # save() y no update(): las señales mantienen contadores y versiones
+            existente.save(update_fields=campos)
+            return existente, False, prioridad_anterior
+
+        limite = _umbral('ALERTAS_MAXIMO_POR_MAQUINA', 10)
+        desde = ahora - timedelta(seconds=_umbral('ALERTAS_VENTANA_LIMITE_SEGUNDOS', 600))
+        if AlertaMaquina.objects.filter(maquina=maquina, fecha_creacion__gte=desde).count() >= limite:
+            raise LimiteAlertasExcedido(
+                f'La máquina {maquina.codigo_inventario} ya tiene {limite} alertas nuevas en los últimos '
+                f'{int((ahora - desde).total_seconds() // 60)} minutos'
+            )
+
+        alerta = AlertaMaquina.objects.create(
+            maquina=maquina,
+            tipo=tipo,
+            prioridad=prioridad,
+            titulo=titulo,
+            descripcion=descripcion,
+            estado='activa',
+            created_by=usuario,
+            huella=huella,
+            ultima_ocurrencia=ahora,
+        )
+    return alerta, True, None
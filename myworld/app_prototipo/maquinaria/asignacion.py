@@ -0,0 +1,210 @@
+"""
+Asignación de técnicos a mantenimientos programados.
+
+Los mantenimientos sin técnico de la ventana (y los vencidos) se recorren
+por prioridad y fecha (algoritmo voraz). Cada técnico tiene su agenda como intervalos
+[inicio, inicio + duracion_estimada) ordenados, que parte de los
+mantenimientos que ya tiene asignados. Para cada mantenimiento se busca,
+entre los técnicos de su centro de formación (o de cualquier centro si el
+suyo no tiene), el hueco libre más temprano desde la fecha programada; a
+igual hora se prefiere al técnico con menos carga. Si el hueco es posterior
+a la fecha programada el mantenimiento se desplaza, siempre dentro de la
+ventana, y el resultado no tiene solapamientos por técnico.
+"""
+from bisect import insort
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, Exists, Max, OuterRef, Value, When
+from django.utils import timezone
+
+from components.cache import incrementar_version
+from usuarios.models import Usuario
+from .models import MantenimientoProgramado
+
+ESTADOS_PENDIENTES = ('programado', 'postergado')
+ESTADOS_OCUPAN = ('programado', 'en_progreso', 'postergado')
+
+ORDEN_PRIORIDAD = {'emergencia': 0, 'critica': 1, 'alta': 2, 'media': 3, 'baja': 4}
+
+
+def tecnicos():
+    """
+    Usuarios activos que pueden recibir mantenimientos. Con
+    MANTENIMIENTO_TIPOS_TECNICO se limita a esos tipos de usuario.
+    """
+    usuarios = Usuario.objects.filter(estado='activo')
+    tipos = getattr(settings, 'MANTENIMIENTO_TIPOS_TECNICO', None)
+    if tipos:
+        usuarios = usuarios.filter(tipo_usuario__nombre__in=tipos)
+    return usuarios
+
+
+def tecnicos_con_estado():
+    """
+    Técnicos con estado_actual 'ocupado' si tienen un mantenimiento en
+    progreso o 'disponible'. Con Exists queda una fila por técnico.
+    """
+    en_progreso = MantenimientoProgramado.objects.filter(tecnico_asignado=OuterRef('pk'), estado='en_progreso')
+    return tecnicos().annotate(
+        estado_actual=Case(
+            When(Exists(en_progreso), then=Value('ocupado')),
+            default=Value('disponible'),
+            output_field=CharField(),
+        )
+    ).order_by('nombres', 'apellidos')
+
+
+class Agenda:
+    """Intervalos ocupados de un técnico, ordenados por inicio"""
+
+    def __init__(self):
+        self.intervalos = []
+        self.carga = timedelta(0)
+
+    def agregar(self, inicio, fin):
+        insort(self.intervalos, (inicio, fin))
+        self.carga += fin - inicio
+
+    def primer_hueco(self, desde, duracion):
+        """Inicio más temprano >= desde con `duracion` libre"""
+        inicio = desde
+        for ocupado_desde, ocupado_hasta in self.intervalos:
+            if ocupado_hasta <= inicio:
+                continue
+            if ocupado_desde >= inicio + duracion:
+                break
+            inicio = ocupado_hasta
+        return inicio
+
+
+@dataclass
+class PlanAsignacion:
+    desde: object
+    hasta: object
+    asignaciones: list = field(default_factory=list)
+    sin_asignar: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            'desde': self.desde,
+            'hasta': self.hasta,
+            'total_asignados': len(self.asignaciones),
+            'total_sin_asignar': len(self.sin_asignar),
+            'asignaciones': self.asignaciones,
+            'sin_asignar': self.sin_asignar,
+        }
+
+
+def calcular_plan(desde=None, hasta=None, reasignar=False, incluir_vencidos=True, bloquear=False):
+    """
+    Plan para los mantenimientos pendientes con fecha en [desde, hasta)
+    (por defecto, desde ahora y 14 días). Los vencidos antes de `desde` se
+    reprograman desde `desde` salvo que no se incluyan. Con `reasignar`
+    también se redistribuyen los que ya tienen técnico. Con `bloquear` (dentro
+    de una transacción) los pendientes se leen con select_for_update antes de
+    leer la carga existente, así dos planes simultáneos no se cruzan.
+    """
+    desde = desde or timezone.now()
+    hasta = hasta or desde + timedelta(days=14)
+    plan = PlanAsignacion(desde=desde, hasta=hasta)
+
+    personal = {tecnico.pk: tecnico for tecnico in tecnicos().only('id', 'nombres', 'apellidos', 'centro_formacion')}
+    por_centro = defaultdict(list)
+    for tecnico in personal.values():
+        por_centro[tecnico.centro_formacion].append(tecnico.pk)
+
+    pendientes = (MantenimientoProgramado.objects
+                  .filter(estado__in=ESTADOS_PENDIENTES, fecha_programada__lt=hasta)
+                  .select_related('maquina')
+                  .only('id', 'titulo', 'prioridad', 'fecha_programada', 'duracion_estimada', 'tecnico_asignado_id',
+                        'maquina__codigo_inventario', 'maquina__centro_formacion'))
+    if not incluir_vencidos:
+        pendientes = pendientes.filter(fecha_programada__gte=desde)
+    if not reasignar:
+        pendientes = pendientes.filter(tecnico_asignado__isnull=True)
+    if bloquear:
+        pendientes = pendientes.select_for_update(of=('self',))
+    pendientes = sorted(pendientes, key=lambda m: (ORDEN_PRIORIDAD.get(m.prioridad, 9), m.fecha_programada, m.pk))
+
+    # Carga existente: lo asignado que puede solaparse con la ventana. Lo que
+    # empezó antes de `desde` se acota con la mayor duración ya asignada
+    agendas = {pk: Agenda() for pk in personal}
+    asignados = MantenimientoProgramado.objects.filter(
+        estado__in=ESTADOS_OCUPAN, tecnico_asignado__in=list(personal), fecha_programada__lt=hasta
+    ).exclude(pk__in=[m.pk for m in pendientes])
+    margen = asignados.aggregate(mayor=Max('duracion_estimada'))['mayor'] or timedelta(0)
+    ocupados = (asignados.filter(fecha_programada__gt=desde - margen)
+                .values_list('tecnico_asignado_id', 'fecha_programada', 'duracion_estimada'))
+    for tecnico_id, inicio, duracion in ocupados:
+        agendas[tecnico_id].agregar(inicio, inicio + duracion)
+
+    for mantenimiento in pendientes:
+        duracion = mantenimiento.duracion_estimada
+        programada = max(mantenimiento.fecha_programada, desde)
+        centro = mantenimiento.maquina.centro_formacion
+        candidatos = por_centro.get(centro) or list(personal)
+        if not candidatos:
+            plan.sin_asignar.append({'mantenimiento_id': mantenimiento.pk, 'motivo': 'No hay técnicos activos'})
+            continue
+
+        inicio, _, tecnico_id = min(
+            (agendas[pk].primer_hueco(programada, duracion), agendas[pk].carga, pk)
+            for pk in candidatos
+        )
+        if inicio >= hasta:
+            plan.sin_asignar.append({
+                'mantenimiento_id': mantenimiento.pk,
+                'motivo': 'Ningún técnico tiene un hueco libre dentro de la ventana',
+            })
+            continue
+
+        agendas[tecnico_id].agregar(inicio, inicio + duracion)
+        tecnico = personal[tecnico_id]
+        plan.asignaciones.append({
+            'mantenimiento_id': mantenimiento.pk,
+            'maquina': mantenimiento.maquina.codigo_inventario,
+            'titulo': mantenimiento.titulo,
+            'prioridad': mantenimiento.prioridad,
+            'tecnico_id': tecnico_id,
+            'tecnico': tecnico.nombre_completo,
+            'tecnico_anterior_id': mantenimiento.tecnico_asignado_id,
+            'fecha_anterior': mantenimiento.fecha_programada,
+            'inicio': inicio,
+            'fin': inicio + duracion,
+            'desplazado': inicio != mantenimiento.fecha_programada,
+            'mismo_centro': tecnico.centro_formacion == centro,
+        })
+    return plan
+
+
+def aplicar_plan(plan):
+    """
+    Guarda técnico y fecha de las asignaciones. Cada UPDATE exige que el
+    mantenimiento siga pendiente y con el técnico y la fecha con que se
+    calculó el plan; los que cambiaron entretanto pasan a sin_asignar.
+    """
+    ahora = timezone.now()
+    aplicadas, omitidas = [], []
+    with transaction.atomic():
+        for asignacion in plan.asignaciones:
+            actualizados = MantenimientoProgramado.objects.filter(
+                pk=asignacion['mantenimiento_id'],
+                estado__in=ESTADOS_PENDIENTES,
+                tecnico_asignado_id=asignacion['tecnico_anterior_id'],
+                fecha_programada=asignacion['fecha_anterior'],
+            ).update(tecnico_asignado_id=asignacion['tecnico_id'], fecha_programada=asignacion['inicio'],
+                     updated_at=ahora)
+            (aplicadas if actualizados else omitidas).append(asignacion)
+    plan.asignaciones = aplicadas
+    plan.sin_asignar.extend(
+        {'mantenimiento_id': asignacion['mantenimiento_id'], 'motivo': 'Cambió mientras se aplicaba el plan'}
+        for asignacion in omitidas
+    )
+    if aplicadas:
+        # update() no envía señales
+        incrementar_version(MantenimientoProgramado)
+    return len(aplicadas)
@@ -0,0 +1,194 @@
+"""
+Autocompletado de máquinas por prefijo de código o nombre.
+
+El índice vive en memoria de cada proceso: listas ordenadas de claves
+normalizadas sobre las que se busca el prefijo con bisect. Cuando cambia la
+versión de Maquina en components.cache (también por cambios hechos en otro
+proceso) solo se aplican las máquinas con updated_at posterior a la última
+carga; comparando los ids de la tabla con los del índice se quitan las
+eliminadas y se cargan las nuevas que no entraron por updated_at. Un solo
+hilo por proceso actualiza el índice mientras los demás siguen respondiendo
+con el anterior. Las respuestas de cada prefijo se guardan en un LRU que se
+vacía con cada actualización.
+"""
+import logging
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from components.cache import obtener_versiones
+from .models import Maquina
+
+logger = logging.getLogger(__name__)
+
+# Los cambios se releen desde un poco antes de la última carga, por las
+# transacciones que confirman después de haber fijado su updated_at
+MARGEN_CAMBIOS = timedelta(minutes=5)
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes, para comparar prefijos"""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower().strip()
+
+
+def claves_maquina(codigo, nombre):
+    """Clave del código y claves del nombre (el nombre completo y cada palabra, para "excavadora ca" y "hidráulica")"""
+    nombre_normalizado = normalizar(nombre)
+    return normalizar(codigo), {nombre_normalizado, *nombre_normalizado.split()}
+
+
+class IndicePrefijos:
+    def __init__(self, tamano_cache=2048):
+        self.tamano_cache = tamano_cache
+        self.version = None
+        self.marca = None
+        self._maquinas = {}
+        self._codigos = []
+        self._nombres = []
+        self._respuestas = OrderedDict()
+        self._lock = threading.Lock()
+        self._actualizando = threading.Lock()
+
+    def _publicar(self, maquinas, codigos, nombres, version, marca):
+        with self._lock:
+            self._maquinas = maquinas
+            self._codigos = codigos
+            self._nombres = nombres
+            self._respuestas.clear()
+            self.version = version
+            self.marca = marca
+
+    def construir(self, version=None):
+        """Carga id, código, nombre y estado de todas las máquinas"""
+        if version is None:
+            version = obtener_versiones(Maquina)['maquinaria.maquina']
+
+        maquinas = {}
+        codigos = []
+        nombres = []
+        marca = None
+        filas = Maquina.objects.values_list('id', 'codigo_inventario', 'nombre', 'estado', 'updated_at')
+        for pk, codigo, nombre, estado, actualizado in filas.iterator(chunk_size=2000):
+            maquinas[pk] = {'id': pk, 'codigo': codigo, 'nombre': nombre, 'estado': estado}
+            clave_codigo, claves_nombre = claves_maquina(codigo, nombre)
+            codigos.append((clave_codigo, pk))
+            nombres.extend((clave, pk) for clave in claves_nombre)
+            marca = actualizado if marca is None else max(marca, actualizado)
+        codigos.sort()
+        nombres.sort()
+        self._publicar(maquinas, codigos, nombres, version, marca)
+
+    def aplicar_cambios(self, version):
+        """Aplica las máquinas modificadas desde la última carga sobre copias de las listas"""
+        if self.marca is None:
+            return self.construir(version)
+        campos = ('id', 'codigo_inventario', 'nombre', 'estado', 'updated_at')
+        # Un conteo no basta: una eliminación y una creación lo dejan igual
+        ids_actuales = set(Maquina.objects.values_list('id', flat=True))
+        filas = list(Maquina.objects.filter(updated_at__gte=self.marca - MARGEN_CAMBIOS).values_list(*campos))
+        # Filas nuevas con updated_at anterior a la marca (loaddata, restauraciones)
+        faltantes = ids_actuales - self._maquinas.keys() - {fila[0] for fila in filas}
+        if faltantes:
+            filas.extend(Maquina.objects.filter(pk__in=faltantes).values_list(*campos))
+        maquinas = dict(self._maquinas)
+        codigos = list(self._codigos)
+        nombres = list(self._nombres)
+        marca = self.marca
+
+        for pk in maquinas.keys() - ids_actuales:
+            _quitar_maquina(maquinas.pop(pk), codigos, nombres)
+
+        for pk, codigo, nombre, estado, actualizado in filas:
+            anterior = maquinas.get(pk)
+            if anterior is not None:
+                _quitar_maquina(anterior, codigos, nombres)
+            maquinas[pk] = {'id': pk, 'codigo': codigo, 'nombre': nombre, 'estado': estado}
+            clave_codigo, claves_nombre = claves_maquina(codigo, nombre)
+            insort(codigos, (clave_codigo, pk))
+            for clave in claves_nombre:
+                insort(nombres, (clave, pk))
+            marca = max(marca, actualizado)
+        self._publicar(maquinas, codigos, nombres, version, marca)
+
+    def actualizar_si_cambio(self):
+        version = obtener_versiones(Maquina)['maquinaria.maquina']
+        if version == self.version:
+            return
+        # Sin índice hay que esperar; con índice, si otro hilo ya lo está
+        # actualizando se responde con el actual
+        if not self._actualizando.acquire(blocking=self.version is None):
+            return
+        try:
+            version = obtener_versiones(Maquina)['maquinaria.maquina']
+            if version != self.version:
+                self.aplicar_cambios(version)
+        finally:
+            self._actualizando.release()
+
+    def buscar(self, texto, limite=10):
+        """Sugerencias {id, codigo, nombre, estado}: primero por código y luego por nombre"""
+        prefijo = normalizar(texto)
+        if not prefijo:
+            return []
+        self.actualizar_si_cambio()
+
+        clave = (prefijo, limite)
+        with self._lock:
+            if clave in self._respuestas:
+                self._respuestas.move_to_end(clave)
+                return self._respuestas[clave]
+            maquinas, codigos, nombres = self._maquinas, self._codigos, self._nombres
+
+        ids = []
+        for claves in (codigos, nombres):
+            posicion = bisect_left(claves, (prefijo,))
+            while posicion < len(claves) and len(ids) < limite:
+                valor, pk = claves[posicion]
+                if not valor.startswith(prefijo):
+                    break
+                if pk not in ids:
+                    ids.append(pk)
+                posicion += 1
+        resultados = [maquinas[pk] for pk in ids]
+
+        with self._lock:
+            if self._maquinas is not maquinas:
+                # El índice se actualizó mientras tanto: no se guarda una respuesta vieja
+                return resultados
+            self._respuestas[clave] = resultados
+            while len(self._respuestas) > self.tamano_cache:
+                self._respuestas.popitem(last=False)
+        return resultados
+
+
+def _quitar(claves, elemento):
+    posicion = bisect_left(claves, elemento)
+    if posicion < len(claves) and claves[posicion] == elemento:
+        del claves[posicion]
+
+
+def _quitar_maquina(maquina, codigos, nombres):
+    clave_codigo, claves_nombre = claves_maquina(maquina['codigo'], maquina['nombre'])
+    _quitar(codigos, (clave_codigo, maquina['id']))
+    for clave in claves_nombre:
+        _quitar(nombres, (clave, maquina['id']))
+
+
+indice_maquinas = IndicePrefijos(
+    tamano_cache=getattr(settings, 'AUTOCOMPLETADO_CACHE_TAMANO', 2048),
+)
+
+
+def precargar_indice():
+    """Construye el índice al iniciar el servidor para que la primera sugerencia sea rápida"""
+    try:
+        indice_maquinas.construir()
+    except DatabaseError:
+        # Base sin migrar: el índice se construirá en la primera búsqueda
+        logger.warning('No se pudo precargar el índice de autocompletado de máquinas')
@@ -0,0 +1,199 @@
+"""
+Búsqueda de máquinas por texto.
+
+En SQLite se usa una tabla virtual FTS5 (maquinaria_maquina_fts) cuyo rowid
+es el id de la máquina y que se mantiene sincronizada con señales. En otras
+bases se usa el filtro icontains. Ambos backends buscan por prefijo todas las
+palabras de la consulta sobre los CAMPOS_BUSQUEDA.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, IntegerField, Q, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Maquina
+
+CAMPOS_BUSQUEDA = (
+    'codigo_inventario',
+    'nombre',
+    'marca',
+    'modelo',
+    'numero_serie',
+    'especificaciones_tecnicas',
+)
+
+# Peso de cada campo en el ranking bm25 (mismo orden que CAMPOS_BUSQUEDA)
+PESOS_BUSQUEDA = (10.0, 5.0, 3.0, 3.0, 8.0, 1.0)
+
+TABLA_FTS = 'maquinaria_maquina_fts'
+
+
+def terminos(consulta):
+    """Palabras de la consulta, sin signos de puntuación"""
+    return re.findall(r'\w+', consulta or '')
+
+
+class BackendBusqueda:
+    """Interfaz de los backends de búsqueda"""
+
+    def filtrar(self, queryset, consulta):
+        """Restringe el queryset a las máquinas que coinciden, sin cambiar su orden"""
+        raise NotImplementedError
+
+    def buscar(self, consulta, queryset=None, limite=10):
+        """Máquinas que coinciden ordenadas por relevancia"""
+        raise NotImplementedError
+
+    def indexar(self, maquina):
+        pass
+
+    def eliminar(self, pk):
+        pass
+
+    def indexar_ids(self, ids):
+        """Reindexa un lote de máquinas (operaciones masivas que no emiten señales)"""
+        pass
+
+    def reconstruir(self):
+        """Regenera el índice completo; devuelve el número de máquinas indexadas"""
+        return 0
+
+
+class BackendIcontains(BackendBusqueda):
+    """Filtro LIKE sobre las columnas; no requiere índice"""
+
+    def _filtro(self, consulta):
+        filtro = Q()
+        for termino in terminos(consulta):
+            coincidencia = Q()
+            for campo in CAMPOS_BUSQUEDA:
+                coincidencia |= Q(**{f'{campo}__icontains': termino})
+            filtro &= coincidencia
+        return filtro
+
+    def filtrar(self, queryset, consulta):
+        if not terminos(consulta):
+            return queryset.none()
+        return queryset.filter(self._filtro(consulta))
+
+    def buscar(self, consulta, queryset=None, limite=10):
+        queryset = Maquina.objects.all() if queryset is None else queryset
+        return list(self.filtrar(queryset, consulta).order_by('codigo_inventario')[:limite])
+
+
+class BackendFTS5(BackendBusqueda):
+    """Índice FTS5 de SQLite con búsqueda por prefijo y ranking bm25"""
+
+    def expresion(self, consulta):
+        """Consulta FTS5: todos los términos, cada uno como prefijo"""
+        return ' '.join('"{}"*'.format(termino.replace('"', '')) for termino in terminos(consulta))
+
+    def filtrar(self, queryset, consulta):
+        expresion = self.expresion(consulta)
+        if not expresion:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s', (expresion,)
+        ))
+
+    def _bm25(self):
+        pesos = ', '.join(str(peso) for peso in PESOS_BUSQUEDA)
+        return f'bm25({TABLA_FTS}, {pesos})'
+
+    def ids_por_relevancia(self, consulta, limite=None):
+        expresion = self.expresion(consulta)
+        if not expresion:
+            return []
+        sql = f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s ORDER BY {self._bm25()}'
+        parametros = [expresion]
+        if limite is not None:
+            sql += ' LIMIT %s'
+            parametros.append(limite)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, parametros)
+            return [fila[0] for fila in cursor.fetchall()]
+
+    def relevancia(self, consulta):
+        """
+        bm25 de cada máquina para la consulta (menor es más relevante). La
+        subconsulta busca la fila del índice por rowid, así que solo se evalúa
+        para las máquinas que ya pasaron los filtros.
+        """
+        columna_id = '{}.{}'.format(connection.ops.quote_name(Maquina._meta.db_table),
+                                    connection.ops.quote_name(Maquina._meta.pk.column))
+        return RawSQL(
+            f'SELECT {self._bm25()} FROM {TABLA_FTS} '
+            f'WHERE {TABLA_FTS} MATCH %s AND {TABLA_FTS}.rowid = {columna_id}',
+            (self.expresion(consulta),),
+            output_field=FloatField(),
+        )
+
+    def buscar(self, consulta, queryset=None, limite=10):
+        queryset = Maquina.objects.all() if queryset is None else queryset
+        if not self.expresion(consulta):
+            return []
+        if queryset.query.has_filters():
+            # Filtro y orden en la misma consulta, sin pasar los ids por parámetros
+            return list(self.filtrar(queryset, consulta)
+                        .annotate(relevancia=self.relevancia(consulta))
+                        .order_by('relevancia', 'pk')[:limite])
+
+        # Sin filtros basta con los primeros ids del índice
+        ids = self.ids_por_relevancia(consulta, limite)
+        if not ids:
+            return []
+        orden = Case(*[When(pk=pk, then=posicion) for posicion, pk in enumerate(ids)],
+                     output_field=IntegerField())
+        return list(queryset.filter(pk__in=ids).order_by(orden))
+
+    def indexar(self, maquina):
+        valores = [getattr(maquina, campo) or '' for campo in CAMPOS_BUSQUEDA]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid = %s', [maquina.pk])
+            cursor.execute(
+                f'INSERT INTO {TABLA_FTS} (rowid, {", ".join(CAMPOS_BUSQUEDA)}) '
+                f'VALUES (%s, {", ".join(["%s"] * len(CAMPOS_BUSQUEDA))})',
+                [maquina.pk, *valores]
+            )
+
+    def eliminar(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid = %s', [pk])
+
+    def indexar_ids(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        columnas = ', '.join(CAMPOS_BUSQUEDA)
+        marcadores = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid IN ({marcadores})', ids)
+            cursor.execute(
+                f'INSERT INTO {TABLA_FTS} (rowid, {columnas}) '
+                f'SELECT id, {columnas} FROM {Maquina._meta.db_table} WHERE id IN ({marcadores})',
+                ids
+            )
+
+    def reconstruir(self):
+        columnas = ', '.join(CAMPOS_BUSQUEDA)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLA_FTS}')
+            cursor.execute(
+                f'INSERT INTO {TABLA_FTS} (rowid, {columnas}) '
+                f'SELECT id, {columnas} FROM {Maquina._meta.db_table}'
+            )
+            cursor.execute(f'SELECT COUNT(*) FROM {TABLA_FTS}')
+            return cursor.fetchone()[0]
+
+
+def obtener_backend():
+    """Backend configurado en MAQUINARIA_BUSQUEDA_BACKEND o el adecuado para la base"""
+    ruta = getattr(settings, 'MAQUINARIA_BUSQUEDA_BACKEND', None)
+    if ruta:
+        return import_string(ruta)()
+    if connection.vendor == 'sqlite':
+        return BackendFTS5()
+    return BackendIcontains()
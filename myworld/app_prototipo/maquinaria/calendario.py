@@ -0,0 +1,173 @@
+"""
+Calendario de mantenimientos programados.
+
+Las ventanas se filtran con límites de fecha y hora sobre fecha_programada
+(fecha_programada >= inicio y < fin), que usan su índice, en lugar de
+lookups __date que aplican una función a cada fila. Los eventos se agrupan
+por día local, técnico o máquina y los solapes se detectan con un barrido
+por inicio sobre cada máquina o técnico.
+"""
+from collections import defaultdict
+from datetime import datetime, time as hora, timedelta
+
+from django.db.models import Count, F, Max, Q, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from components.cache import obtener_o_calcular
+from .models import MantenimientoProgramado
+
+ESTADOS_ACTIVOS = ('programado', 'en_progreso', 'postergado')
+
+AGRUPACIONES = ('dia', 'tecnico', 'maquina')
+
+# Ventana máxima que se acepta en una consulta del calendario
+MAX_DIAS_VENTANA = 92
+
+
+def inicio_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, hora.min))
+
+
+def rango(desde, hasta):
+    """Filtro para fechas locales [desde, hasta] sobre fecha_programada"""
+    return Q(fecha_programada__gte=inicio_dia(desde), fecha_programada__lt=inicio_dia(hasta + timedelta(days=1)))
+
+
+def resumen_dashboard(hoy=None):
+    """Conteos del dashboard de mantenimiento en una sola consulta"""
+    hoy = hoy or timezone.localdate()
+    return MantenimientoProgramado.objects.aggregate(
+        mantenimientos_hoy=Count('id', filter=Q(estado='programado') & rango(hoy, hoy)),
+        mantenimientos_pendientes=Count('id', filter=Q(estado='programado') & rango(hoy, hoy + timedelta(days=7))),
+        mantenimientos_vencidos=Count('id', filter=Q(estado='programado', fecha_programada__lt=inicio_dia(hoy))),
+        total_mantenimientos_programados=Count('id', filter=Q(estado__in=['programado', 'en_progreso'])),
+    )
+
+
+def eventos(desde, hasta, maquina=None, tecnico=None, estados=ESTADOS_ACTIVOS):
+    """Mantenimientos que empiezan entre las fechas locales desde y hasta (inclusive)"""
+    consulta = MantenimientoProgramado.objects.filter(rango(desde, hasta))
+    if estados:
+        consulta = consulta.filter(estado__in=estados)
+    if maquina:
+        consulta = consulta.filter(maquina_id=maquina)
+    if tecnico:
+        consulta = consulta.filter(tecnico_asignado_id=tecnico)
+    filas = consulta.order_by('fecha_programada', 'id').values(
+        'id', 'titulo', 'tipo', 'prioridad', 'estado', 'fecha_programada', 'duracion_estimada',
+        'maquina_id', 'tecnico_asignado_id',
+        codigo_maquina=F('maquina__codigo_inventario'),
+        tecnico=Concat('tecnico_asignado__nombres', Value(' '), 'tecnico_asignado__apellidos'),
+    )
+    resultado = []
+    for fila in filas:
+        inicio = fila['fecha_programada']
+        resultado.append({
+            'id': fila['id'],
+            'titulo': fila['titulo'],
+            'tipo': fila['tipo'],
+            'prioridad': fila['prioridad'],
+            'estado': fila['estado'],
+            'inicio': inicio,
+            'fin': inicio + fila['duracion_estimada'],
+            'maquina_id': fila['maquina_id'],
+            'maquina': fila['codigo_maquina'],
+            'tecnico_id': fila['tecnico_asignado_id'],
+            'tecnico': fila['tecnico'],
+        })
+    return resultado
+
+
+def agrupar(lista, por):
+    grupos = defaultdict(list)
+    for evento in lista:
+        if por == 'dia':
+            clave = timezone.localtime(evento['inicio']).date().isoformat()
+        elif por == 'tecnico':
+            clave = str(evento['tecnico_id'] or 'sin_asignar')
+        else:
+            clave = str(evento['maquina_id'])
+        grupos[clave].append(evento)
+    return dict(grupos)
+
+
+def solapes(lista, por):
+    """
+    Pares de eventos que se solapan en la misma máquina o técnico ('maquina'
+    o 'tecnico'). Barrido por inicio con los eventos que siguen abiertos: cada
+    evento se solapa con todos los que aún no terminaron al empezar él.
+    """
+    campo = 'maquina_id' if por == 'maquina' else 'tecnico_id'
+    por_clave = defaultdict(list)
+    for evento in lista:
+        if evento[campo] is not None:
+            por_clave[evento[campo]].append(evento)
+
+    encontrados = []
+    for clave, propios in por_clave.items():
+        propios.sort(key=lambda e: (e['inicio'], e['id']))
+        activos = []
+        for evento in propios:
+            activos = [activo for activo in activos if activo['fin'] > evento['inicio']]
+            for activo in activos:
+                encontrados.append({
+                    campo: clave,
+                    'eventos': [activo['id'], evento['id']],
+                    'desde': evento['inicio'],
+                    'hasta': min(activo['fin'], evento['fin']),
+                })
+            activos.append(evento)
+    return encontrados
+
+
+def conflictos(inicio, fin, maquina=None, tecnico=None, excluir=None):
+    """
+    Mantenimientos activos de la máquina o el técnico que se solapan con
+    [inicio, fin). El límite inferior se acota con la mayor duración
+    registrada para seguir filtrando por rango sobre fecha_programada.
+    """
+    base = MantenimientoProgramado.objects.filter(estado__in=ESTADOS_ACTIVOS)
+    if maquina:
+        base = base.filter(maquina_id=maquina)
+    if tecnico:
+        base = base.filter(tecnico_asignado_id=tecnico)
+    if excluir:
+        base = base.exclude(pk=excluir)
+    mayor = base.aggregate(mayor=Max('duracion_estimada'))['mayor']
+    if mayor is None:
+        return []
+    candidatos = base.filter(fecha_programada__lt=fin, fecha_programada__gt=inicio - mayor)
+    return [
+        {'id': m.pk, 'titulo': m.titulo, 'inicio': m.fecha_programada, 'fin': m.fecha_programada + m.duracion_estimada,
+         'maquina_id': m.maquina_id, 'tecnico_id': m.tecnico_asignado_id}
+        for m in candidatos.only('id', 'titulo', 'fecha_programada', 'duracion_estimada', 'maquina_id',
+                                 'tecnico_asignado_id').order_by('fecha_programada')
+        if m.fecha_programada + m.duracion_estimada > inicio
+    ]
+
+
+def calendario(desde, hasta, por='dia', maquina=None, tecnico=None):
+    if por not in AGRUPACIONES:
+        raise ValueError(f'Agrupación no válida: {por}')
+    if hasta < desde or (hasta - desde).days >= MAX_DIAS_VENTANA:
+        raise ValueError(f'La ventana debe tener entre 1 y {MAX_DIAS_VENTANA} días')
+
+    def calcular():
+        lista = eventos(desde, hasta, maquina=maquina, tecnico=tecnico)
+        return {
+            'desde': desde,
+            'hasta': hasta,
+            'agrupar': por,
+            'total': len(lista),
+            'grupos': agrupar(lista, por),
+            'solapes': {
+                'maquina': solapes(lista, 'maquina'),
+                'tecnico': solapes(lista, 'tecnico'),
+            },
+        }
+
+    return obtener_o_calcular(
+        'calendario_mantenimiento', ['maquinaria.MantenimientoProgramado', 'maquinaria.Maquina'], calcular,
+        desde, hasta, por, maquina, tecnico,
+    )
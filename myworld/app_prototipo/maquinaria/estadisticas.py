@@ -0,0 +1,210 @@
+from django.db.models import Count, Q
+
+from .models import Maquina, AlertaMaquina, ContadorFlota
+
+
+def claves_maquina(estado, condicion):
+    """Claves de ContadorFlota afectadas por una máquina"""
+    return [f'maquina.estado.{estado}', f'maquina.condicion.{condicion}']
+
+
+def claves_alerta(estado, prioridad):
+    """Claves de ContadorFlota afectadas por una alerta"""
+    claves = [f'alerta.estado.{estado}']
+    if estado == 'activa':
+        claves.append(f'alerta.prioridad.{prioridad}')
+    return claves
+
+
+class FleetStats:
+    """
+    Estadísticas agregadas de la flota.
+    Los conteos por estado/condición de máquinas y por estado/prioridad de
+    alertas se leen de ContadorFlota; calcular_desde_tablas() los recalcula
+    con una sola consulta de agregación condicional por tabla.
+    """
+
+    def __init__(self, maquinas_por_estado, maquinas_por_condicion,
+                 alertas_por_estado, alertas_activas_por_prioridad):
+        self.maquinas_por_estado = maquinas_por_estado
+        self.maquinas_por_condicion = maquinas_por_condicion
+        self.alertas_por_estado = alertas_por_estado
+        self.alertas_activas_por_prioridad = alertas_activas_por_prioridad
+
+    @classmethod
+    def calcular(cls):
+        """Lee las estadísticas desde los contadores materializados"""
+        return cls.desde_contadores(ContadorFlota.valores())
+
+    @classmethod
+    def desde_contadores(cls, valores):
+        def extraer(prefijo, choices):
+            return {clave: valores.get(f'{prefijo}.{clave}', 0) for clave, _ in choices}
+
+        return cls(
+            maquinas_por_estado=extraer('maquina.estado', Maquina.ESTADO_CHOICES),
+            maquinas_por_condicion=extraer('maquina.condicion', Maquina.CONDICION_CHOICES),
+            alertas_por_estado=extraer('alerta.estado', AlertaMaquina.ESTADO_CHOICES),
+            alertas_activas_por_prioridad=extraer('alerta.prioridad', AlertaMaquina.PRIORIDAD_CHOICES),
+        )
+
+    @classmethod
+    def calcular_desde_tablas(cls):
+        """Calcula las estadísticas con agregación condicional sobre las tablas"""
+        agregados_maquinas = {
+            f'estado__{estado}': Count('id', filter=Q(estado=estado))
+            for estado, _ in Maquina.ESTADO_CHOICES
+        }
+        agregados_maquinas.update({
+            f'condicion__{condicion}': Count('id', filter=Q(condicion=condicion))
+            for condicion, _ in Maquina.CONDICION_CHOICES
+        })
+        maquinas = Maquina.objects.aggregate(**agregados_maquinas)
+
+        agregados_alertas = {
+            f'estado__{estado}': Count('id', filter=Q(estado=estado))
+            for estado, _ in AlertaMaquina.ESTADO_CHOICES
+        }
+        agregados_alertas.update({
+            f'prioridad__{prioridad}': Count('id', filter=Q(estado='activa', prioridad=prioridad))
+            for prioridad, _ in AlertaMaquina.PRIORIDAD_CHOICES
+        })
+        alertas = AlertaMaquina.objects.aggregate(**agregados_alertas)
+
+        return cls(
+            maquinas_por_estado=_extraer(maquinas, 'estado'),
+            maquinas_por_condicion=_extraer(maquinas, 'condicion'),
+            alertas_por_estado=_extraer(alertas, 'estado'),
+            alertas_activas_por_prioridad=_extraer(alertas, 'prioridad'),
+        )
+
+    # Máquinas
+    @property
+    def total_maquinas(self):
+        return sum(self.maquinas_por_estado.values())
+
+    @property
+    def maquinas_operativas(self):
+        return self.maquinas_por_estado.get('operativa', 0)
+
+    @property
+    def maquinas_mantenimiento(self):
+        return self.maquinas_por_estado.get('mantenimiento', 0)
+
+    @property
+    def maquinas_disponibles(self):
+        return self.maquinas_por_estado.get('disponible', 0)
+
+    @property
+    def maquinas_fuera_servicio(self):
+        return self.maquinas_por_estado.get('fuera_servicio', 0)
+
+    @property
+    def porcentaje_operativas(self):
+        total = self.total_maquinas
+        return (self.maquinas_operativas / total * 100) if total > 0 else 0
+
+    # Alertas
+    @property
+    def total_alertas(self):
+        return sum(self.alertas_por_estado.values())
+
+    @property
+    def alertas_activas(self):
+        return self.alertas_por_estado.get('activa', 0)
+
+    @property
+    def alertas_criticas(self):
+        return self.alertas_activas_por_prioridad.get('critica', 0)
+
+    @property
+    def alertas_altas(self):
+        return self.alertas_activas_por_prioridad.get('alta', 0)
+
+    @property
+    def alertas_medias(self):
+        return self.alertas_activas_por_prioridad.get('media', 0)
+
+    def contadores(self):
+        """Representación en claves de ContadorFlota"""
+        valores = {}
+        for prefijo, conteos in (
+            ('maquina.estado', self.maquinas_por_estado),
+            ('maquina.condicion', self.maquinas_por_condicion),
+            ('alerta.estado', self.alertas_por_estado),
+            ('alerta.prioridad', self.alertas_activas_por_prioridad),
+        ):
+            for clave, valor in conteos.items():
+                valores[f'{prefijo}.{clave}'] = valor
+        return valores
+
+    def as_dict(self):
+        return {
+            'total_maquinas': self.total_maquinas,
+            'maquinas_operativas': self.maquinas_operativas,
+            'maquinas_mantenimiento': self.maquinas_mantenimiento,
+            'maquinas_disponibles': self.maquinas_disponibles,
+            'maquinas_fuera_servicio': self.maquinas_fuera_servicio,
+            'alertas_activas': self.alertas_activas,
+            'porcentaje_operativas': self.porcentaje_operativas,
+            'maquinas_por_estado': dict(self.maquinas_por_estado),
+            'maquinas_por_condicion': dict(self.maquinas_por_condicion),
+            'alertas_por_estado': dict(self.alertas_por_estado),
+            'alertas_activas_por_prioridad': dict(self.alertas_activas_por_prioridad),
+        }
+
+
+def _extraer(agregados, prefijo):
+    """Convierte {'estado__operativa': 3} en {'operativa': 3} para un prefijo"""
+    inicio = f'{prefijo}__'
+    return {
+        clave[len(inicio):]: valor or 0
+        for clave, valor in agregados.items()
+        if clave.startswith(inicio)
+    }
+
+
+def reconstruir_contadores():
+    """
+    Recalcula ContadorFlota desde las tablas y lo reemplaza.
+    Devuelve las diferencias encontradas {clave: (almacenado, real)}.
+    """
+    from django.db import transaction
+
+    reales = FleetStats.calcular_desde_tablas().contadores()
+    with transaction.atomic():
+        almacenados = {
+            contador.clave: contador
+            for contador in ContadorFlota.objects.select_for_update()
+        }
+        diferencias = verificar_contadores(reales, {c: v.valor for c, v in almacenados.items()})
+
+        nuevos = [ContadorFlota(clave=clave, valor=valor)
+                  for clave, valor in reales.items() if clave not in almacenados]
+        actualizados = []
+        for clave, contador in almacenados.items():
+            if clave in reales and contador.valor != reales[clave]:
+                contador.valor = reales[clave]
+                actualizados.append(contador)
+
+        ContadorFlota.objects.bulk_create(nuevos)
+        ContadorFlota.objects.bulk_update(actualizados, ['valor'])
+        ContadorFlota.objects.exclude(clave__in=reales.keys()).delete()
+
+    return diferencias
+
+
+def verificar_contadores(reales=None, almacenados=None):
+    """Compara los contadores almacenados con los conteos reales"""
+    if reales is None:
+        reales = FleetStats.calcular_desde_tablas().contadores()
+    if almacenados is None:
+        almacenados = ContadorFlota.valores()
+
+    diferencias = {}
+    for clave in set(reales) | set(almacenados):
+        almacenado = almacenados.get(clave, 0)
+        real = reales.get(clave, 0)
+        if almacenado != real:
+            diferencias[clave] = (almacenado, real)
+    return diferencias
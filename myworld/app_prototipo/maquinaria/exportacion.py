@@ -0,0 +1,77 @@
+"""
+Exportación del inventario de máquinas.
+
+Las filas se leen con values_list().iterator() en bloques de TAMANO_BLOQUE,
+sin instanciar modelos, y se entregan a los escritores en streaming de
+components.exportacion.
+"""
+from django.utils import timezone
+
+from components.exportacion import respuesta_exportacion
+from .models import Maquina
+
+# (campo de values_list, encabezado, clave en NDJSON)
+COLUMNAS_EXPORTACION = (
+    ('codigo_inventario', 'Código', 'codigo_inventario'),
+    ('nombre', 'Nombre', 'nombre'),
+    ('categoria__nombre', 'Categoría', 'categoria'),
+    ('marca', 'Marca', 'marca'),
+    ('modelo', 'Modelo', 'modelo'),
+    ('numero_serie', 'Número de serie', 'numero_serie'),
+    ('estado', 'Estado', 'estado'),
+    ('condicion', 'Condición', 'condicion'),
+    ('ubicacion', 'Ubicación', 'ubicacion'),
+    ('centro_formacion', 'Centro de formación', 'centro_formacion'),
+    ('proveedor__nombre', 'Proveedor', 'proveedor'),
+    ('fecha_adquisicion', 'Fecha de adquisición', 'fecha_adquisicion'),
+    ('valor_adquisicion', 'Valor de adquisición', 'valor_adquisicion'),
+    ('horas_uso_total', 'Horas de uso', 'horas_uso_total'),
+    ('eficiencia', 'Eficiencia (%)', 'eficiencia'),
+    ('fecha_ultimo_mantenimiento', 'Último mantenimiento', 'fecha_ultimo_mantenimiento'),
+    ('proximo_mantenimiento', 'Próximo mantenimiento', 'proximo_mantenimiento'),
+)
+
+# Máquinas que se excluyen salvo que se pida incluir las inactivas
+ESTADOS_INACTIVOS = ('fuera_servicio', 'retirada')
+
+TAMANO_BLOQUE = 2000
+
+
+def maquinas_a_exportar(categorias=None, incluir_inactivas=False):
+    """Queryset filtrado como en ExportarMaquinasForm"""
+    queryset = Maquina.objects.all()
+    if not incluir_inactivas:
+        queryset = queryset.exclude(estado__in=ESTADOS_INACTIVOS)
+    if categorias:
+        queryset = queryset.filter(categoria__in=categorias)
+    return queryset.order_by('codigo_inventario')
+
+
+def filas_exportacion(queryset, etiquetas=True, chunk_size=TAMANO_BLOQUE):
+    """Tuplas en el orden de COLUMNAS_EXPORTACION; estado y condición como etiqueta o como clave"""
+    campos = [campo for campo, _, _ in COLUMNAS_EXPORTACION]
+    conversiones = []
+    if etiquetas:
+        for campo in ('estado', 'condicion'):
+            opciones = {clave: str(etiqueta) for clave, etiqueta in Maquina._meta.get_field(campo).flatchoices}
+            conversiones.append((campos.index(campo), opciones))
+
+    for fila in queryset.values_list(*campos).iterator(chunk_size=chunk_size):
+        if conversiones:
+            fila = list(fila)
+            for posicion, opciones in conversiones:
+                fila[posicion] = opciones.get(fila[posicion], fila[posicion])
+        yield fila
+
+
+def exportar_maquinas(formato, categorias=None, incluir_inactivas=False):
+    """Respuesta de descarga del inventario en 'csv', 'ndjson', 'excel' o 'pdf'"""
+    queryset = maquinas_a_exportar(categorias, incluir_inactivas)
+    return respuesta_exportacion(
+        formato,
+        [encabezado for _, encabezado, _ in COLUMNAS_EXPORTACION],
+        filas_exportacion(queryset, etiquetas=formato != 'ndjson'),
+        f'inventario_maquinas_{timezone.localdate():%Y%m%d}',
+        claves=[clave for _, _, clave in COLUMNAS_EXPORTACION],
+        titulo='Inventario de máquinas',
+    )
@@ -379,6 +379,7 @@ class ExportarMaquinasForm(forms.Form):
     FORMATO_CHOICES = [
         ('excel', 'Excel (.xlsx)'),
         ('csv', 'CSV'),
+        ('ndjson', 'JSON (una máquina por línea)'),
         ('pdf', 'PDF')
     ]
 
@@ -398,6 +399,8 @@ class ExportarMaquinasForm(forms.Form):
     categorias = forms.ModelMultipleChoiceField(
         queryset=CategoriaMaquina.objects.filter(activa=True),
         required=False,
-        widget=forms.CheckboxSelectMultiple(),
+        widget=forms.CheckboxSelectMultiple(attrs={
+            'class': 'form-check-input'
+        }),
         help_text='Dejar vacío para incluir todas las categorías'
     )
\ No newline at end of file
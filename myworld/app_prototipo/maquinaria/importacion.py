@@ -0,0 +1,326 @@
+"""
+Importación masiva de máquinas desde Excel (.xlsx) o CSV.
+
+Las filas se leen en streaming y se procesan por lotes: cada lote se valida
+con los campos del modelo, resuelve categoría y proveedor con tablas en
+memoria y se escribe con bulk_create/bulk_update por codigo_inventario.
+Como las operaciones masivas no emiten señales, el importador actualiza
+ContadorFlota, el índice de búsqueda y las versiones del cache.
+"""
+import csv
+import io
+from collections import Counter
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from components.cache import incrementar_version
+from .busqueda import obtener_backend
+from .estadisticas import claves_maquina
+from .models import Maquina, CategoriaMaquina, Proveedor, HistorialMaquina, ContadorFlota
+
+# Columnas de Maquina que se pueden importar (categoria y proveedor por nombre)
+CAMPOS_IMPORTABLES = (
+    'codigo_inventario', 'nombre', 'categoria', 'marca', 'modelo', 'numero_serie',
+    'estado', 'condicion', 'especificaciones_tecnicas', 'capacidad', 'potencia',
+    'voltaje', 'dimensiones', 'peso', 'ubicacion', 'centro_formacion',
+    'ambiente_formacion', 'proveedor', 'fecha_adquisicion', 'valor_adquisicion',
+    'numero_factura', 'garantia_meses', 'horas_uso_total', 'horas_uso_mes',
+    'eficiencia', 'fecha_ultimo_mantenimiento', 'proximo_mantenimiento',
+    'frecuencia_mantenimiento_dias', 'observaciones',
+)
+
+# Errores de fila que se conservan en el resultado
+MAXIMO_ERRORES = 200
+
+
+class ArchivoInvalido(Exception):
+    pass
+
+
+def _normalizar_encabezado(valor):
+    return str(valor or '').strip().lower().replace(' ', '_')
+
+
+def _normalizar_nombre(valor):
+    return ' '.join(str(valor or '').split()).lower()
+
+
+def leer_filas(archivo, nombre_archivo=None):
+    """Genera un dict por fila con los encabezados normalizados"""
+    nombre = (nombre_archivo or getattr(archivo, 'name', '') or '').lower()
+    if nombre.endswith('.xlsx'):
+        return _leer_xlsx(archivo)
+    if nombre.endswith('.csv'):
+        return _leer_csv(archivo)
+    raise ArchivoInvalido('Formato no soportado: use .xlsx o .csv')
+
+
+def _leer_xlsx(archivo):
+    from openpyxl import load_workbook
+
+    try:
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+    except Exception as e:
+        raise ArchivoInvalido(f'No se pudo leer el archivo Excel: {e}')
+
+    def filas():
+        try:
+            iterador = libro.active.iter_rows(values_only=True)
+            encabezados = [_normalizar_encabezado(valor) for valor in next(iterador, ())]
+            for valores in iterador:
+                if any(valor not in (None, '') for valor in valores):
+                    yield dict(zip(encabezados, valores))
+        finally:
+            libro.close()
+
+    return filas()
+
+
+def _leer_csv(archivo):
+    texto = io.TextIOWrapper(getattr(archivo, 'file', archivo), encoding='utf-8-sig', newline='')
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+
+    def filas():
+        lector = csv.reader(texto, dialecto)
+        encabezados = [_normalizar_encabezado(valor) for valor in next(lector, [])]
+        for valores in lector:
+            if any(valor.strip() for valor in valores):
+                yield dict(zip(encabezados, valores))
+
+    return filas()
+
+
+class ResultadoImportacion:
+    def __init__(self):
+        self.creadas = 0
+        self.actualizadas = 0
+        self.omitidas = 0
+        self.total_errores = 0
+        self.errores = []
+
+    def agregar_error(self, fila, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < MAXIMO_ERRORES:
+            self.errores.append({'fila': fila, 'error': mensaje})
+
+    @property
+    def procesadas(self):
+        return self.creadas + self.actualizadas + self.omitidas + self.total_errores
+
+    def as_dict(self):
+        return {
+            'procesadas': self.procesadas,
+            'creadas': self.creadas,
+            'actualizadas': self.actualizadas,
+            'omitidas': self.omitidas,
+            'total_errores': self.total_errores,
+            'errores': self.errores,
+        }
+
+
+class ImportadorMaquinas:
+    def __init__(self, usuario=None, sobrescribir=False, tamano_lote=1000):
+        self.usuario = usuario
+        self.sobrescribir = sobrescribir
+        self.tamano_lote = tamano_lote
+        self.resultado = ResultadoImportacion()
+        self._categorias = {
+            _normalizar_nombre(nombre): pk
+            for pk, nombre in CategoriaMaquina.objects.values_list('id', 'nombre')
+        }
+        self._proveedores = {
+            _normalizar_nombre(nombre): pk
+            for pk, nombre in Proveedor.objects.values_list('id', 'nombre')
+        }
+        self._codigos_vistos = set()
+
+    def importar(self, filas):
+        """Procesa todas las filas; la numeración considera la fila de encabezados"""
+        numeradas = enumerate(filas, start=2)
+        while True:
+            lote = list(islice(numeradas, self.tamano_lote))
+            if not lote:
+                break
+            self._procesar_lote(lote)
+
+        if self.resultado.creadas or self.resultado.actualizadas:
+            incrementar_version(Maquina, HistorialMaquina)
+        return self.resultado
+
+    def _procesar_lote(self, lote):
+        validas = []
+        for numero, fila in lote:
+            try:
+                validas.append((numero, self._validar(fila)))
+            except ValidationError as e:
+                self.resultado.agregar_error(numero, '; '.join(e.messages))
+
+        codigos = [datos['codigo_inventario'] for _, datos in validas]
+        existentes = Maquina.objects.in_bulk(codigos, field_name='codigo_inventario')
+        series = dict(
+            Maquina.objects.filter(
+                numero_serie__in=[datos['numero_serie'] for _, datos in validas if 'numero_serie' in datos]
+            ).values_list('numero_serie', 'codigo_inventario')
+        )
+
+        nuevas, actualizadas, campos_actualizados = [], [], set()
+        deltas = Counter()
+        ahora = timezone.now()
+        for numero, datos in validas:
+            codigo = datos['codigo_inventario']
+            serie = datos.get('numero_serie')
+            if serie in series and series[serie] != codigo:
+                self.resultado.agregar_error(numero, f'El número de serie {serie} ya pertenece a {series[serie]}')
+                continue
+
+            maquina = existentes.get(codigo)
+            if maquina is None:
+                try:
+                    maquina = self._nueva(datos)
+                except ValidationError as e:
+                    self.resultado.agregar_error(numero, '; '.join(e.messages))
+                    continue
+                nuevas.append(maquina)
+                deltas.update(claves_maquina(maquina.estado, maquina.condicion))
+            elif self.sobrescribir:
+                for campo, valor in datos.items():
+                    setattr(maquina, campo, valor)
+                maquina.updated_at = ahora
+                campos_actualizados.update(datos)
+                actualizadas.append(maquina)
+            else:
+                self.resultado.omitidas += 1
+            if serie:
+                series[serie] = codigo
+
+        if not nuevas and not actualizadas:
+            return
+
+        with transaction.atomic():
+            Maquina.objects.bulk_create(nuevas, batch_size=self.tamano_lote)
+            if actualizadas:
+                deltas.update(self._deltas_actualizadas(actualizadas, campos_actualizados))
+                campos_actualizados.discard('codigo_inventario')
+                Maquina.objects.bulk_update(actualizadas, sorted(campos_actualizados | {'updated_at'}),
+                                            batch_size=self.tamano_lote)
+            HistorialMaquina.objects.bulk_create(
+                [self._historial(maquina, 'creacion', 'creada') for maquina in nuevas] +
+                [self._historial(maquina, 'actualizacion', 'actualizada') for maquina in actualizadas],
+                batch_size=self.tamano_lote
+            )
+            ContadorFlota.aplicar_deltas(deltas)
+            obtener_backend().indexar_ids([maquina.pk for maquina in nuevas + actualizadas])
+
+        self.resultado.creadas += len(nuevas)
+        self.resultado.actualizadas += len(actualizadas)
+
+    def _deltas_actualizadas(self, actualizadas, campos_actualizados):
+        """
+        Deltas de contadores de las máquinas a sobrescribir, contra el estado y
+        la condición que tienen ahora en la base (bloqueadas hasta el final de
+        la transacción), no contra los leídos antes por in_bulk.
+        """
+        actuales = {
+            pk: (estado, condicion)
+            for pk, estado, condicion in Maquina.objects.select_for_update()
+            .filter(pk__in=[maquina.pk for maquina in actualizadas])
+            .values_list('pk', 'estado', 'condicion')
+        }
+        deltas = Counter()
+        for maquina in actualizadas:
+            if maquina.pk not in actuales:
+                # Eliminada mientras tanto: bulk_update no la toca
+                continue
+            estado, condicion = actuales[maquina.pk]
+            deltas.subtract(claves_maquina(estado, condicion))
+            # Las columnas que no vienen en el archivo conservan su valor actual
+            deltas.update(claves_maquina(
+                maquina.estado if 'estado' in campos_actualizados else estado,
+                maquina.condicion if 'condicion' in campos_actualizados else condicion,
+            ))
+        return deltas
+
+    def _validar(self, fila):
+        """Convierte una fila en {campo: valor} con los campos presentes en el archivo"""
+        datos = {}
+        errores = []
+        for campo in CAMPOS_IMPORTABLES:
+            if campo not in fila:
+                continue
+            valor = fila[campo]
+            if isinstance(valor, float) and valor.is_integer():
+                valor = int(valor)
+            if isinstance(valor, str):
+                valor = valor.strip()
+
+            if campo in ('categoria', 'proveedor'):
+                tabla = self._categorias if campo == 'categoria' else self._proveedores
+                if valor in (None, ''):
+                    if campo == 'proveedor':
+                        datos['proveedor_id'] = None
+                    continue
+                pk = tabla.get(_normalizar_nombre(valor))
+                if pk is None:
+                    errores.append(f'{campo}: "{valor}" no existe')
+                else:
+                    datos[f'{campo}_id'] = pk
+                continue
+
+            campo_modelo = Maquina._meta.get_field(campo)
+            if valor in (None, ''):
+                if campo_modelo.has_default() or campo_modelo.null:
+                    # Vacío: se deja el valor por defecto o NULL
+                    if campo_modelo.null:
+                        datos[campo] = None
+                    continue
+                if not campo_modelo.blank:
+                    errores.append(f'{campo}: es obligatorio')
+                    continue
+                valor = ''
+            try:
+                datos[campo] = campo_modelo.clean(valor, None)
+            except ValidationError as e:
+                errores.append(f'{campo}: {"; ".join(e.messages)}')
+
+        codigo = datos.get('codigo_inventario')
+        if not codigo:
+            errores.append('codigo_inventario: es obligatorio')
+        elif codigo in self._codigos_vistos:
+            errores.append(f'codigo_inventario: {codigo} está repetido en el archivo')
+        if errores:
+            raise ValidationError(errores)
+        self._codigos_vistos.add(codigo)
+        return datos
+
+    def _nueva(self, datos):
+        faltantes = [
+            campo for campo in ('nombre', 'categoria_id', 'marca', 'modelo', 'numero_serie',
+                                'ubicacion', 'centro_formacion', 'fecha_adquisicion', 'valor_adquisicion')
+            if datos.get(campo) in (None, '')
+        ]
+        if faltantes:
+            raise ValidationError(f'Faltan datos para crear la máquina: {", ".join(faltantes)}')
+        return Maquina(created_by=self.usuario, **datos)
+
+    def _historial(self, maquina, tipo_evento, accion):
+        return HistorialMaquina(
+            maquina=maquina,
+            tipo_evento=tipo_evento,
+            descripcion=f'Máquina {maquina.codigo_inventario} {accion} por importación masiva',
+            usuario=self.usuario,
+        )
+
+
+def importar_maquinas(archivo, usuario=None, sobrescribir=False, nombre_archivo=None):
+    """Importa un archivo subido y devuelve el ResultadoImportacion"""
+    return ImportadorMaquinas(usuario=usuario, sobrescribir=sobrescribir).importar(
+        leer_filas(archivo, nombre_archivo)
+    )
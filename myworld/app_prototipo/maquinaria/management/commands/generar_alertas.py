@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from maquinaria.alertas import REGLAS, generar_alertas
+
+
+class Command(BaseCommand):
+    help = (
+        'Evalúa las reglas de alertas (mantenimiento vencido, baja eficiencia, uso excesivo y '
+        'garantía por vencer) sobre toda la flota y crea las alertas nuevas. Se puede ejecutar '
+        'periódicamente: no duplica las alertas que siguen abiertas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', action='append', choices=[regla.tipo for regla in REGLAS],
+                            help='Evalúa solo las reglas de este tipo (se puede repetir)')
+        parser.add_argument('--simular', action='store_true',
+                            help='Muestra lo que se haría sin guardar cambios')
+
+    def handle(self, *args, **options):
+        resultado = generar_alertas(tipos=options['tipo'], simular=options['simular'])
+
+        if options['verbosity'] > 1:
+            for tipo, cantidad in resultado.por_tipo.items():
+                self.stdout.write(f'{tipo}: {cantidad}')
+
+        prefijo = 'Simulación: ' if options['simular'] else ''
+        self.stdout.write(self.style.SUCCESS(f'{prefijo}{resultado.creadas} alertas creadas'))
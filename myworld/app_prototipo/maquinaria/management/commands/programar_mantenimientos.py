@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from maquinaria.programacion import programar_mantenimientos
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula el próximo mantenimiento de toda la flota (por calendario y por horas de uso) '
+        'y crea los preventivos que vencen dentro del horizonte. Se puede ejecutar periódicamente: '
+        'no duplica los mantenimientos ya programados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizonte', type=int, default=30,
+                            help='Días hacia adelante para crear mantenimientos (por defecto 30)')
+        parser.add_argument('--simular', action='store_true',
+                            help='Muestra lo que se haría sin guardar cambios')
+
+    def handle(self, *args, **options):
+        resultado = programar_mantenimientos(
+            horizonte_dias=options['horizonte'],
+            simular=options['simular'],
+        )
+
+        if options['verbosity'] > 1:
+            for codigo, fecha, criterio in resultado.vencimientos:
+                self.stdout.write(f'{codigo}: vence {fecha:%Y-%m-%d} ({criterio})')
+
+        prefijo = 'Simulación: ' if options['simular'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefijo}{resultado.revisadas} máquinas revisadas, {resultado.creados} mantenimientos creados, '
+            f'{resultado.actualizadas} próximos mantenimientos actualizados, '
+            f'{resultado.con_mantenimiento_abierto} ya tenían un preventivo abierto'
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from maquinaria.estadisticas import reconstruir_contadores, verificar_contadores
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye o verifica los contadores materializados de la flota'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo compara los contadores con las tablas, sin modificarlos'
+        )
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            diferencias = verificar_contadores()
+        else:
+            diferencias = reconstruir_contadores()
+
+        for clave, (almacenado, real) in sorted(diferencias.items()):
+            self.stdout.write(f'{clave}: almacenado={almacenado} real={real}')
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('Los contadores coinciden con las tablas'))
+        elif options['verificar']:
+            self.stdout.write(self.style.WARNING(f'{len(diferencias)} contadores desactualizados'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(diferencias)} contadores corregidos'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from maquinaria.busqueda import obtener_backend
+
+
+class Command(BaseCommand):
+    help = 'Regenera el índice de búsqueda de máquinas'
+
+    def handle(self, *args, **options):
+        backend = obtener_backend()
+        total = backend.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'{backend.__class__.__name__}: {total} máquinas indexadas'
+        ))
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-17 22:55
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_contadores(apps, schema_editor):
+    Maquina = apps.get_model('maquinaria', 'Maquina')
+    AlertaMaquina = apps.get_model('maquinaria', 'AlertaMaquina')
+    ContadorFlota = apps.get_model('maquinaria', 'ContadorFlota')
+
+    valores = {}
+    for campo in ('estado', 'condicion'):
+        for fila in Maquina.objects.values(campo).annotate(total=Count('id')).order_by():
+            valores[f'maquina.{campo}.{fila[campo]}'] = fila['total']
+    for fila in AlertaMaquina.objects.values('estado').annotate(total=Count('id')).order_by():
+        valores[f'alerta.estado.{fila["estado"]}'] = fila['total']
+    activas = AlertaMaquina.objects.filter(estado='activa')
+    for fila in activas.values('prioridad').annotate(total=Count('id')).order_by():
+        valores[f'alerta.prioridad.{fila["prioridad"]}'] = fila['total']
+
+    ContadorFlota.objects.bulk_create([
+        ContadorFlota(clave=clave, valor=valor) for clave, valor in valores.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maquinaria', '0004_mantenimientoprogramado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorFlota',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=100, unique=True)),
+                ('valor', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contador de Flota',
+                'verbose_name_plural': 'Contadores de Flota',
+                'ordering': ['clave'],
+            },
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maquinaria', '0005_contadorflota'),
+        ('usuarios', '0003_usuario_usuarios_us_fecha_r_d0f722_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alertamaquina',
+            index=models.Index(fields=['-fecha_creacion', 'id'], name='maquinaria__fecha_c_56ba8c_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+COLUMNAS = 'codigo_inventario, nombre, marca, modelo, numero_serie, especificaciones_tecnicas'
+
+
+def crear_indice(apps, schema_editor):
+    # El índice FTS5 solo existe en SQLite; otras bases usan BackendIcontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS maquinaria_maquina_fts USING fts5("
+        f"{COLUMNAS}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        f'INSERT INTO maquinaria_maquina_fts (rowid, {COLUMNAS}) '
+        f'SELECT id, {COLUMNAS} FROM maquinaria_maquina'
+    )
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS maquinaria_maquina_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maquinaria', '0006_alertamaquina_maquinaria__fecha_c_56ba8c_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-17 23:31
+
+import hashlib
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Copia de maquinaria.alertas.calcular_huella a la fecha de esta migración
+def calcular_huella(maquina_id, tipo, titulo):
+    texto = unicodedata.normalize('NFKD', titulo or '').encode('ascii', 'ignore').decode('ascii')
+    normalizado = ' '.join(re.sub(r'[^a-z0-9]+', ' ', texto.lower()).split())
+    return hashlib.sha1(f'{maquina_id}|{tipo}|{normalizado}'.encode('utf-8')).hexdigest()
+
+
+def calcular_huellas(apps, schema_editor):
+    AlertaMaquina = apps.get_model('maquinaria', 'AlertaMaquina')
+    alertas = list(AlertaMaquina.objects.only('id', 'maquina_id', 'tipo', 'titulo', 'fecha_creacion'))
+    for alerta in alertas:
+        alerta.huella = calcular_huella(alerta.maquina_id, alerta.tipo, alerta.titulo)
+        alerta.ultima_ocurrencia = alerta.fecha_creacion
+    AlertaMaquina.objects.bulk_update(alertas, ['huella', 'ultima_ocurrencia'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maquinaria', '0007_indice_busqueda_maquinas'),
+        ('usuarios', '0003_usuario_usuarios_us_fecha_r_d0f722_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertamaquina',
+            name='huella',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='alertamaquina',
+            name='ocurrencias',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='alertamaquina',
+            name='ultima_ocurrencia',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='alertamaquina',
+            index=models.Index(fields=['huella', 'estado'], name='maquinaria__huella_f765ad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertamaquina',
+            index=models.Index(fields=['maquina', '-fecha_creacion'], name='maquinaria__maquina_d8dc9c_idx'),
+        ),
+        migrations.RunPython(calcular_huellas, migrations.RunPython.noop),
+    ]
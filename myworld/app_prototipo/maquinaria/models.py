@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.urls import reverse
 import uuid
@@ -150,6 +150,12 @@ class Maquina(models.Model):
     def get_absolute_url(self):
         return reverse('maquinaria:detalle', kwargs={'pk': self.pk})
 
+    def save(self, *args, **kwargs):
+        # En una transacción para que maquinaria.signals lea y bloquee los
+        # valores anteriores de ContadorFlota hasta aplicar los deltas
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     @property
     def necesita_mantenimiento(self):
         if not self.proximo_mantenimiento:
@@ -212,6 +218,11 @@ class AlertaMaquina(models.Model):
         related_name='alertas_creadas'
     )
 
+    # Deduplicación (maquinaria.alertas): máquina + tipo + título normalizado
+    huella = models.CharField(max_length=40, blank=True)
+    ocurrencias = models.PositiveIntegerField(default=1)
+    ultima_ocurrencia = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         verbose_name = "Alerta de Máquina"
         verbose_name_plural = "Alertas de Máquinas"
@@ -220,11 +231,26 @@ class AlertaMaquina(models.Model):
             models.Index(fields=['estado']),
             models.Index(fields=['prioridad']),
             models.Index(fields=['tipo']),
+            models.Index(fields=['-fecha_creacion', 'id']),
+            models.Index(fields=['huella', 'estado']),
+            models.Index(fields=['maquina', '-fecha_creacion']),
         ]
 
     def __str__(self):
         return f"{self.maquina.codigo_inventario} - {self.titulo}"
 
+    def save(self, *args, **kwargs):
+        # La huella sigue a la máquina, el tipo y el título aunque se editen
+        from .alertas import calcular_huella
+        self.huella = calcular_huella(self.maquina_id, self.tipo, self.titulo)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'maquina', 'maquina_id', 'tipo', 'titulo'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'huella'}
+        # En una transacción para que maquinaria.signals lea y bloquee los
+        # valores anteriores de ContadorFlota hasta aplicar los deltas
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 class HistorialMaquina(models.Model):
     TIPO_EVENTO_CHOICES = [
         ('creacion', 'Creación'),
@@ -397,3 +423,41 @@ class MantenimientoProgramado(models.Model):
             descripcion=f'Mantenimiento completado: {self.titulo}',
             usuario=usuario
         )
+
+class ContadorFlota(models.Model):
+    """
+    Contadores materializados de la flota (máquinas por estado/condición y
+    alertas por estado/prioridad). Se mantienen mediante señales para que los
+    dashboards lean conteos sin recorrer las tablas operacionales.
+    """
+    clave = models.CharField(max_length=100, unique=True)
+    valor = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Contador de Flota"
+        verbose_name_plural = "Contadores de Flota"
+        ordering = ['clave']
+
+    def __str__(self):
+        return f"{self.clave} = {self.valor}"
+
+    @classmethod
+    def aplicar_deltas(cls, deltas):
+        """Suma los deltas {clave: incremento} de forma atómica con F()"""
+        from django.db import transaction
+        from django.db.models import F
+
+        with transaction.atomic():
+            for clave, delta in deltas.items():
+                if not delta:
+                    continue
+                actualizados = cls.objects.filter(clave=clave).update(valor=F('valor') + delta)
+                if not actualizados:
+                    contador, created = cls.objects.get_or_create(clave=clave, defaults={'valor': delta})
+                    if not created:
+                        cls.objects.filter(pk=contador.pk).update(valor=F('valor') + delta)
+
+    @classmethod
+    def valores(cls):
+        return dict(cls.objects.values_list('clave', 'valor'))
@@ -0,0 +1,179 @@
+"""
+Programación automática de mantenimientos preventivos.
+
+Para cada máquina activa se calcula el vencimiento del siguiente
+mantenimiento con dos criterios y se toma el más próximo:
+
+- Calendario: último mantenimiento (fecha_ultimo_mantenimiento o el último
+  completado, el más reciente; si no hay, la fecha de adquisición) más
+  frecuencia_mantenimiento_dias.
+- Horas de uso: horas_operacion_siguiente del último mantenimiento
+  completado es el horómetro (horas_uso_total) en el que toca el siguiente;
+  la fecha se estima con el ritmo de horas_uso_mes.
+
+Toda la flota se lee en una sola consulta (el último mantenimiento
+completado y si ya hay uno preventivo abierto van como subconsultas). Las
+máquinas que vencen dentro del horizonte y no tienen un preventivo abierto
+reciben uno nuevo con bulk_create, así que ejecutar de nuevo no duplica
+nada; proximo_mantenimiento se actualiza con bulk_update.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, time as hora, timedelta
+from math import ceil
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from components.cache import incrementar_version
+from .models import HistorialMaquina, MantenimientoProgramado, Maquina
+
+ESTADOS_INACTIVOS = ('fuera_servicio', 'retirada')
+ESTADOS_ABIERTOS = ('programado', 'en_progreso', 'postergado')
+
+HORA_PROGRAMACION = hora(8, 0)
+DURACION_POR_DEFECTO = timedelta(hours=2)
+DIAS_POR_MES = 30
+
+
+@dataclass
+class ResultadoProgramacion:
+    revisadas: int = 0
+    creados: int = 0
+    actualizadas: int = 0
+    con_mantenimiento_abierto: int = 0
+    vencimientos: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            'revisadas': self.revisadas,
+            'creados': self.creados,
+            'actualizadas': self.actualizadas,
+            'con_mantenimiento_abierto': self.con_mantenimiento_abierto,
+        }
+
+
+def flota_a_programar():
+    """Máquinas activas con los datos del último mantenimiento completado"""
+    completados = (MantenimientoProgramado.objects
+                   .filter(maquina=OuterRef('pk'), estado='completado')
+                   .order_by('-fecha_fin_real', '-pk'))
+    abiertos = MantenimientoProgramado.objects.filter(
+        maquina=OuterRef('pk'), tipo='preventivo', estado__in=ESTADOS_ABIERTOS
+    )
+    return (Maquina.objects.exclude(estado__in=ESTADOS_INACTIVOS)
+            .annotate(
+                horas_siguiente=Subquery(completados.values('horas_operacion_siguiente')[:1]),
+                ultimo_completado=Subquery(completados.values('fecha_fin_real')[:1]),
+                preventivo_abierto=Exists(abiertos),
+            )
+            .only('id', 'codigo_inventario', 'nombre', 'fecha_adquisicion', 'fecha_ultimo_mantenimiento',
+                  'proximo_mantenimiento', 'frecuencia_mantenimiento_dias', 'horas_uso_total', 'horas_uso_mes'))
+
+
+def vencimiento_calendario(maquina):
+    fechas = [maquina.fecha_ultimo_mantenimiento]
+    if maquina.ultimo_completado is not None:
+        fechas.append(timezone.localdate(maquina.ultimo_completado))
+    fechas = [fecha for fecha in fechas if fecha is not None]
+    base = max(fechas) if fechas else maquina.fecha_adquisicion
+    if base is None or maquina.frecuencia_mantenimiento_dias <= 0:
+        return None
+    return base + timedelta(days=maquina.frecuencia_mantenimiento_dias)
+
+
+def vencimiento_por_horas(maquina, hoy):
+    if maquina.horas_siguiente is None:
+        return None
+    faltantes = maquina.horas_siguiente - float(maquina.horas_uso_total)
+    if faltantes <= 0:
+        return hoy
+    horas_por_dia = float(maquina.horas_uso_mes) / DIAS_POR_MES
+    if horas_por_dia <= 0:
+        return None
+    return hoy + timedelta(days=ceil(faltantes / horas_por_dia))
+
+
+def vencimiento(maquina, hoy):
+    """(fecha, criterio) del próximo mantenimiento, o (None, None)"""
+    candidatos = [
+        (fecha, criterio) for fecha, criterio in (
+            (vencimiento_calendario(maquina), 'calendario'),
+            (vencimiento_por_horas(maquina, hoy), 'horas de uso'),
+        ) if fecha is not None
+    ]
+    return min(candidatos) if candidatos else (None, None)
+
+
+def _nuevo_mantenimiento(maquina, fecha, criterio, hoy):
+    vencido = fecha < hoy
+    programada = timezone.make_aware(datetime.combine(max(fecha, hoy), HORA_PROGRAMACION))
+    descripcion = (
+        f'Mantenimiento preventivo generado automáticamente por {criterio}. '
+        f'Vencimiento: {fecha:%d/%m/%Y}.'
+    )
+    return MantenimientoProgramado(
+        maquina=maquina,
+        tipo='preventivo',
+        titulo=f'Mantenimiento preventivo {maquina.codigo_inventario}',
+        descripcion=descripcion,
+        prioridad='alta' if vencido else 'media',
+        fecha_programada=programada,
+        duracion_estimada=DURACION_POR_DEFECTO,
+        proximo_mantenimiento=fecha,
+    )
+
+
+def programar_mantenimientos(horizonte_dias=30, simular=False):
+    """
+    Crea los preventivos que vencen dentro de `horizonte_dias` y actualiza
+    proximo_mantenimiento. Con `simular` solo calcula el resultado.
+    """
+    hoy = timezone.localdate()
+    limite = hoy + timedelta(days=horizonte_dias)
+    ahora = timezone.now()
+    resultado = ResultadoProgramacion()
+    nuevos, actualizar = [], []
+
+    for maquina in flota_a_programar().iterator(chunk_size=2000):
+        resultado.revisadas += 1
+        fecha, criterio = vencimiento(maquina, hoy)
+        if fecha is None:
+            continue
+        if fecha != maquina.proximo_mantenimiento:
+            maquina.proximo_mantenimiento = fecha
+            maquina.updated_at = ahora
+            actualizar.append(maquina)
+        if fecha > limite:
+            continue
+        if maquina.preventivo_abierto:
+            resultado.con_mantenimiento_abierto += 1
+            continue
+        nuevos.append(_nuevo_mantenimiento(maquina, fecha, criterio, hoy))
+        resultado.vencimientos.append((maquina.codigo_inventario, fecha, criterio))
+
+    resultado.creados = len(nuevos)
+    resultado.actualizadas = len(actualizar)
+    if simular:
+        return resultado
+
+    with transaction.atomic():
+        if actualizar:
+            Maquina.objects.bulk_update(actualizar, ['proximo_mantenimiento', 'updated_at'], batch_size=500)
+        if nuevos:
+            MantenimientoProgramado.objects.bulk_create(nuevos, batch_size=500)
+            HistorialMaquina.objects.bulk_create([
+                HistorialMaquina(
+                    maquina_id=mantenimiento.maquina_id,
+                    tipo_evento='mantenimiento',
+                    descripcion=f'Mantenimiento programado: {mantenimiento.titulo} para '
+                                f'{timezone.localtime(mantenimiento.fecha_programada):%Y-%m-%d %H:%M}',
+                ) for mantenimiento in nuevos
+            ], batch_size=500)
+
+    # bulk_create/bulk_update no envían señales
+    if actualizar:
+        incrementar_version(Maquina)
+    if nuevos:
+        incrementar_version(MantenimientoProgramado, HistorialMaquina)
+    return resultado
@@ -0,0 +1,92 @@
+from collections import Counter
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import Maquina, AlertaMaquina, ContadorFlota
+from .estadisticas import claves_maquina, claves_alerta
+from .busqueda import CAMPOS_BUSQUEDA, obtener_backend
+
+
+# Contadores materializados (ContadorFlota)
+CAMPOS_CONTADOS = {
+    Maquina: (('estado', 'condicion'), claves_maquina),
+    AlertaMaquina: (('estado', 'prioridad'), claves_alerta),
+}
+
+
+def _valores_guardados(sender, instance):
+    """Valores contados de la fila en la base, bloqueada hasta el final de la transacción"""
+    campos, _ = CAMPOS_CONTADOS[sender]
+    return sender.objects.select_for_update().filter(pk=instance.pk).values_list(*campos).first()
+
+
+@receiver(pre_save, sender=Maquina)
+@receiver(pre_save, sender=AlertaMaquina)
+def cargar_valores_contados(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Se leen de la base y no de la instancia: dos guardados simultáneos de la
+    # misma fila no descuentan el mismo estado anterior (save() corre en una
+    # transacción, ver Maquina.save y AlertaMaquina.save)
+    instance._valores_contados = None
+    campos, _ = CAMPOS_CONTADOS[sender]
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(campos):
+        return
+    instance._valores_contados = _valores_guardados(sender, instance)
+
+
+@receiver(post_save, sender=Maquina)
+@receiver(post_save, sender=AlertaMaquina)
+def actualizar_contadores_guardado(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    campos, claves = CAMPOS_CONTADOS[sender]
+    if not created and update_fields is not None and not set(update_fields) & set(campos):
+        return
+    nuevos = tuple(getattr(instance, campo) for campo in campos)
+    anteriores = None if created else instance._valores_contados
+
+    deltas = Counter(claves(*nuevos))
+    if anteriores is not None:
+        if anteriores == nuevos:
+            return
+        deltas.subtract(claves(*anteriores))
+
+    ContadorFlota.aplicar_deltas(deltas)
+
+
+@receiver(pre_delete, sender=Maquina)
+@receiver(pre_delete, sender=AlertaMaquina)
+def cargar_valores_eliminados(sender, instance, **kwargs):
+    # delete() ya corre en una transacción
+    instance._valores_contados = _valores_guardados(sender, instance)
+
+
+@receiver(post_delete, sender=Maquina)
+@receiver(post_delete, sender=AlertaMaquina)
+def actualizar_contadores_eliminado(sender, instance, **kwargs):
+    valores = getattr(instance, '_valores_contados', None)
+    if valores is None:
+        return
+    _, claves = CAMPOS_CONTADOS[sender]
+    deltas = Counter()
+    deltas.subtract(claves(*valores))
+    ContadorFlota.aplicar_deltas(deltas)
+
+
+# Índice de búsqueda (maquinaria.busqueda)
+@receiver(post_save, sender=Maquina)
+def indexar_maquina(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(CAMPOS_BUSQUEDA):
+        return
+    if any(campo not in instance.__dict__ for campo in CAMPOS_BUSQUEDA):
+        instance = Maquina.objects.only(*CAMPOS_BUSQUEDA).get(pk=instance.pk)
+    obtener_backend().indexar(instance)
+
+
+@receiver(post_delete, sender=Maquina)
+def desindexar_maquina(sender, instance, **kwargs):
+    obtener_backend().eliminar(instance.pk)
@@ -1,3 +1,597 @@
-from django.test import TestCase
+import io
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import cache
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from usuarios.models import TipoUsuario
+from usuarios.tests import crear_usuario
+from .alertas import LimiteAlertasExcedido, calcular_huella, generar_alertas, registrar_alerta
+from .asignacion import aplicar_plan, calcular_plan
+from .autocompletado import IndicePrefijos
+from .busqueda import BackendFTS5
+from .calendario import calendario, solapes
+from .estadisticas import FleetStats, reconstruir_contadores, verificar_contadores
+from .exportacion import exportar_maquinas
+from .importacion import ImportadorMaquinas, leer_filas
+from .models import AlertaMaquina, CategoriaMaquina, ContadorFlota, MantenimientoProgramado, Maquina
+from .programacion import programar_mantenimientos
+from .views import lista_maquinas_view
+
+CACHE_LOCAL = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def crear_maquina(categoria, numero, **datos):
+    valores = {
+        'codigo_inventario': f'MAQ-{numero:03d}',
+        'nombre': f'Máquina {numero}',
+        'categoria': categoria,
+        'marca': 'Marca',
+        'modelo': 'Modelo',
+        'numero_serie': f'SERIE-{numero:03d}',
+        'ubicacion': 'Taller 1',
+        'centro_formacion': 'Centro Industrial',
+        'fecha_adquisicion': date(2024, 1, 1),
+        'valor_adquisicion': Decimal('1000000'),
+    }
+    valores.update(datos)
+    return Maquina.objects.create(**valores)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class FleetStatsTests(TestCase):
+    def setUp(self):
+        categoria = CategoriaMaquina.objects.create(nombre='Tornos')
+        self.maquinas = [
+            crear_maquina(categoria, 1, estado='operativa'),
+            crear_maquina(categoria, 2, estado='operativa', condicion='buena'),
+            crear_maquina(categoria, 3, estado='mantenimiento'),
+            crear_maquina(categoria, 4),
+        ]
+        for prioridad, estado in (('critica', 'activa'), ('alta', 'activa'), ('alta', 'resuelta')):
+            AlertaMaquina.objects.create(maquina=self.maquinas[0], tipo='inspeccion', prioridad=prioridad,
+                                         estado=estado, titulo='Revisión', descripcion='-')
+
+    def test_una_consulta_por_tabla(self):
+        with self.assertNumQueries(2):
+            stats = FleetStats.calcular_desde_tablas()
+
+        self.assertEqual(stats.total_maquinas, 4)
+        self.assertEqual((stats.maquinas_operativas, stats.maquinas_mantenimiento, stats.maquinas_disponibles),
+                         (2, 1, 1))
+        self.assertEqual(stats.porcentaje_operativas, 50)
+        self.assertEqual(stats.maquinas_por_condicion['buena'], 1)
+        self.assertEqual((stats.total_alertas, stats.alertas_activas), (3, 2))
+        # Solo las alertas activas cuentan por prioridad
+        self.assertEqual((stats.alertas_criticas, stats.alertas_altas, stats.alertas_medias), (1, 1, 0))
+
+    def test_contadores_ida_y_vuelta(self):
+        stats = FleetStats.calcular_desde_tablas()
+        self.assertEqual(FleetStats.desde_contadores(stats.contadores()).as_dict(), stats.as_dict())
+
+    def test_flota_vacia(self):
+        Maquina.objects.all().delete()
+        stats = FleetStats.calcular_desde_tablas()
+        self.assertEqual((stats.total_maquinas, stats.porcentaje_operativas, stats.total_alertas), (0, 0, 0))
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ContadoresFlotaTests(TestCase):
+    def setUp(self):
+        self.categoria = CategoriaMaquina.objects.create(nombre='Tornos')
+
+    def test_deltas_con_instancia_desactualizada(self):
+        maquina = crear_maquina(self.categoria, 1)
+        desactualizada = Maquina.objects.get(pk=maquina.pk)
+
+        maquina.estado = 'mantenimiento'
+        maquina.save()
+        # La instancia vieja cree que la máquina sigue 'disponible'
+        desactualizada.estado = 'reparacion'
+        desactualizada.save()
+
+        valores = ContadorFlota.valores()
+        self.assertEqual(valores.get('maquina.estado.disponible', 0), 0)
+        self.assertEqual(valores.get('maquina.estado.mantenimiento', 0), 0)
+        self.assertEqual(valores['maquina.estado.reparacion'], 1)
+        self.assertEqual(verificar_contadores(), {})
+
+    def test_update_fields_sin_campos_contados(self):
+        maquina = crear_maquina(self.categoria, 1)
+        maquina.observaciones = 'Sin cambios de estado'
+        maquina.save(update_fields=['observaciones'])
+        self.assertEqual(ContadorFlota.valores()['maquina.estado.disponible'], 1)
+
+    def test_alertas_y_eliminacion(self):
+        maquina = crear_maquina(self.categoria, 1)
+        alerta = AlertaMaquina.objects.create(maquina=maquina, tipo='inspeccion', prioridad='alta',
+                                              titulo='Revisión', descripcion='Revisar')
+        self.assertEqual(ContadorFlota.valores()['alerta.prioridad.alta'], 1)
+
+        alerta.estado = 'resuelta'
+        alerta.save()
+        valores = ContadorFlota.valores()
+        self.assertEqual(valores['alerta.prioridad.alta'], 0)
+        self.assertEqual(valores['alerta.estado.resuelta'], 1)
+
+        maquina.delete()
+        self.assertEqual(verificar_contadores(), {})
+        self.assertEqual(ContadorFlota.valores()['maquina.estado.disponible'], 0)
+
+    def test_reconstruir_contadores(self):
+        crear_maquina(self.categoria, 1)
+        crear_maquina(self.categoria, 2, condicion='buena')
+        ContadorFlota.objects.filter(clave='maquina.estado.disponible').update(valor=99)
+        ContadorFlota.objects.filter(clave='maquina.condicion.buena').delete()
+
+        diferencias = reconstruir_contadores()
+
+        self.assertEqual(diferencias['maquina.estado.disponible'], (99, 2))
+        self.assertEqual(diferencias['maquina.condicion.buena'], (0, 1))
+        self.assertEqual(verificar_contadores(), {})
+        self.assertEqual(reconstruir_contadores(), {})
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ListaMaquinasViewTests(TestCase):
+    def setUp(self):
+        categoria = CategoriaMaquina.objects.create(nombre='Tornos')
+        for numero in range(1, 23):
+            crear_maquina(categoria, numero)
+        self.user = User.objects.create_user('lista')
+
+    def get(self, **parametros):
+        request = RequestFactory().get('/maquinaria/', parametros)
+        request.user = self.user
+        request.usuario = None
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        return lista_maquinas_view(request)
+
+    def test_total_solo_con_contar(self):
+        with mock.patch('components.paginacion.contar_aproximado') as contar:
+            respuesta = self.get()
+        contar.assert_not_called()
+        self.assertContains(respuesta, 'Ver total')
+
+        respuesta = self.get(contar='1')
+        self.assertContains(respuesta, 'de ~22 máquinas')
+        # La siguiente página conserva ?contar=1
+        self.assertContains(respuesta, 'contar=1&amp;cursor=')
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class BusquedaFTS5Tests(TestCase):
+    def setUp(self):
+        self.backend = BackendFTS5()
+        self.categoria = CategoriaMaquina.objects.create(nombre='Tornos')
+
+    def codigos(self, maquinas):
+        return [maquina.codigo_inventario for maquina in maquinas]
+
+    def test_relevancia_por_campo(self):
+        crear_maquina(self.categoria, 1, nombre='Fresadora', especificaciones_tecnicas='Incluye torno auxiliar')
+        crear_maquina(self.categoria, 2, nombre='Torno paralelo')
+        crear_maquina(self.categoria, 3, nombre='Taladro')
+        self.assertEqual(self.codigos(self.backend.buscar('torno')), ['MAQ-002', 'MAQ-001'])
+
+    def test_prefijos_tildes_y_todos_los_terminos(self):
+        crear_maquina(self.categoria, 1, nombre='Torno CNC', marca='HAAS')
+        crear_maquina(self.categoria, 2, nombre='Torno paralelo', marca='Romi')
+        self.assertEqual(self.codigos(self.backend.buscar('tór')), ['MAQ-001', 'MAQ-002'])
+        self.assertEqual(self.codigos(self.backend.buscar('torno haas')), ['MAQ-001'])
+        self.assertEqual(self.backend.buscar('"!'), [])
+
+    def test_filtros_con_muchas_coincidencias(self):
+        Maquina.objects.bulk_create([
+            Maquina(codigo_inventario=f'LOTE-{numero:04d}', nombre='Torno', categoria=self.categoria, marca='Marca',
+                    modelo='Modelo', numero_serie=f'L-{numero:04d}', ubicacion='Taller', centro_formacion='Centro',
+                    fecha_adquisicion=date(2024, 1, 1), valor_adquisicion=1,
+                    estado='operativa' if numero % 500 == 0 else 'disponible')
+            for numero in range(1, 1501)
+        ])
+        self.backend.reconstruir()
+        # Con el nombre repetido en la marca queda primera aunque tenga el id más alto
+        crear_maquina(self.categoria, 1, nombre='Torno', marca='Torno', estado='operativa')
+
+        with self.assertNumQueries(1):
+            resultado = self.backend.buscar('torno', Maquina.objects.filter(estado='operativa'), limite=3)
+        self.assertEqual(self.codigos(resultado), ['MAQ-001', 'LOTE-0500', 'LOTE-1000'])
+
+        # Sin filtros el límite se aplica dentro del índice
+        self.assertEqual(len(self.backend.buscar('torno', limite=5)), 5)
+
+    def test_filtrar_conserva_el_orden_del_queryset(self):
+        for numero, nombre in ((3, 'Torno A'), (1, 'Torno B'), (2, 'Fresadora')):
+            crear_maquina(self.categoria, numero, nombre=nombre)
+        filtradas = self.backend.filtrar(Maquina.objects.order_by('-codigo_inventario'), 'torno')
+        self.assertEqual(self.codigos(filtradas), ['MAQ-003', 'MAQ-001'])
+        self.assertFalse(self.backend.filtrar(Maquina.objects.all(), ' ').exists())
+
+    def test_indice_sigue_a_las_maquinas(self):
+        maquina = crear_maquina(self.categoria, 1, nombre='Torno')
+        maquina.nombre = 'Fresadora'
+        maquina.save()
+        self.assertEqual(self.backend.buscar('torno'), [])
+        self.assertEqual(self.codigos(self.backend.buscar('fresa')), ['MAQ-001'])
+
+        maquina.delete()
+        self.assertEqual(self.backend.buscar('fresa'), [])
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class AutocompletadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.categoria = CategoriaMaquina.objects.create(nombre='Tornos')
+        self.indice = IndicePrefijos()
+
+    def codigos(self, texto):
+        return [fila['codigo'] for fila in self.indice.buscar(texto)]
+
+    def test_codigo_antes_que_nombre_y_sin_tildes(self):
+        crear_maquina(self.categoria, 1, nombre='Excavadora hidráulica')
+        crear_maquina(self.categoria, 2, codigo_inventario='EXC-002', nombre='Torno')
+        self.assertEqual(self.codigos('ex'), ['EXC-002', 'MAQ-001'])
+        self.assertEqual(self.codigos('HIDRAU'), ['MAQ-001'])
+        self.assertEqual(self.codigos(' '), [])
+
+    def test_aplica_cambios_sin_reconstruir(self):
+        maquina = crear_maquina(self.categoria, 1, nombre='Torno')
+        self.assertEqual(self.codigos('torno'), ['MAQ-001'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            maquina.nombre = 'Fresadora'
+            maquina.save()
+        with mock.patch.object(self.indice, 'construir') as construir:
+            self.assertEqual(self.codigos('torno'), [])
+            self.assertEqual(self.codigos('fresa'), ['MAQ-001'])
+        construir.assert_not_called()
+
+    def test_eliminacion_y_creacion_en_el_mismo_cambio(self):
+        eliminada = crear_maquina(self.categoria, 1, nombre='Torno viejo')
+        self.assertEqual(self.codigos('torno'), ['MAQ-001'])
+
+        # El total no cambia y la fila nueva conserva un updated_at anterior (p. ej. loaddata)
+        with self.captureOnCommitCallbacks(execute=True):
+            eliminada.delete()
+            nueva = crear_maquina(self.categoria, 2, nombre='Torno nuevo')
+            Maquina.objects.filter(pk=nueva.pk).update(updated_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(self.codigos('torno'), ['MAQ-002'])
+        self.assertEqual(self.codigos('viejo'), [])
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ImportacionTests(TestCase):
+    CSV = (
+        'codigo_inventario,nombre,categoria,marca,modelo,numero_serie,ubicacion,'
+        'centro_formacion,fecha_adquisicion,valor_adquisicion,estado\n'
+        'IMP-001,Torno,tornos,Marca,M1,S-001,Taller,Centro,2024-01-01,1000,disponible\n'
+        'IMP-002,Fresadora,Tornos,Marca,M2,S-002,Taller,Centro,2024-01-01,2000,operativa\n'
+    )
+
+    def setUp(self):
+        CategoriaMaquina.objects.create(nombre='Tornos')
+
+    def importar(self, contenido=None, sobrescribir=False):
+        archivo = io.BytesIO((contenido or self.CSV).encode('utf-8'))
+        return ImportadorMaquinas(sobrescribir=sobrescribir).importar(leer_filas(archivo, 'maquinas.csv'))
+
+    def test_importar_dos_veces_no_duplica(self):
+        primero = self.importar()
+        self.assertEqual((primero.creadas, primero.omitidas, primero.total_errores), (2, 0, 0))
+
+        segundo = self.importar()
+        self.assertEqual((segundo.creadas, segundo.actualizadas, segundo.omitidas), (0, 0, 2))
+        self.assertEqual(Maquina.objects.count(), 2)
+        self.assertEqual(ContadorFlota.valores()['maquina.estado.disponible'], 1)
+        self.assertEqual(verificar_contadores(), {})
+
+    def test_sobrescribir_actualiza_y_mantiene_contadores(self):
+        self.importar()
+        resultado = self.importar(self.CSV.replace(',operativa', ',reparacion'), sobrescribir=True)
+
+        self.assertEqual((resultado.creadas, resultado.actualizadas), (0, 2))
+        self.assertEqual(Maquina.objects.get(codigo_inventario='IMP-002').estado, 'reparacion')
+        self.assertEqual(verificar_contadores(), {})
+
+    def test_cambio_concurrente_antes_de_escribir(self):
+        self.importar()
+        atomic = transaction.atomic
+        pendiente = [True]
+
+        def cambiar_antes(*args, **kwargs):
+            # Otra petición cambia la máquina después de que el importador la leyó
+            if pendiente:
+                pendiente.clear()
+                maquina = Maquina.objects.get(codigo_inventario='IMP-001')
+                maquina.estado = 'mantenimiento'
+                maquina.condicion = 'mala'
+                maquina.save()
+            return atomic(*args, **kwargs)
+
+        with mock.patch('maquinaria.importacion.transaction.atomic', side_effect=cambiar_antes):
+            resultado = self.importar(sobrescribir=True)
+
+        self.assertEqual(resultado.actualizadas, 2)
+        # El archivo trae estado pero no condición: la condición concurrente se conserva
+        maquina = Maquina.objects.get(codigo_inventario='IMP-001')
+        self.assertEqual((maquina.estado, maquina.condicion), ('disponible', 'mala'))
+        self.assertEqual(verificar_contadores(), {})
+
+    def test_errores_por_fila(self):
+        contenido = self.CSV + 'IMP-001,Repetida,Tornos,Marca,M3,S-003,Taller,Centro,2024-01-01,10,disponible\n'
+        contenido += 'IMP-003,Sin categoría,Prensas,Marca,M4,S-004,Taller,Centro,2024-01-01,10,disponible\n'
+        resultado = self.importar(contenido)
+
+        self.assertEqual(resultado.creadas, 2)
+        self.assertEqual([error['fila'] for error in resultado.errores], [4, 5])
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ExportacionTests(TestCase):
+    def setUp(self):
+        self.tornos = CategoriaMaquina.objects.create(nombre='Tornos')
+        fresadoras = CategoriaMaquina.objects.create(nombre='Fresadoras')
+        crear_maquina(self.tornos, 1, nombre='Torno, "paralelo"', estado='operativa')
+        crear_maquina(self.tornos, 2, estado='retirada')
+        crear_maquina(fresadoras, 3)
+
+    def contenido(self, respuesta):
+        return b''.join(respuesta.streaming_content).decode('utf-8')
+
+    def test_csv_en_streaming_con_etiquetas(self):
+        respuesta = exportar_maquinas('csv')
+        self.assertTrue(respuesta.streaming)
+        self.assertIn('attachment; filename="inventario_maquinas_', respuesta['Content-Disposition'])
+
+        lineas = self.contenido(respuesta).splitlines()
+        self.assertTrue(lineas[0].startswith('\ufeffCódigo,Nombre,Categoría'))
+        # Las retiradas se excluyen salvo que se pidan
+        self.assertEqual([linea.split(',')[0] for linea in lineas[1:]], ['MAQ-001', 'MAQ-003'])
+        self.assertIn('MAQ-001,"Torno, ""paralelo""",Tornos', lineas[1])
+        self.assertIn(',Operativa,', lineas[1])
+
+    def test_ndjson_con_filtros_y_claves(self):
+        respuesta = exportar_maquinas('ndjson', categorias=[self.tornos], incluir_inactivas=True)
+        filas = [json.loads(linea) for linea in self.contenido(respuesta).splitlines()]
+        self.assertEqual([(fila['codigo_inventario'], fila['estado']) for fila in filas],
+                         [('MAQ-001', 'operativa'), ('MAQ-002', 'retirada')])
+        self.assertEqual(filas[0]['valor_adquisicion'], '1000000.00')
+        self.assertIsNone(filas[0]['proveedor'])
+
+    def test_excel_write_only(self):
+        from openpyxl import load_workbook
+
+        respuesta = exportar_maquinas('excel')
+        libro = load_workbook(io.BytesIO(b''.join(respuesta.streaming_content)), read_only=True)
+        filas = list(libro.active.values)
+        self.assertEqual(filas[0][:2], ('Código', 'Nombre'))
+        self.assertEqual([fila[0] for fila in filas[1:]], ['MAQ-001', 'MAQ-003'])
+
+    def test_formato_desconocido(self):
+        with self.assertRaises(ValueError):
+            exportar_maquinas('xml')
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ProgramacionTests(TestCase):
+    def test_segunda_ejecucion_no_duplica(self):
+        categoria = CategoriaMaquina.objects.create(nombre='Tornos')
+        hoy = timezone.localdate()
+        crear_maquina(categoria, 1, fecha_ultimo_mantenimiento=hoy - timedelta(days=100))
+        crear_maquina(categoria, 2, fecha_ultimo_mantenimiento=hoy)
+        crear_maquina(categoria, 3, fecha_ultimo_mantenimiento=hoy - timedelta(days=100), estado='retirada')
+
+        primero = programar_mantenimientos(horizonte_dias=30)
+        self.assertEqual((primero.revisadas, primero.creados), (2, 1))
+        mantenimiento = MantenimientoProgramado.objects.get()
+        self.assertEqual(mantenimiento.maquina.codigo_inventario, 'MAQ-001')
+        self.assertEqual(mantenimiento.prioridad, 'alta')
+
+        segundo = programar_mantenimientos(horizonte_dias=30)
+        self.assertEqual((segundo.creados, segundo.con_mantenimiento_abierto), (0, 1))
+        self.assertEqual(MantenimientoProgramado.objects.count(), 1)
+
+    def test_simular_no_escribe(self):
+        categoria = CategoriaMaquina.objects.create(nombre='Tornos')
+        crear_maquina(categoria, 1, fecha_ultimo_mantenimiento=timezone.localdate() - timedelta(days=100))
+        self.assertEqual(programar_mantenimientos(simular=True).creados, 1)
+        self.assertFalse(MantenimientoProgramado.objects.exists())
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class AsignacionTests(TestCase):
+    def setUp(self):
+        self.maquina = crear_maquina(CategoriaMaquina.objects.create(nombre='Tornos'), 1)
+        tipo = TipoUsuario.objects.create(nombre='tecnico')
+        self.tecnico = crear_usuario(tipo)
+        self.desde = timezone.now().replace(microsecond=0)
+
+    def mantenimiento(self, titulo, inicio, duracion, **datos):
+        return MantenimientoProgramado.objects.create(
+            maquina=self.maquina, tipo='preventivo', titulo=titulo, descripcion='-',
+            fecha_programada=inicio, duracion_estimada=duracion, **datos
+        )
+
+    def test_plan_sin_solapamientos(self):
+        # Trabajo largo que empezó antes de la ventana y sigue ocupando al técnico
+        self.mantenimiento('En curso', self.desde - timedelta(hours=5), timedelta(hours=8),
+                           estado='en_progreso', tecnico_asignado=self.tecnico)
+        for numero in range(3):
+            self.mantenimiento(f'Pendiente {numero}', self.desde + timedelta(hours=1), timedelta(hours=2))
+
+        plan = calcular_plan(desde=self.desde, hasta=self.desde + timedelta(days=1))
+
+        self.assertEqual(len(plan.asignaciones), 3)
+        intervalos = sorted((a['inicio'], a['fin']) for a in plan.asignaciones)
+        self.assertGreaterEqual(intervalos[0][0], self.desde + timedelta(hours=3))
+        for (_, fin), (inicio, _) in zip(intervalos, intervalos[1:]):
+            self.assertLessEqual(fin, inicio)
+
+        self.assertEqual(aplicar_plan(plan), 3)
+        self.assertEqual(MantenimientoProgramado.objects.filter(tecnico_asignado=self.tecnico).count(), 4)
+
+    def test_fuera_de_ventana_queda_sin_asignar(self):
+        self.mantenimiento('Largo', self.desde, timedelta(hours=21))
+        self.mantenimiento('Siguiente', self.desde, timedelta(hours=2), prioridad='baja')
+
+        plan = calcular_plan(desde=self.desde, hasta=self.desde + timedelta(hours=21))
+
+        self.assertEqual([a['titulo'] for a in plan.asignaciones], ['Largo'])
+        self.assertEqual(len(plan.sin_asignar), 1)
+
+    def test_aplicar_omite_los_que_cambiaron(self):
+        cambiado = self.mantenimiento('Cambia', self.desde + timedelta(hours=1), timedelta(hours=2))
+        self.mantenimiento('Estable', self.desde + timedelta(hours=4), timedelta(hours=2))
+        plan = calcular_plan(desde=self.desde, hasta=self.desde + timedelta(days=1))
+
+        MantenimientoProgramado.objects.filter(pk=cambiado.pk).update(estado='cancelado')
+
+        self.assertEqual(aplicar_plan(plan), 1)
+        self.assertEqual([s['mantenimiento_id'] for s in plan.sin_asignar], [cambiado.pk])
+        cambiado.refresh_from_db()
+        self.assertIsNone(cambiado.tecnico_asignado_id)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class CalendarioTests(TestCase):
+    def evento(self, id, desde_hora, hasta_hora, maquina_id=1, tecnico_id=None):
+        base = timezone.make_aware(datetime(2024, 3, 4))
+        return {'id': id, 'inicio': base + timedelta(hours=desde_hora), 'fin': base + timedelta(hours=hasta_hora),
+                'maquina_id': maquina_id, 'tecnico_id': tecnico_id}
+
+    def pares(self, lista, por='maquina'):
+        return [solape['eventos'] for solape in solapes(lista, por)]
+
+    def test_anidados_reportan_todos_los_pares(self):
+        lista = [self.evento(1, 0, 10), self.evento(2, 1, 5), self.evento(3, 2, 4)]
+        self.assertEqual(self.pares(lista), [[1, 2], [1, 3], [2, 3]])
+        # El tramo común es el del que termina antes
+        self.assertEqual(solapes(lista, 'maquina')[2]['hasta'], lista[2]['fin'])
+
+    def test_contiguos_y_otras_maquinas_no_se_solapan(self):
+        lista = [self.evento(1, 0, 2), self.evento(2, 2, 4), self.evento(3, 1, 3, maquina_id=2),
+                 self.evento(4, 2, 5, maquina_id=2, tecnico_id=7), self.evento(5, 4, 6, tecnico_id=7)]
+        self.assertEqual(self.pares(lista), [[3, 4]])
+        self.assertEqual(self.pares(lista, 'tecnico'), [[4, 5]])
+
+    def test_calendario_agrupa_y_detecta_solapes(self):
+        maquina = crear_maquina(CategoriaMaquina.objects.create(nombre='Tornos'), 1)
+        inicio = timezone.make_aware(datetime(2024, 3, 4, 8))
+        for titulo, horas, duracion in (('Largo', 0, 8), ('Medio', 1, 3), ('Corto', 2, 1)):
+            MantenimientoProgramado.objects.create(
+                maquina=maquina, tipo='preventivo', titulo=titulo, descripcion='-',
+                fecha_programada=inicio + timedelta(hours=horas), duracion_estimada=timedelta(hours=duracion),
+            )
+
+        datos = calendario(date(2024, 3, 4), date(2024, 3, 4))
+        self.assertEqual(datos['total'], 3)
+        self.assertEqual(list(datos['grupos']), ['2024-03-04'])
+        self.assertEqual(len(datos['solapes']['maquina']), 3)
+        with self.assertRaises(ValueError):
+            calendario(date(2024, 3, 4), date(2024, 3, 1))
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class GenerarAlertasTests(TestCase):
+    def setUp(self):
+        self.maquina = crear_maquina(CategoriaMaquina.objects.create(nombre='Tornos'), 1,
+                                     proximo_mantenimiento=timezone.localdate() - timedelta(days=40))
+
+    def test_alerta_manual_del_mismo_tipo_no_bloquea_la_regla(self):
+        AlertaMaquina.objects.create(maquina=self.maquina, tipo='mantenimiento', titulo='Ruido en el motor',
+                                     descripcion='-')
+
+        resultado = generar_alertas(tipos=['mantenimiento'])
+        self.assertEqual(resultado.por_tipo, {'mantenimiento': 1})
+        alerta = AlertaMaquina.objects.get(titulo='Mantenimiento vencido')
+        self.assertIn('40 días de retraso', alerta.descripcion)
+        self.assertEqual(verificar_contadores(), {})
+
+    def test_no_duplica_alertas_abiertas_de_la_regla(self):
+        self.assertEqual(generar_alertas(tipos=['mantenimiento']).creadas, 1)
+        self.assertEqual(generar_alertas(tipos=['mantenimiento']).creadas, 0)
+
+        # Una alerta abierta sin huella guardada y con otro formato del título también cuenta
+        AlertaMaquina.objects.update(titulo='MANTENIMIENTO vencido!', huella='')
+        self.assertEqual(generar_alertas(tipos=['mantenimiento'], simular=True).creadas, 0)
+
+        AlertaMaquina.objects.update(estado='resuelta')
+        self.assertEqual(generar_alertas(tipos=['mantenimiento']).creadas, 1)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class RegistrarAlertaTests(TestCase):
+    def setUp(self):
+        self.maquina = crear_maquina(CategoriaMaquina.objects.create(nombre='Tornos'), 1)
+
+    def test_repeticion_suma_ocurrencia_y_sube_prioridad(self):
+        alerta, creada, anterior = registrar_alerta(self.maquina, 'reparacion', 'media', 'Falla en el motor', '-')
+        self.assertTrue(creada)
+        self.assertIsNone(anterior)
+
+        # Mismo título normalizado: mayúsculas, tildes y signos no cuentan
+        repetida, creada, anterior = registrar_alerta(self.maquina, 'reparacion', 'critica', 'FALLA en el motór!', '-')
+        self.assertFalse(creada)
+        self.assertEqual(repetida.pk, alerta.pk)
+        self.assertEqual(anterior, 'media')
+
+        alerta.refresh_from_db()
+        self.assertEqual((alerta.ocurrencias, alerta.prioridad), (2, 'critica'))
+        self.assertEqual(AlertaMaquina.objects.count(), 1)
+        self.assertEqual(verificar_contadores(), {})
+
+        # Una prioridad menor no la baja
+        _, _, anterior = registrar_alerta(self.maquina, 'reparacion', 'baja', 'Falla en el motor', '-')
+        alerta.refresh_from_db()
+        self.assertIsNone(anterior)
+        self.assertEqual((alerta.ocurrencias, alerta.prioridad), (3, 'critica'))
+
+    def test_no_agrupa_fuera_de_ventana_ni_resueltas(self):
+        alerta, _, _ = registrar_alerta(self.maquina, 'reparacion', 'media', 'Falla en el motor', '-')
+        AlertaMaquina.objects.filter(pk=alerta.pk).update(ultima_ocurrencia=timezone.now() - timedelta(hours=2))
+        self.assertTrue(registrar_alerta(self.maquina, 'reparacion', 'media', 'Falla en el motor', '-')[1])
+
+        AlertaMaquina.objects.update(estado='resuelta')
+        self.assertTrue(registrar_alerta(self.maquina, 'reparacion', 'media', 'Falla en el motor', '-')[1])
+        # Otro tipo con el mismo título es otra alerta
+        self.assertTrue(registrar_alerta(self.maquina, 'inspeccion', 'media', 'Falla en el motor', '-')[1])
+
+    @override_settings(ALERTAS_MAXIMO_POR_MAQUINA=2)
+    def test_limite_por_maquina(self):
+        registrar_alerta(self.maquina, 'reparacion', 'media', 'Falla 1', '-')
+        registrar_alerta(self.maquina, 'reparacion', 'media', 'Falla 2', '-')
+
+        # Las repeticiones no cuentan como alertas nuevas
+        self.assertFalse(registrar_alerta(self.maquina, 'reparacion', 'media', 'Falla 1', '-')[1])
+        with self.assertRaises(LimiteAlertasExcedido):
+            registrar_alerta(self.maquina, 'reparacion', 'media', 'Falla 3', '-')
+        self.assertEqual(AlertaMaquina.objects.count(), 2)
+
+        otra = crear_maquina(self.maquina.categoria, 2)
+        self.assertTrue(registrar_alerta(otra, 'reparacion', 'media', 'Falla 3', '-')[1])
+
+    def test_huella_sigue_al_titulo_editado(self):
+        alerta, _, _ = registrar_alerta(self.maquina, 'reparacion', 'media', 'Falla en el motor', '-')
+        alerta.titulo = 'Fuga de aceite'
+        alerta.save(update_fields=['titulo'])
+        alerta.refresh_from_db()
+        self.assertEqual(alerta.huella, calcular_huella(self.maquina.pk, 'reparacion', 'Fuga de aceite'))
+
+        # La repetición se agrupa con el título nuevo y no con el anterior
+        self.assertFalse(registrar_alerta(self.maquina, 'reparacion', 'media', 'Fuga de aceite', '-')[1])
+        self.assertTrue(registrar_alerta(self.maquina, 'reparacion', 'media', 'Falla en el motor', '-')[1])
+
+        alerta.tipo = 'inspeccion'
+        alerta.save()
+        self.assertEqual(AlertaMaquina.objects.get(pk=alerta.pk).huella,
+                         calcular_huella(self.maquina.pk, 'inspeccion', 'Fuga de aceite'))
 
-# Create your tests here.
@@ -2,10 +2,13 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Q, Count
-from django.core.paginator import Paginator
+from django.db.models import Count
+from components.paginacion import KeysetPaginator
 from django.utils import timezone
 from .models import Maquina, CategoriaMaquina, Proveedor, AlertaMaquina, HistorialMaquina, MantenimientoProgramado
+from .estadisticas import FleetStats
+from .busqueda import obtener_backend
+from .autocompletado import indice_maquinas
 from usuarios.models import Usuario
 
 # Dashboard
@@ -13,10 +16,7 @@ from usuarios.models import Usuario
 def dashboard_view(request):
     """Dashboard principal de maquinaria con estadísticas reales"""
     # Estadísticas básicas
-    total_maquinas = Maquina.objects.count()
-    maquinas_operativas = Maquina.objects.filter(estado='operativa').count()
-    maquinas_mantenimiento = Maquina.objects.filter(estado='mantenimiento').count()
-    alertas_activas = AlertaMaquina.objects.filter(estado='activa').count()
+    stats = FleetStats.calcular()
 
     # Estadísticas por categoría
     stats_por_categoria = CategoriaMaquina.objects.annotate(
@@ -35,10 +35,10 @@ def dashboard_view(request):
 
     context = {
         'title': 'Dashboard Maquinaria',
-        'total_maquinas': total_maquinas,
-        'maquinas_operativas': maquinas_operativas,
-        'maquinas_mantenimiento': maquinas_mantenimiento,
-        'alertas_activas': alertas_activas,
+        'total_maquinas': stats.total_maquinas,
+        'maquinas_operativas': stats.maquinas_operativas,
+        'maquinas_mantenimiento': stats.maquinas_mantenimiento,
+        'alertas_activas': stats.alertas_activas,
         'stats_por_categoria': stats_por_categoria,
         'actividad_reciente': actividad_reciente,
         'alertas_recientes': alertas_recientes,
@@ -64,17 +64,12 @@ def lista_maquinas_view(request):
         maquinas_list = maquinas_list.filter(categoria_id=categoria_filtro)
 
     if busqueda:
-        maquinas_list = maquinas_list.filter(
-            Q(codigo_inventario__icontains=busqueda) |
-            Q(nombre__icontains=busqueda) |
-            Q(marca__icontains=busqueda) |
-            Q(modelo__icontains=busqueda)
-        )
+        maquinas_list = obtener_backend().filtrar(maquinas_list, busqueda)
 
-    # Paginación
-    paginator = Paginator(maquinas_list, 20)
-    page = request.GET.get('page')
-    maquinas = paginator.get_page(page)
+    # Paginación por cursor sobre (codigo_inventario, id); el total solo con ?contar=1
+    paginator = KeysetPaginator(maquinas_list, ('codigo_inventario', 'id'), per_page=20,
+                                contar=request.GET.get('contar') == '1')
+    maquinas = paginator.get_page(request.GET.get('cursor'))
 
     # Para los filtros en template
     categorias = CategoriaMaquina.objects.filter(activa=True)
@@ -101,12 +96,7 @@ def crear_maquina_view(request):
             maquina = form.save(commit=False)
 
             # Asignar usuario creador
-            try:
-                usuario = Usuario.objects.get(numero_documento=request.user.username)
-                maquina.created_by = usuario
-            except Usuario.DoesNotExist:
-                pass
-
+            maquina.created_by = request.usuario or None
             maquina.save()
 
             # Crear entrada en el historial
@@ -169,16 +159,11 @@ def editar_maquina_view(request, pk):
 
             # Crear entrada en el historial si hubo cambios
             if campos_cambiados:
-                try:
-                    usuario = Usuario.objects.get(numero_documento=request.user.username)
-                except Usuario.DoesNotExist:
-                    usuario = None
-
                 HistorialMaquina.objects.create(
                     maquina=maquina_actualizada,
                     tipo_evento='actualizacion',
                     descripcion=f'Máquina actualizada. Campos modificados: {", ".join(campos_cambiados)}',
-                    usuario=usuario
+                    usuario=request.usuario or None
                 )
 
             messages.success(request, f'Máquina {maquina.codigo_inventario} actualizada exitosamente')
@@ -205,18 +190,12 @@ def eliminar_maquina_view(request, pk):
         codigo = maquina.codigo_inventario
         nombre = maquina.nombre
 
-        # Crear entrada en el historial antes de eliminar
-        try:
-            usuario = Usuario.objects.get(numero_documento=request.user.username)
-        except Usuario.DoesNotExist:
-            usuario = None
-
         # Guardar información para el historial antes de eliminar
         HistorialMaquina.objects.create(
             maquina=maquina,
             tipo_evento='eliminacion',
             descripcion=f'Máquina {codigo} - {nombre} eliminada del sistema',
-            usuario=usuario
+            usuario=request.usuario or None
         )
 
         # Eliminar la máquina (esto también eliminará el historial por CASCADE)
@@ -253,18 +232,13 @@ def cambiar_estado_maquina(request, pk):
             maquina.save()
 
             # Crear entrada en el historial
-            try:
-                usuario = Usuario.objects.get(numero_documento=request.user.username)
-            except Usuario.DoesNotExist:
-                usuario = None
-
             HistorialMaquina.objects.create(
                 maquina=maquina,
                 tipo_evento='cambio_estado',
                 descripcion=f'Estado cambiado de "{estado_anterior}" a "{nuevo_estado}". {observaciones}',
                 valor_anterior=estado_anterior,
                 valor_nuevo=nuevo_estado,
-                usuario=usuario
+                usuario=request.usuario or None
             )
 
             return JsonResponse({
@@ -281,7 +255,20 @@ def cambiar_estado_maquina(request, pk):
 
 @login_required
 def historial_maquina_view(request, pk):
-    return render(request, 'maquinaria/historial_maquina.html', {'title': 'Historial Máquina'})
+    """Historial completo de una máquina con paginación por cursor"""
+    maquina = get_object_or_404(Maquina, pk=pk)
+    historial_list = HistorialMaquina.objects.filter(maquina=maquina).select_related('usuario')
+
+    paginator = KeysetPaginator(historial_list, ('-fecha_evento', 'id'), per_page=25)
+    historial = paginator.get_page(request.GET.get('cursor'))
+
+    context = {
+        'title': 'Historial Máquina',
+        'maquina': maquina,
+        'historial': historial,
+    }
+
+    return render(request, 'maquinaria/historial_maquina.html', context)
 
 # Categorías y proveedores
 @login_required
@@ -324,17 +311,7 @@ def alertas_view(request):
     from django.utils import timezone
     from datetime import date
 
-    alertas_criticas = AlertaMaquina.objects.filter(
-        estado='activa', prioridad='critica'
-    ).count()
-
-    alertas_altas = AlertaMaquina.objects.filter(
-        estado='activa', prioridad='alta'
-    ).count()
-
-    alertas_medias = AlertaMaquina.objects.filter(
-        estado='activa', prioridad='media'
-    ).count()
+    stats = FleetStats.calcular()
 
     alertas_resueltas_hoy = AlertaMaquina.objects.filter(
         estado='resuelta',
@@ -349,10 +326,9 @@ def alertas_view(request):
         count=Count('id')
     ).order_by('-count')
 
-    # Paginación
-    paginator = Paginator(alertas_list.order_by('-fecha_creacion'), 15)
-    page = request.GET.get('page')
-    alertas = paginator.get_page(page)
+    # Paginación por cursor sobre (-fecha_creacion, id)
+    paginator = KeysetPaginator(alertas_list, ('-fecha_creacion', 'id'), per_page=15)
+    alertas = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'title': 'Alertas de Maquinaria',
@@ -360,9 +336,9 @@ def alertas_view(request):
         'estado_filtro': estado_filtro,
         'prioridad_filtro': prioridad_filtro,
         'tipo_filtro': tipo_filtro,
-        'alertas_criticas': alertas_criticas,
-        'alertas_altas': alertas_altas,
-        'alertas_medias': alertas_medias,
+        'alertas_criticas': stats.alertas_criticas,
+        'alertas_altas': stats.alertas_altas,
+        'alertas_medias': stats.alertas_medias,
         'alertas_resueltas_hoy': alertas_resueltas_hoy,
         'tipos_alertas': tipos_alertas,
     }
@@ -416,23 +392,15 @@ def crear_alerta_view(request):
             }
             tipo_modelo = tipo_mapping.get(tipo_alerta, 'mantenimiento')
 
-            # Crear la alerta
-            alerta = AlertaMaquina.objects.create(
-                maquina=maquina,
-                tipo=tipo_modelo,
-                prioridad=prioridad,
-                titulo=titulo,
-                descripcion=descripcion,
-                estado='activa'
-            )
-
-            # Obtener usuario creador
+            # Crear la alerta, o sumar una ocurrencia si repite una abierta
+            from .alertas import LimiteAlertasExcedido, registrar_alerta
             try:
-                usuario = Usuario.objects.get(numero_documento=request.user.username)
-                alerta.created_by = usuario
-                alerta.save()
-            except Usuario.DoesNotExist:
-                pass
+                alerta, creada, prioridad_anterior = registrar_alerta(
+                    maquina, tipo_modelo, prioridad, titulo, descripcion, usuario=request.usuario or None
+                )
+            except LimiteAlertasExcedido as e:
+                messages.error(request, f'{e}. Revise las alertas abiertas de la máquina antes de crear otra.')
+                return redirect('maquinaria:alertas')
 
             # Crear entrada en el historial
             datos_adicionales = {
@@ -447,18 +415,31 @@ def crear_alerta_view(request):
                 'fecha_estimada': fecha_estimada
             }
 
-            HistorialMaquina.objects.create(
-                maquina=maquina,
-                tipo_evento='alerta_creada',
-                descripcion=f'Alerta creada: {titulo} (Prioridad: {prioridad})',
-                valor_nuevo=json.dumps(datos_adicionales, ensure_ascii=False),
-                usuario=alerta.created_by
-            )
+            if creada:
+                HistorialMaquina.objects.create(
+                    maquina=maquina,
+                    tipo_evento='alerta_creada',
+                    descripcion=f'Alerta creada: {titulo} (Prioridad: {prioridad})',
+                    valor_nuevo=json.dumps(datos_adicionales, ensure_ascii=False),
+                    usuario=alerta.created_by
+                )
+            elif prioridad_anterior or sintomas or acciones_inmediatas:
+                # La repetición escala la alerta o aporta síntomas/acciones: se deja constancia
+                HistorialMaquina.objects.create(
+                    maquina=maquina,
+                    tipo_evento='actualizacion',
+                    descripcion=f'Alerta repetida: {alerta.titulo} (ocurrencia n.º {alerta.ocurrencias}, '
+                                f'Prioridad: {alerta.prioridad})',
+                    valor_anterior=prioridad_anterior or '',
+                    valor_nuevo=json.dumps(datos_adicionales, ensure_ascii=False),
+                    usuario=request.usuario or None
+                )
 
-            # Actualizar estado de máquina si es crítica
+            # Actualizar estado de máquina si es crítica (también si la alerta es una repetición)
             if prioridad in ['critica', 'emergencia']:
                 estado_anterior = maquina.estado
-                if 'suspender_operacion' in acciones_inmediatas:
+                suspender = {'suspender', 'suspender_operacion'} & set(acciones_inmediatas)
+                if suspender and estado_anterior != 'fuera_servicio':
                     maquina.estado = 'fuera_servicio'
                     maquina.save()
 
@@ -469,9 +450,17 @@ def crear_alerta_view(request):
                         descripcion=f'Estado cambiado automáticamente por alerta crítica: {titulo}',
                         valor_anterior=estado_anterior,
                         valor_nuevo=maquina.estado,
-                        usuario=alerta.created_by
+                        usuario=request.usuario or None
                     )
 
+            if not creada:
+                messages.info(
+                    request,
+                    f'Ya existe una alerta abierta igual para {maquina.codigo_inventario}; '
+                    f'se registró como ocurrencia n.º {alerta.ocurrencias}.'
+                )
+                return redirect('maquinaria:detalle_alerta', pk=alerta.pk)
+
             messages.success(request, f'Alerta "{titulo}" creada exitosamente para {maquina.codigo_inventario}')
             return redirect('maquinaria:detalle_alerta', pk=alerta.pk)
 
@@ -502,13 +491,8 @@ def resolver_alerta(request, pk):
     if request.method == 'POST':
         alerta.estado = 'resuelta'
         alerta.fecha_resolucion = timezone.now()
-
-        try:
-            usuario = Usuario.objects.get(numero_documento=request.user.username)
-            alerta.resuelto_por = usuario
-        except Usuario.DoesNotExist:
-            pass
-
+        if request.usuario:
+            alerta.resuelto_por = request.usuario
         alerta.save()
 
         # Crear entrada en el historial
@@ -541,28 +525,13 @@ def mantenimiento_dashboard_view(request):
     """Dashboard de mantenimiento con datos reales"""
     from datetime import date, timedelta
 
-    # Estadísticas de mantenimiento programado
-    hoy = timezone.now().date()
-    esta_semana = hoy + timedelta(days=7)
-
-    # Mantenimientos programados para hoy
-    mantenimientos_hoy = MantenimientoProgramado.objects.filter(
-        fecha_programada__date=hoy,
-        estado='programado'
-    ).count()
-
-    # Mantenimientos pendientes esta semana
-    mantenimientos_pendientes = MantenimientoProgramado.objects.filter(
-        fecha_programada__date__lte=esta_semana,
-        fecha_programada__date__gte=hoy,
-        estado='programado'
-    ).count()
-
-    # Mantenimientos vencidos
-    mantenimientos_vencidos = MantenimientoProgramado.objects.filter(
-        fecha_programada__date__lt=hoy,
-        estado='programado'
-    ).count()
+    # Estadísticas de mantenimiento programado (rangos de fecha y hora sobre el índice)
+    from .calendario import rango, resumen_dashboard
+    hoy = timezone.localdate()
+    resumen = resumen_dashboard(hoy)
+    mantenimientos_hoy = resumen['mantenimientos_hoy']
+    mantenimientos_pendientes = resumen['mantenimientos_pendientes']
+    mantenimientos_vencidos = resumen['mantenimientos_vencidos']
 
     # Actividades recientes de mantenimiento
     actividades_mantenimiento = HistorialMaquina.objects.filter(
@@ -571,8 +540,7 @@ def mantenimiento_dashboard_view(request):
 
     # Mantenimientos programados próximos (usando el nuevo modelo)
     mantenimientos_proximos = MantenimientoProgramado.objects.filter(
-        fecha_programada__date__lte=hoy + timedelta(days=7),
-        fecha_programada__date__gte=hoy,
+        rango(hoy, hoy + timedelta(days=7)),
         estado='programado'
     ).select_related('maquina', 'tecnico_asignado').order_by('fecha_programada')[:10]
 
@@ -583,9 +551,7 @@ def mantenimiento_dashboard_view(request):
     ).select_related('maquina')[:5]
 
     # KPIs básicos de mantenimiento
-    total_mantenimientos_programados = MantenimientoProgramado.objects.filter(
-        estado__in=['programado', 'en_progreso']
-    ).count()
+    total_mantenimientos_programados = resumen['total_mantenimientos_programados']
 
     if total_mantenimientos_programados > 0:
         mantenimientos_al_dia = total_mantenimientos_programados - mantenimientos_vencidos
@@ -594,14 +560,8 @@ def mantenimiento_dashboard_view(request):
         cumplimiento_porcentaje = 100.0
 
     # Técnicos disponibles/ocupados
-    from django.db.models import Case, When, Value, CharField
-    tecnicos_estado = Usuario.objects.annotate(
-        estado_actual=Case(
-            When(mantenimientos_asignados__estado='en_progreso', then=Value('ocupado')),
-            default=Value('disponible'),
-            output_field=CharField()
-        )
-    ).values('id', 'nombres', 'apellidos', 'cargo', 'estado_actual')[:10]
+    from .asignacion import tecnicos_con_estado
+    tecnicos_estado = tecnicos_con_estado().values('id', 'nombres', 'apellidos', 'cargo', 'estado_actual')[:10]
 
     context = {
         'title': 'Dashboard Mantenimiento',
@@ -683,17 +643,10 @@ def programar_mantenimiento_view(request, pk=None):
                 herramientas_necesarias=herramientas,
                 repuestos_necesarios=repuestos,
                 procedimientos=procedimientos,
-                costo_estimado=float(costo_estimado) if costo_estimado else None
+                costo_estimado=float(costo_estimado) if costo_estimado else None,
+                created_by=request.usuario or None
             )
 
-            # Obtener usuario creador
-            try:
-                usuario = Usuario.objects.get(numero_documento=request.user.username)
-                mantenimiento.created_by = usuario
-                mantenimiento.save()
-            except Usuario.DoesNotExist:
-                pass
-
             # Crear entrada en el historial
             HistorialMaquina.objects.create(
                 maquina=maquina,
@@ -717,10 +670,8 @@ def programar_mantenimiento_view(request, pk=None):
         except Maquina.DoesNotExist:
             pass
 
-    try:
-        usuarios_tecnicos = Usuario.objects.all().order_by('nombres', 'apellidos')[:20]
-    except Exception:
-        usuarios_tecnicos = []
+    from .asignacion import tecnicos
+    usuarios_tecnicos = tecnicos().order_by('centro_formacion', 'nombres', 'apellidos')
 
     context = {
         'title': 'Programar Mantenimiento',
@@ -734,11 +685,66 @@ def programar_mantenimiento_view(request, pk=None):
 # Importar/Exportar
 @login_required
 def importar_maquinas_view(request):
-    return render(request, 'maquinaria/importar_maquinas.html', {'title': 'Importar Máquinas'})
+    """Importación masiva de máquinas desde Excel o CSV"""
+    from .forms import ImportarMaquinasForm
+    from .importacion import ArchivoInvalido, importar_maquinas
+
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarMaquinasForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                resultado = importar_maquinas(
+                    form.cleaned_data['archivo_excel'],
+                    usuario=request.usuario or None,
+                    sobrescribir=form.cleaned_data['sobrescribir'],
+                )
+            except ArchivoInvalido as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(
+                    request,
+                    f'Importación finalizada: {resultado.creadas} creadas, '
+                    f'{resultado.actualizadas} actualizadas, {resultado.omitidas} omitidas, '
+                    f'{resultado.total_errores} con errores'
+                )
+        else:
+            messages.error(request, 'Por favor selecciona un archivo válido')
+    else:
+        form = ImportarMaquinasForm()
+
+    context = {
+        'title': 'Importar Máquinas',
+        'form': form,
+        'resultado': resultado,
+    }
+
+    return render(request, 'maquinaria/importar_maquinas.html', context)
 
 @login_required
 def exportar_maquinas_view(request):
-    return render(request, 'maquinaria/exportar_maquinas.html', {'title': 'Exportar Máquinas'})
+    """Formulario de exportación; con ?formato= descarga el inventario filtrado"""
+    from .forms import ExportarMaquinasForm
+    from .exportacion import exportar_maquinas
+
+    if 'formato' in request.GET:
+        form = ExportarMaquinasForm(request.GET)
+        if form.is_valid():
+            return exportar_maquinas(
+                form.cleaned_data['formato'],
+                categorias=form.cleaned_data['categorias'],
+                incluir_inactivas=form.cleaned_data['incluir_inactivas'],
+            )
+        messages.error(request, 'Revisa las opciones de exportación')
+    else:
+        form = ExportarMaquinasForm()
+
+    context = {
+        'title': 'Exportar Máquinas',
+        'form': form,
+        'total_exportables': Maquina.objects.count(),
+    }
+    return render(request, 'maquinaria/exportar_maquinas.html', context)
 
 # QR Codes
 @login_required
@@ -752,7 +758,13 @@ def info_qr_maquina(request, codigo):
 # API endpoints para AJAX
 @login_required
 def buscar_maquinas_api(request):
-    return JsonResponse({'results': []})
+    """Sugerencias de máquinas por prefijo de código o nombre"""
+    try:
+        limite = min(max(int(request.GET.get('limite', 10)), 1), 50)
+    except ValueError:
+        limite = 10
+    resultados = indice_maquinas.buscar(request.GET.get('q', ''), limite)
+    return JsonResponse({'results': resultados})
 
 @login_required
 def estadisticas_maquinaria_api(request):
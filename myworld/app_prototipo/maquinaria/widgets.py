@@ -0,0 +1,22 @@
+"""Proveedores de datos de widgets (components.widgets) de la maquinaria"""
+from components.widgets import proveedor
+
+from .estadisticas import FleetStats
+from .models import AlertaMaquina
+
+
+@proveedor('estadisticas_flota')
+def estadisticas_flota(parametros):
+    return FleetStats.calcular().as_dict()
+
+
+@proveedor('alertas_activas')
+def alertas_activas(parametros):
+    """Últimas alertas activas; parámetros: limite, prioridad"""
+    alertas = AlertaMaquina.objects.filter(estado='activa')
+    if parametros.get('prioridad'):
+        alertas = alertas.filter(prioridad=parametros['prioridad'])
+    limite = int(parametros.get('limite', 10))
+    return {'data': list(alertas.order_by('-fecha_creacion', 'id').values(
+        'id', 'titulo', 'tipo', 'prioridad', 'fecha_creacion', 'maquina__codigo_inventario'
+    )[:limite])}
@@ -14,7 +14,8 @@ class ReporteAdmin(admin.ModelAdmin):
     list_display = ('titulo', 'tipo_reporte', 'usuario_solicitante', 'estado', 'formato', 'fecha_solicitud')
     list_filter = ('estado', 'formato', 'tipo_reporte', 'fecha_solicitud')
     search_fields = ('titulo', 'descripcion', 'usuario_solicitante__nombre_completo')
-    readonly_fields = ('id', 'fecha_solicitud', 'fecha_inicio_procesamiento', 'fecha_completado', 'tiempo_procesamiento')
+    readonly_fields = ('id', 'fecha_solicitud', 'fecha_inicio_procesamiento', 'fecha_completado', 'tiempo_procesamiento',
+                       'intentos', 'procesado_por')
     date_hierarchy = 'fecha_solicitud'
 
 @admin.register(MetricasRendimiento)
@@ -0,0 +1,137 @@
+"""
+Instantánea de analítica compartida por los gráficos del dashboard.
+
+Eficiencia por categoría, distribución de estados, máquinas con más uso y
+costos de los últimos meses se calculan juntos y se guardan en el cache ya
+serializados, con un ETag por sección. La instantánea se reutiliza mientras
+no cambien los modelos de origen y, aunque cambien, durante
+ANALITICA_INTERVALO_SEGUNDOS desde que se calculó; así un dashboard que
+consulta todos los gráficos a la vez no repite las consultas.
+"""
+import hashlib
+import json
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Avg, Count
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.formats import date_format
+
+from components.cache import obtener_versiones
+from maquinaria.models import CategoriaMaquina, Maquina
+from .series import serie_costos
+
+MODELOS_ANALITICA = (
+    'maquinaria.Maquina', 'maquinaria.HistorialMaquina', 'maquinaria.MantenimientoProgramado',
+    'maquinaria.CategoriaMaquina', 'maquinaria.Proveedor',
+)
+
+CLAVE_INSTANTANEA = 'analitica:instantanea'
+CLAVE_CALCULANDO = 'analitica:calculando'
+
+COLORES_ESTADOS = ['#28a745', '#ffc107', '#dc3545', '#17a2b8', '#6c757d']
+
+
+def _eficiencia():
+    categorias = CategoriaMaquina.objects.annotate(
+        avg_eficiencia=Avg('maquina__eficiencia')
+    ).filter(avg_eficiencia__isnull=False)
+    return {
+        'labels': [categoria.nombre for categoria in categorias],
+        'data': [round(float(categoria.avg_eficiencia), 1) for categoria in categorias],
+        'colors': [categoria.color for categoria in categorias],
+    }
+
+
+def _estados():
+    estados = list(Maquina.objects.values('estado').annotate(count=Count('id')).order_by('-count'))
+    return {
+        'labels': [estado['estado'].replace('_', ' ').title() for estado in estados],
+        'data': [estado['count'] for estado in estados],
+        'colors': COLORES_ESTADOS[:len(estados)],
+    }
+
+
+def _maquinas():
+    """Las máquinas con más horas de uso"""
+    limite = getattr(settings, 'ANALITICA_TOP_MAQUINAS', 20)
+    maquinas = (Maquina.objects.select_related('categoria')
+                .only('codigo_inventario', 'nombre', 'categoria__nombre', 'estado', 'condicion',
+                      'eficiencia', 'horas_uso_total', 'fecha_ultimo_mantenimiento')
+                .order_by('-horas_uso_total', 'codigo_inventario')[:limite])
+    return {'data': [{
+        'codigo': maquina.codigo_inventario,
+        'nombre': maquina.nombre,
+        'categoria': maquina.categoria.nombre if maquina.categoria else '-',
+        'estado': maquina.get_estado_display(),
+        'condicion': maquina.get_condicion_display(),
+        'eficiencia': f"{maquina.eficiencia}%",
+        'horas_uso': maquina.horas_uso_total,
+        'ultimo_mantenimiento': maquina.fecha_ultimo_mantenimiento.strftime('%Y-%m-%d') if maquina.fecha_ultimo_mantenimiento else '-',
+    } for maquina in maquinas]}
+
+
+def _costos(meses=6):
+    """Costo total por mes calendario, del mes actual hacia atrás"""
+    hasta = timezone.localdate()
+    desde = hasta.replace(day=1)
+    for _ in range(meses - 1):
+        desde = (desde - timedelta(days=1)).replace(day=1)
+    serie = serie_costos(desde, hasta, granularidad='mes')
+    return {
+        'labels': [date_format(date.fromisoformat(inicio), 'F') for inicio in serie['periodos']],
+        'data': serie['series'][0]['costo_total'],
+    }
+
+
+SECCIONES = {
+    'eficiencia': _eficiencia,
+    'estados': _estados,
+    'maquinas': _maquinas,
+    'costos': _costos,
+}
+
+
+def calcular_instantanea(versiones):
+    secciones = {}
+    for nombre, calcular in SECCIONES.items():
+        contenido = json.dumps(calcular(), cls=DjangoJSONEncoder, ensure_ascii=False)
+        secciones[nombre] = {
+            'contenido': contenido,
+            'etag': '"{}"'.format(hashlib.md5(contenido.encode('utf-8')).hexdigest()),
+        }
+    return {'versiones': versiones, 'generado': time.time(), 'secciones': secciones}
+
+
+def obtener_instantanea():
+    intervalo = getattr(settings, 'ANALITICA_INTERVALO_SEGUNDOS', 60)
+    versiones = obtener_versiones(*MODELOS_ANALITICA)
+    guardada = cache.get(CLAVE_INSTANTANEA)
+    if guardada is not None:
+        if guardada['versiones'] == versiones or time.time() - guardada['generado'] < intervalo:
+            return guardada
+        # Otro proceso ya la está recalculando: mientras tanto sirve la anterior
+        if not cache.add(CLAVE_CALCULANDO, True, timeout=intervalo):
+            return guardada
+
+    instantanea = calcular_instantanea(versiones)
+    cache.set(CLAVE_INSTANTANEA, instantanea, settings.CACHE_VERSIONADO_TIMEOUT)
+    cache.delete(CLAVE_CALCULANDO)
+    return instantanea
+
+
+def respuesta_seccion(request, seccion):
+    """Respuesta JSON de una sección; 304 si el navegador ya tiene la misma versión"""
+    datos = obtener_instantanea()['secciones'][seccion]
+    respuesta = get_conditional_response(request, etag=datos['etag'])
+    if respuesta is None:
+        respuesta = HttpResponse(datos['contenido'], content_type='application/json')
+    respuesta['ETag'] = datos['etag']
+    # El navegador guarda la respuesta pero la revalida en cada consulta
+    respuesta['Cache-Control'] = 'private, no-cache'
+    return respuesta
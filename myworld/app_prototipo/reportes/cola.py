@@ -0,0 +1,190 @@
+"""
+Cola de generación de reportes respaldada por la tabla Reporte.
+
+Las vistas solo crean el Reporte en estado 'pendiente'; uno o varios
+procesos `manage.py procesar_reportes` lo toman y generan el archivo.
+
+Cada transición de estado es un UPDATE condicionado al estado actual (y al
+trabajador que tomó el reporte), de modo que dos trabajadores nunca
+procesan el mismo reporte y un trabajador que perdió el reporte (por
+cancelación o por exceder REPORTES_TIEMPO_MAXIMO) no sobrescribe el
+resultado. En bases que lo soportan, la selección de candidatos además usa
+SELECT ... FOR UPDATE SKIP LOCKED.
+
+Los fallos se reintentan hasta REPORTES_MAX_INTENTOS veces con espera
+exponencial a partir de REPORTES_REINTENTO_SEGUNDOS.
+"""
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from components.cache import incrementar_version
+from .generacion import generar_reporte
+from .models import Reporte
+
+logger = logging.getLogger(__name__)
+
+# Candidatos que se leen en cada intento de tomar un reporte
+CANDIDATOS_POR_INTENTO = 10
+
+
+def nombre_trabajador():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _entrada_log(mensaje, nivel='info'):
+    return {'fecha': timezone.now().isoformat(), 'nivel': nivel, 'mensaje': mensaje}
+
+
+def _tomar(ids, trabajador, ahora):
+    for pk in ids:
+        tomado = Reporte.objects.filter(pk=pk, estado='pendiente').update(
+            estado='generando',
+            procesado_por=trabajador,
+            fecha_inicio_procesamiento=ahora,
+            intentos=F('intentos') + 1,
+            disponible_desde=None,
+        )
+        if tomado:
+            return pk
+    return None
+
+
+def reclamar(trabajador):
+    """Toma el reporte pendiente más antiguo y lo pasa a 'generando'; None si no hay"""
+    ahora = timezone.now()
+    candidatos = Reporte.objects.filter(
+        Q(disponible_desde__isnull=True) | Q(disponible_desde__lte=ahora),
+        estado='pendiente',
+    ).order_by('fecha_solicitud').values_list('pk', flat=True)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(candidatos.select_for_update(skip_locked=True)[:CANDIDATOS_POR_INTENTO])
+            pk = _tomar(ids, trabajador, ahora)
+    else:
+        # Sin bloqueo de filas (SQLite): el UPDATE condicionado en autocommit
+        # basta para que solo un trabajador gane cada reporte
+        pk = _tomar(list(candidatos[:CANDIDATOS_POR_INTENTO]), trabajador, ahora)
+
+    if pk is None:
+        return None
+    incrementar_version(Reporte)
+    return Reporte.objects.select_related('tipo_reporte').get(pk=pk)
+
+
+def _registrar_fallo(reporte, trabajador, mensaje, logs, duracion=None):
+    """Devuelve el reporte a la cola con espera, o lo marca como error si agotó los intentos"""
+    ahora = timezone.now()
+    cambios = {
+        'error_mensaje': mensaje,
+        'logs_procesamiento': logs,
+        'tiempo_procesamiento': duracion,
+    }
+    if reporte.intentos < settings.REPORTES_MAX_INTENTOS:
+        espera = settings.REPORTES_REINTENTO_SEGUNDOS * 2 ** max(reporte.intentos - 1, 0)
+        logs.append(_entrada_log(f'Reintento programado en {espera} s', 'warning'))
+        cambios.update(estado='pendiente', procesado_por='',
+                       disponible_desde=ahora + timedelta(seconds=espera))
+    else:
+        logs.append(_entrada_log(f'Reporte fallido tras {reporte.intentos} intentos', 'error'))
+        cambios.update(estado='error', fecha_completado=ahora)
+
+    actualizado = Reporte.objects.filter(
+        pk=reporte.pk, estado='generando', procesado_por=trabajador
+    ).update(**cambios)
+    incrementar_version(Reporte)
+    return actualizado
+
+
+def procesar(reporte, trabajador):
+    """Genera un reporte ya reclamado; devuelve True si quedó completado"""
+    logs = list(reporte.logs_procesamiento or [])
+
+    def registrar(mensaje, nivel='info'):
+        logs.append(_entrada_log(mensaje, nivel))
+        logger.log(logging.getLevelName(nivel.upper()), 'Reporte %s: %s', reporte.pk, mensaje)
+
+    registrar(f'Intento {reporte.intentos} iniciado por {trabajador}')
+    inicio = time.monotonic()
+    try:
+        generar_reporte(reporte, registrar)
+    except Exception as e:
+        logger.exception('Error generando el reporte %s', reporte.pk)
+        registrar(f'Error: {e}', 'error')
+        duracion = timedelta(seconds=time.monotonic() - inicio)
+        _registrar_fallo(reporte, trabajador, str(e), logs, duracion)
+        return False
+
+    duracion = timedelta(seconds=time.monotonic() - inicio)
+    registrar(f'Completado en {duracion.total_seconds():.2f} s')
+    actualizado = Reporte.objects.filter(
+        pk=reporte.pk, estado='generando', procesado_por=trabajador
+    ).update(
+        estado='completado',
+        fecha_completado=timezone.now(),
+        tiempo_procesamiento=duracion,
+        archivo_resultado=reporte.archivo_resultado.name,
+        total_registros=reporte.total_registros,
+        tamaño_archivo=reporte.tamaño_archivo,
+        huella=reporte.huella,
+        error_mensaje='',
+        logs_procesamiento=logs,
+    )
+    if not actualizado:
+        # Cancelado o recuperado por otro trabajador mientras se generaba. Los
+        # archivos se comparten por huella: solo se borra si nadie más lo usa
+        logger.warning('Reporte %s ya no pertenece a %s; se descarta el resultado', reporte.pk, trabajador)
+        nombre = reporte.archivo_resultado.name
+        if nombre and not Reporte.objects.filter(archivo_resultado=nombre).exclude(pk=reporte.pk).exists():
+            reporte.archivo_resultado.delete(save=False)
+        return False
+    incrementar_version(Reporte)
+    return True
+
+
+def recuperar_abandonados():
+    """Reintenta los reportes 'generando' que superaron REPORTES_TIEMPO_MAXIMO"""
+    limite = timezone.now() - timedelta(seconds=settings.REPORTES_TIEMPO_MAXIMO)
+    abandonados = Reporte.objects.filter(estado='generando', fecha_inicio_procesamiento__lt=limite)
+    recuperados = 0
+    for reporte in abandonados.only('pk', 'intentos', 'procesado_por', 'logs_procesamiento'):
+        logs = list(reporte.logs_procesamiento or [])
+        mensaje = f'El trabajador {reporte.procesado_por or "desconocido"} no terminó a tiempo'
+        logs.append(_entrada_log(mensaje, 'warning'))
+        recuperados += _registrar_fallo(reporte, reporte.procesado_por, mensaje, logs)
+    return recuperados
+
+
+def ejecutar(trabajador=None, una_vez=False, intervalo=5, maximo=None, detener=None):
+    """
+    Bucle del trabajador: recupera abandonados, toma un reporte y lo procesa.
+    Con `una_vez` termina cuando la cola queda vacía; `detener` es un
+    threading.Event que permite terminar después del reporte en curso.
+    """
+    trabajador = trabajador or nombre_trabajador()
+    procesados = 0
+    while maximo is None or procesados < maximo:
+        if detener is not None and detener.is_set():
+            break
+        close_old_connections()
+        recuperar_abandonados()
+        reporte = reclamar(trabajador)
+        if reporte is None:
+            if una_vez:
+                break
+            if detener is not None:
+                detener.wait(intervalo)
+            else:
+                time.sleep(intervalo)
+            continue
+        procesar(reporte, trabajador)
+        procesados += 1
+    return procesados
@@ -0,0 +1,282 @@
+"""
+Generación del archivo de un Reporte.
+
+Se ejecuta fuera del ciclo de la petición (ver reportes.cola). Cada fuente
+de datos lee una sola vez las filas que cumplen los filtros del reporte a
+una TablaColumnar, y el motor la renderiza en el formato pedido. Antes de
+generar se busca un resultado con la misma huella (ver reportes.huellas).
+"""
+import tempfile
+import time
+import unicodedata
+from datetime import datetime, time as hora, timedelta
+from decimal import Decimal
+
+from django.core.files import File
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Concat
+from django.utils import timezone
+
+from .huellas import calcular_huella, completar_desde_cache, resultado_existente, ruta_resultado
+from .motor import TablaColumnar, renderizar
+
+# Formato del Reporte -> extensión del archivo
+EXTENSIONES = {'pdf': 'pdf', 'excel': 'xlsx', 'csv': 'csv', 'json': 'json'}
+
+# Fuentes de datos: {nombre: función(reporte) -> TablaColumnar}
+FUENTES = {}
+
+# Modelos que lee cada fuente, para la huella de reportes.huellas
+MODELOS_FUENTE = {}
+
+# Palabras del nombre del TipoReporte que eligen la fuente, en orden de prioridad
+PALABRAS_FUENTE = (
+    ('mantenimiento', 'mantenimiento'),
+    ('costo', 'costos'),
+    ('eficiencia', 'eficiencia'),
+)
+
+FUENTE_POR_DEFECTO = 'inventario'
+
+
+def fuente(nombre, *modelos):
+    def registrar(funcion):
+        FUENTES[nombre] = funcion
+        MODELOS_FUENTE[nombre] = modelos
+        return funcion
+    return registrar
+
+
+def _normalizar(texto):
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def fuente_del_reporte(reporte):
+    """parametros['fuente'] si es válida; si no, según el nombre del tipo de reporte"""
+    nombre = (reporte.parametros or {}).get('fuente')
+    if nombre in FUENTES:
+        return nombre
+    tipo = _normalizar(reporte.tipo_reporte.nombre)
+    for palabra, nombre in PALABRAS_FUENTE:
+        if palabra in tipo:
+            return nombre
+    return FUENTE_POR_DEFECTO
+
+
+def _etiquetas(modelo, campo):
+    opciones = {clave: str(etiqueta) for clave, etiqueta in modelo._meta.get_field(campo).flatchoices}
+    return lambda valor: opciones.get(valor, valor)
+
+
+def _moneda(valor):
+    return Decimal(valor).quantize(Decimal('0.01'))
+
+
+def _filtro_maquinas(reporte, prefijo=''):
+    filtro = Q()
+    if reporte.categorias_maquina:
+        filtro &= Q(**{f'{prefijo}categoria_id__in': reporte.categorias_maquina})
+    if reporte.centros_formacion:
+        filtro &= Q(**{f'{prefijo}centro_formacion__in': reporte.centros_formacion})
+    if reporte.estados_maquina:
+        filtro &= Q(**{f'{prefijo}estado__in': reporte.estados_maquina})
+    return filtro
+
+
+def _filtro_fechas(reporte, campo, es_fecha_hora=False):
+    """Rango [fecha_inicio, fecha_fin]; en DateTimeField como límites de día para usar el índice"""
+    filtro = Q()
+    inicio, fin = reporte.fecha_inicio, reporte.fecha_fin
+    if es_fecha_hora:
+        zona = timezone.get_current_timezone()
+        if inicio:
+            filtro &= Q(**{f'{campo}__gte': datetime.combine(inicio, hora.min, tzinfo=zona)})
+        if fin:
+            filtro &= Q(**{f'{campo}__lt': datetime.combine(fin + timedelta(days=1), hora.min, tzinfo=zona)})
+    else:
+        if inicio:
+            filtro &= Q(**{f'{campo}__gte': inicio})
+        if fin:
+            filtro &= Q(**{f'{campo}__lte': fin})
+    return filtro
+
+
+@fuente('inventario', 'maquinaria.Maquina', 'maquinaria.CategoriaMaquina', 'maquinaria.Proveedor')
+def datos_inventario(reporte):
+    from maquinaria.exportacion import COLUMNAS_EXPORTACION
+    from maquinaria.models import Maquina
+
+    queryset = Maquina.objects.filter(
+        _filtro_maquinas(reporte), _filtro_fechas(reporte, 'fecha_adquisicion')
+    ).order_by('codigo_inventario')
+    return TablaColumnar.desde_queryset(queryset, COLUMNAS_EXPORTACION, {
+        'estado': _etiquetas(Maquina, 'estado'),
+        'condicion': _etiquetas(Maquina, 'condicion'),
+    })
+
+
+@fuente('eficiencia', 'maquinaria.Maquina', 'maquinaria.CategoriaMaquina')
+def datos_eficiencia(reporte):
+    from maquinaria.models import Maquina
+
+    queryset = Maquina.objects.filter(_filtro_maquinas(reporte)).order_by('eficiencia', 'codigo_inventario')
+    return TablaColumnar.desde_queryset(queryset, [
+        ('codigo_inventario', 'Código', 'codigo_inventario'),
+        ('nombre', 'Nombre', 'nombre'),
+        ('categoria__nombre', 'Categoría', 'categoria'),
+        ('centro_formacion', 'Centro de formación', 'centro_formacion'),
+        ('estado', 'Estado', 'estado'),
+        ('condicion', 'Condición', 'condicion'),
+        ('eficiencia', 'Eficiencia (%)', 'eficiencia'),
+        ('horas_uso_mes', 'Horas de uso (mes)', 'horas_uso_mes'),
+        ('horas_uso_total', 'Horas de uso (total)', 'horas_uso_total'),
+    ], {
+        'estado': _etiquetas(Maquina, 'estado'),
+        'condicion': _etiquetas(Maquina, 'condicion'),
+    })
+
+
+@fuente('mantenimiento', 'maquinaria.MantenimientoProgramado', 'maquinaria.Maquina', 'usuarios.Usuario')
+def datos_mantenimiento(reporte):
+    from maquinaria.models import MantenimientoProgramado
+
+    queryset = MantenimientoProgramado.objects.filter(
+        _filtro_maquinas(reporte, 'maquina__'),
+        _filtro_fechas(reporte, 'fecha_programada', es_fecha_hora=True),
+    ).annotate(
+        tecnico=Concat('tecnico_asignado__nombres', Value(' '), 'tecnico_asignado__apellidos'),
+    ).order_by('fecha_programada', 'id')
+    return TablaColumnar.desde_queryset(queryset, [
+        ('maquina__codigo_inventario', 'Código', 'codigo_inventario'),
+        ('maquina__nombre', 'Máquina', 'maquina'),
+        ('titulo', 'Título', 'titulo'),
+        ('tipo', 'Tipo', 'tipo'),
+        ('prioridad', 'Prioridad', 'prioridad'),
+        ('estado', 'Estado', 'estado'),
+        ('fecha_programada', 'Fecha programada', 'fecha_programada'),
+        ('fecha_fin_real', 'Fecha de finalización', 'fecha_fin_real'),
+        ('tecnico', 'Técnico asignado', 'tecnico'),
+        ('costo_estimado', 'Costo estimado', 'costo_estimado'),
+        ('costo_real', 'Costo real', 'costo_real'),
+    ], {
+        'tipo': _etiquetas(MantenimientoProgramado, 'tipo'),
+        'prioridad': _etiquetas(MantenimientoProgramado, 'prioridad'),
+        'estado': _etiquetas(MantenimientoProgramado, 'estado'),
+        'fecha_programada': timezone.localtime,
+        'fecha_fin_real': timezone.localtime,
+        'tecnico': str.strip,
+    })
+
+
+@fuente('costos', 'maquinaria.Maquina', 'maquinaria.CategoriaMaquina',
+        'maquinaria.MantenimientoProgramado', 'maquinaria.HistorialMaquina')
+def datos_costos(reporte):
+    from maquinaria.models import Maquina, MantenimientoProgramado, HistorialMaquina
+
+    moneda = DecimalField(max_digits=15, decimal_places=2)
+    cero = Value(Decimal('0'), output_field=moneda)
+    # Subconsultas por máquina para no multiplicar filas al sumar dos relaciones
+    mantenimientos = MantenimientoProgramado.objects.filter(
+        _filtro_fechas(reporte, 'fecha_programada', es_fecha_hora=True),
+        maquina=OuterRef('pk'), estado='completado',
+    ).values('maquina').annotate(total=Sum(Coalesce('costo_real', 'costo_estimado'))).values('total')
+    eventos = HistorialMaquina.objects.filter(
+        _filtro_fechas(reporte, 'fecha_evento', es_fecha_hora=True),
+        maquina=OuterRef('pk'), costo_asociado__isnull=False,
+    ).values('maquina').annotate(total=Sum('costo_asociado')).values('total')
+
+    queryset = Maquina.objects.filter(_filtro_maquinas(reporte)).annotate(
+        costo_mantenimiento=Coalesce(Subquery(mantenimientos, output_field=moneda), cero),
+        costo_eventos=Coalesce(Subquery(eventos, output_field=moneda), cero),
+    ).annotate(
+        costo_total=F('costo_mantenimiento') + F('costo_eventos'),
+    ).order_by('-costo_total', 'codigo_inventario')
+    return TablaColumnar.desde_queryset(queryset, [
+        ('codigo_inventario', 'Código', 'codigo_inventario'),
+        ('nombre', 'Nombre', 'nombre'),
+        ('categoria__nombre', 'Categoría', 'categoria'),
+        ('centro_formacion', 'Centro de formación', 'centro_formacion'),
+        ('valor_adquisicion', 'Valor de adquisición', 'valor_adquisicion'),
+        ('costo_mantenimiento', 'Costo de mantenimiento', 'costo_mantenimiento'),
+        ('costo_eventos', 'Otros costos', 'costo_eventos'),
+        ('costo_total', 'Costo total', 'costo_total'),
+    ], {
+        'costo_mantenimiento': _moneda,
+        'costo_eventos': _moneda,
+        'costo_total': _moneda,
+    })
+
+
+def titulo_del_contenido(reporte):
+    """Título impreso en el archivo; solo depende de datos incluidos en la huella"""
+    titulo = reporte.tipo_reporte.nombre
+    if reporte.fecha_inicio or reporte.fecha_fin:
+        desde = reporte.fecha_inicio.strftime('%d/%m/%Y') if reporte.fecha_inicio else '...'
+        hasta = reporte.fecha_fin.strftime('%d/%m/%Y') if reporte.fecha_fin else '...'
+        titulo = f'{titulo} ({desde} - {hasta})'
+    return titulo
+
+
+def metadatos_del_reporte(reporte, nombre_fuente):
+    return {
+        'fuente': nombre_fuente,
+        'filtros': {
+            'fecha_inicio': reporte.fecha_inicio,
+            'fecha_fin': reporte.fecha_fin,
+            'centros_formacion': reporte.centros_formacion,
+            'categorias_maquina': reporte.categorias_maquina,
+            'estados_maquina': reporte.estados_maquina,
+        },
+    }
+
+
+def huella_del_reporte(reporte):
+    nombre_fuente = fuente_del_reporte(reporte)
+    return calcular_huella(reporte, nombre_fuente, MODELOS_FUENTE[nombre_fuente])
+
+
+def reutilizar_resultado(reporte):
+    """Completa al instante un reporte pendiente si ya existe un resultado con su huella"""
+    return completar_desde_cache(reporte, huella_del_reporte(reporte))
+
+
+def generar_reporte(reporte, registrar):
+    """
+    Escribe el archivo en reporte.archivo_resultado (sin guardar el modelo) y
+    completa huella, total_registros y tamaño_archivo. `registrar(mensaje)`
+    agrega una línea al log de procesamiento. Devuelve la tabla generada, o
+    None si se reutilizó un resultado existente.
+    """
+    nombre_fuente = fuente_del_reporte(reporte)
+    reporte.huella = calcular_huella(reporte, nombre_fuente, MODELOS_FUENTE[nombre_fuente])
+    previo = resultado_existente(reporte.huella, excluir=reporte.pk)
+    if previo is not None:
+        reporte.archivo_resultado.name = previo.archivo_resultado.name
+        reporte.total_registros = previo.total_registros
+        reporte.tamaño_archivo = previo.tamaño_archivo
+        registrar(f'Resultado reutilizado del reporte {previo.pk}')
+        return None
+
+    inicio = time.monotonic()
+    tabla = FUENTES[nombre_fuente](reporte)
+    registrar(f'{len(tabla)} registros leídos de "{nombre_fuente}" en {time.monotonic() - inicio:.2f} s')
+    reporte.total_registros = len(tabla)
+
+    campo = reporte.archivo_resultado
+    ruta = ruta_resultado(reporte.huella, EXTENSIONES[reporte.formato])
+    destino = campo.field.generate_filename(reporte, ruta)
+    if campo.storage.exists(destino):
+        # Mismo contenido generado antes (p. ej. por un reporte ya eliminado)
+        campo.name = destino
+        registrar('Archivo existente reutilizado')
+    else:
+        inicio = time.monotonic()
+        with tempfile.TemporaryFile() as archivo:
+            renderizar(tabla, reporte.formato, archivo, titulo=titulo_del_contenido(reporte),
+                       metadatos=metadatos_del_reporte(reporte, nombre_fuente))
+            registrar(f'Archivo {reporte.formato} renderizado en {time.monotonic() - inicio:.2f} s')
+            archivo.seek(0)
+            campo.save(ruta, File(archivo), save=False)
+    reporte.tamaño_archivo = campo.size
+    return tabla
@@ -0,0 +1,125 @@
+"""
+Cache de resultados de reportes direccionado por contenido.
+
+La huella de un reporte es un SHA-256 de todo lo que determina su archivo:
+fuente de datos, tipo de reporte (nombre y configuración), formato, rango de
+fechas, filtros normalizados y la versión de los datos de las tablas que lee
+la fuente. Los archivos se
+guardan con la huella como nombre, así que reportes equivalentes comparten
+un mismo archivo, y un reporte cuya huella ya tiene un resultado se completa
+sin volver a generarse.
+
+La versión de datos de cada tabla se obtiene solo de la propia base (conteo,
+id máximo y fecha de última modificación; las escrituras masivas también
+fijan updated_at). No se usan las versiones de components.cache: viven en un
+cache volátil y cambiarían la huella de datos idénticos al vaciarse.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.apps import apps
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from components.cache import incrementar_version
+from .models import Reporte
+
+# Cambiar cuando cambie el contenido que generan los renderizadores
+VERSION_RESULTADOS = 1
+
+# Campo que registra la última modificación, por orden de preferencia
+CAMPOS_MODIFICACION = ('updated_at', 'fecha_evento', 'fecha_creacion')
+
+
+def version_datos(modelo):
+    """Firma de la tabla: filas, id máximo y última modificación"""
+    campos = {campo.name for campo in modelo._meta.concrete_fields}
+    agregados = {'filas': Count('pk'), 'maximo': Max('pk')}
+    for campo in CAMPOS_MODIFICACION:
+        if campo in campos:
+            agregados['modificado'] = Max(campo)
+            break
+    return modelo._default_manager.aggregate(**agregados)
+
+
+def _lista(valores):
+    return sorted({str(valor) for valor in valores or []})
+
+
+def calcular_huella(reporte, nombre_fuente, modelos):
+    modelos = [apps.get_model(etiqueta) for etiqueta in modelos]
+    tipo = reporte.tipo_reporte
+    datos = {
+        'resultados': VERSION_RESULTADOS,
+        'fuente': nombre_fuente,
+        'tipo_reporte': {
+            'nombre': tipo.nombre,
+            'template_path': tipo.template_path,
+            'parametros_requeridos': tipo.parametros_requeridos,
+            'formato_salida': tipo.formato_salida,
+        },
+        'formato': reporte.formato,
+        'fecha_inicio': reporte.fecha_inicio,
+        'fecha_fin': reporte.fecha_fin,
+        'centros_formacion': _lista(reporte.centros_formacion),
+        'categorias_maquina': _lista(reporte.categorias_maquina),
+        'estados_maquina': _lista(reporte.estados_maquina),
+        'parametros': reporte.parametros or {},
+        'datos': {m._meta.label_lower: version_datos(m) for m in modelos},
+    }
+    contenido = json.dumps(datos, sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def ruta_resultado(huella, extension):
+    """Nombre dentro de upload_to; el prefijo de dos caracteres reparte los archivos en carpetas"""
+    return f'{huella[:2]}/{huella}.{extension}'
+
+
+def resultado_existente(huella, excluir=None):
+    """Último reporte completado con la huella cuyo archivo sigue en el almacenamiento"""
+    candidatos = Reporte.objects.filter(huella=huella, estado='completado').exclude(archivo_resultado='')
+    if excluir is not None:
+        candidatos = candidatos.exclude(pk=excluir)
+    previo = candidatos.order_by('-fecha_completado').first()
+    if previo is None or not previo.archivo_resultado.storage.exists(previo.archivo_resultado.name):
+        return None
+    return previo
+
+
+def completar_desde_cache(reporte, huella):
+    """
+    Completa un reporte pendiente con el resultado de otro de igual huella.
+    Devuelve True si se reutilizó; si no, solo guarda la huella.
+    """
+    reporte.huella = huella
+    previo = resultado_existente(huella, excluir=reporte.pk)
+    if previo is None:
+        Reporte.objects.filter(pk=reporte.pk).update(huella=huella)
+        return False
+
+    ahora = timezone.now()
+    logs = list(reporte.logs_procesamiento or [])
+    logs.append({
+        'fecha': ahora.isoformat(),
+        'nivel': 'info',
+        'mensaje': f'Resultado reutilizado del reporte {previo.pk}',
+    })
+    cambios = {
+        'estado': 'completado',
+        'huella': huella,
+        'archivo_resultado': previo.archivo_resultado.name,
+        'total_registros': previo.total_registros,
+        'tamaño_archivo': previo.tamaño_archivo,
+        'fecha_inicio_procesamiento': ahora,
+        'fecha_completado': ahora,
+        'tiempo_procesamiento': timedelta(0),
+        'logs_procesamiento': logs,
+    }
+    if not Reporte.objects.filter(pk=reporte.pk, estado='pendiente').update(**cambios):
+        return False
+    incrementar_version(Reporte)
+    for campo, valor in cambios.items():
+        setattr(reporte, campo, valor)
+    return True
@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reportes.metricas import actualizar_metricas
+
+
+class Command(BaseCommand):
+    help = (
+        'Actualiza MetricasRendimiento: recalcula las filas diarias de los días con cambios '
+        'desde la última ejecución y los periodos semanales, mensuales y anuales que los contienen'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', default=None,
+                            help='Recalcula además todos los días desde esta fecha (AAAA-MM-DD)')
+        parser.add_argument('--completo', action='store_true',
+                            help='Recalcula todos los días con datos, sin usar la última ejecución')
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = date.fromisoformat(options['desde'])
+            except ValueError:
+                raise CommandError('--desde debe tener el formato AAAA-MM-DD')
+
+        resumen = actualizar_metricas(desde=desde, completo=options['completo'])
+        if not resumen['dias']:
+            self.stdout.write(self.style.SUCCESS('Las métricas están al día'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumen['dias']} días y {resumen['periodos']} periodos recalculados "
+            f"({resumen['filas']} filas)"
+        ))
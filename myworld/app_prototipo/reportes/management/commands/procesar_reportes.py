@@ -0,0 +1,44 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from reportes.cola import ejecutar, nombre_trabajador
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera los reportes pendientes. Se pueden ejecutar varios procesos a la vez; '
+        'cada reporte lo toma un solo trabajador.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Termina cuando no quedan reportes pendientes')
+        parser.add_argument('--intervalo', type=float, default=5,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--maximo', type=int, default=None,
+                            help='Termina después de procesar esta cantidad de reportes')
+        parser.add_argument('--trabajador', default=None,
+                            help='Nombre del trabajador (por defecto host:pid)')
+
+    def handle(self, *args, **options):
+        trabajador = options['trabajador'] or nombre_trabajador()
+        detener = threading.Event()
+
+        def al_recibir_senal(numero, marco):
+            self.stdout.write('Terminando después del reporte en curso...')
+            detener.set()
+
+        signal.signal(signal.SIGTERM, al_recibir_senal)
+        signal.signal(signal.SIGINT, al_recibir_senal)
+
+        self.stdout.write(f'Trabajador {trabajador} esperando reportes')
+        procesados = ejecutar(
+            trabajador=trabajador,
+            una_vez=options['una_vez'],
+            intervalo=options['intervalo'],
+            maximo=options['maximo'],
+            detener=detener,
+        )
+        self.stdout.write(self.style.SUCCESS(f'{procesados} reportes procesados'))
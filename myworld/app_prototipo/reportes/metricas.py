@@ -0,0 +1,347 @@
+"""
+Consolidado incremental de MetricasRendimiento.
+
+Las filas diarias se calculan por (centro de formación, categoría) desde las
+tablas operacionales, y solo para los días con cambios desde la última
+ejecución. Las filas semanales, mensuales y anuales se derivan de las
+diarias, sin volver a leer esas tablas.
+
+- Foto de la flota (conteos por estado, eficiencia, horas de uso, valor): se
+  toma de Maquina al calcular. Un día pasado que se recalcula conserva la
+  foto que ya tenía; en los periodos se usa la del último día.
+- Eventos del día (mantenimientos, costos, alertas, tiempo de parada): se
+  recalculan completos para cada día modificado; en los periodos se suman.
+
+Los mantenimientos que cambian de fecha o se eliminan no dejan rastro del día
+anterior: `manage.py calcular_metricas --desde FECHA` recalcula un rango.
+"""
+from collections import defaultdict
+from datetime import datetime, time as hora, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from maquinaria.models import AlertaMaquina, HistorialMaquina, MantenimientoProgramado, Maquina
+from .models import MetricasRendimiento
+
+ESTADOS_INACTIVOS = ('fuera_servicio', 'retirada')
+ESTADOS_OPERATIVOS = ('disponible', 'operativa')
+ESTADOS_PENDIENTES = ('programado', 'en_progreso', 'postergado')
+
+# Tomados de la flota; en los periodos vale el del último día
+CAMPOS_FOTO = (
+    'total_maquinas', 'maquinas_operativas', 'maquinas_mantenimiento', 'maquinas_reparacion',
+    'maquinas_fuera_servicio', 'eficiencia_promedio', 'horas_uso_total', 'valor_maquinaria_total',
+)
+
+# Eventos del día; en los periodos se suman
+CAMPOS_SUMA = (
+    'horas_disponibles', 'tiempo_inactividad', 'mantenimientos_programados',
+    'mantenimientos_completados', 'mantenimientos_pendientes', 'costo_mantenimiento_total',
+    'costo_reparaciones', 'alertas_generadas', 'alertas_resueltas', 'alertas_criticas',
+)
+
+CAMPOS_DECIMALES = {
+    'eficiencia_promedio', 'horas_uso_total', 'valor_maquinaria_total', 'horas_disponibles',
+    'tiempo_inactividad', 'costo_mantenimiento_total', 'costo_reparaciones', 'tiempo_promedio_reparacion',
+}
+
+
+def inicio_periodo(periodo, dia):
+    if periodo == 'semanal':
+        return dia - timedelta(days=dia.weekday())
+    if periodo == 'mensual':
+        return dia.replace(day=1)
+    if periodo == 'anual':
+        return dia.replace(month=1, day=1)
+    return dia
+
+
+def fin_periodo(periodo, inicio):
+    """Último día del periodo que empieza en `inicio`"""
+    if periodo == 'semanal':
+        return inicio + timedelta(days=6)
+    if periodo == 'mensual':
+        siguiente = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return siguiente - timedelta(days=1)
+    if periodo == 'anual':
+        return inicio.replace(month=12, day=31)
+    return inicio
+
+
+def _instante(dia):
+    return timezone.make_aware(datetime.combine(dia, hora.min))
+
+
+def _rango(campo, primero, ultimo):
+    """Filtro por días locales con límites de fecha y hora (usa el índice del campo)"""
+    return Q(**{f'{campo}__gte': _instante(primero), f'{campo}__lt': _instante(ultimo + timedelta(days=1))})
+
+
+def _decimal(valor):
+    return Decimal(str(valor or 0)).quantize(Decimal('0.01'))
+
+
+def _horas(duracion):
+    return duracion.total_seconds() / 3600 if duracion else 0
+
+
+def ultima_ejecucion():
+    return MetricasRendimiento.objects.filter(periodo='diario').aggregate(ultima=Max('fecha_calculo'))['ultima']
+
+
+def dias_modificados(desde=None):
+    """Días hasta hoy cuyas métricas cambian con lo escrito desde `desde` (None: todos)"""
+    hoy = timezone.localdate()
+    dias = set()
+
+    def agregar(queryset, *campos):
+        for campo in campos:
+            fechas = (queryset.annotate(dia=TruncDate(campo)).order_by()
+                      .values_list('dia', flat=True).distinct())
+            dias.update(dia for dia in fechas if dia is not None)
+
+    historial = HistorialMaquina.objects.all()
+    alertas = AlertaMaquina.objects.all()
+    mantenimientos = MantenimientoProgramado.objects.all()
+    if desde is not None:
+        historial = historial.filter(fecha_evento__gte=desde)
+        alertas = alertas.filter(Q(fecha_creacion__gte=desde) | Q(fecha_resolucion__gte=desde))
+        mantenimientos = mantenimientos.filter(updated_at__gte=desde)
+
+    agregar(historial.filter(tipo_evento='reparacion'), 'fecha_evento')
+    agregar(alertas, 'fecha_creacion', 'fecha_resolucion')
+    agregar(mantenimientos, 'fecha_programada', 'fecha_fin_real')
+
+    # La foto de la flota se toma una vez por día y cada vez que cambia una máquina
+    if (desde is None or timezone.localdate(desde) < hoy
+            or Maquina.objects.filter(updated_at__gte=desde).exists()):
+        dias.add(hoy)
+
+    return {dia for dia in dias if dia <= hoy}
+
+
+def foto_flota():
+    """{(centro, categoria_id): campos de la foto} con el estado actual de las máquinas"""
+    filas = (Maquina.objects.exclude(estado='retirada')
+             .values('centro_formacion', 'categoria_id')
+             .annotate(
+                 total_maquinas=Count('id'),
+                 maquinas_operativas=Count('id', filter=Q(estado__in=ESTADOS_OPERATIVOS)),
+                 maquinas_mantenimiento=Count('id', filter=Q(estado='mantenimiento')),
+                 maquinas_reparacion=Count('id', filter=Q(estado='reparacion')),
+                 maquinas_fuera_servicio=Count('id', filter=Q(estado='fuera_servicio')),
+                 activas=Count('id', filter=~Q(estado__in=ESTADOS_INACTIVOS)),
+                 eficiencia_promedio=Avg('eficiencia', filter=~Q(estado__in=ESTADOS_INACTIVOS)),
+                 horas_uso_total=Sum('horas_uso_total'),
+                 valor_maquinaria_total=Sum('valor_adquisicion'),
+             ).order_by())
+    fotos = {}
+    for fila in filas:
+        clave = (fila.pop('centro_formacion'), fila.pop('categoria_id'))
+        fila['horas_disponibles'] = fila.pop('activas') * 24
+        fotos[clave] = fila
+    return fotos
+
+
+def eventos_diarios(dias):
+    """{(dia, centro, categoria_id): campos de eventos} para los días pedidos"""
+    primero, ultimo = min(dias), max(dias)
+    eventos = defaultdict(dict)
+    grupo = ('dia', 'maquina__centro_formacion', 'maquina__categoria_id')
+
+    def acumular(queryset, campo_fecha, **agregados):
+        filas = (queryset.filter(_rango(campo_fecha, primero, ultimo))
+                 .annotate(dia=TruncDate(campo_fecha)).values(*grupo)
+                 .annotate(**agregados).order_by())
+        for fila in filas:
+            if fila['dia'] in dias:
+                clave = tuple(fila.pop(campo) for campo in grupo)
+                eventos[clave].update(fila)
+
+    acumular(
+        MantenimientoProgramado.objects.all(), 'fecha_programada',
+        mantenimientos_programados=Count('id'),
+        mantenimientos_pendientes=Count('id', filter=Q(estado__in=ESTADOS_PENDIENTES)),
+    )
+    acumular(
+        MantenimientoProgramado.objects.filter(estado='completado'), 'fecha_fin_real',
+        mantenimientos_completados=Count('id'),
+        costo_mantenimiento_total=Sum('costo_real'),
+        duracion_total=Sum('duracion_real'),
+        con_duracion=Count('duracion_real'),
+        parada_total=Sum('tiempo_parada'),
+    )
+    acumular(
+        HistorialMaquina.objects.filter(tipo_evento='reparacion'), 'fecha_evento',
+        costo_reparaciones=Sum('costo_asociado'),
+    )
+    acumular(
+        AlertaMaquina.objects.all(), 'fecha_creacion',
+        alertas_generadas=Count('id'),
+        alertas_criticas=Count('id', filter=Q(prioridad='critica')),
+    )
+    acumular(
+        AlertaMaquina.objects.exclude(fecha_resolucion=None), 'fecha_resolucion',
+        alertas_resueltas=Count('id'),
+    )
+
+    for campos in eventos.values():
+        con_duracion = campos.pop('con_duracion', 0)
+        duracion = campos.pop('duracion_total', None)
+        campos['tiempo_promedio_reparacion'] = _horas(duracion) / con_duracion if con_duracion else 0
+        campos['tiempo_inactividad'] = _horas(campos.pop('parada_total', None))
+    return eventos
+
+
+def _fila(fecha, periodo, centro, categoria_id, valores):
+    campos = {}
+    for campo in CAMPOS_FOTO + CAMPOS_SUMA + ('tiempo_promedio_reparacion',):
+        valor = valores.get(campo) or 0
+        campos[campo] = _decimal(valor) if campo in CAMPOS_DECIMALES else int(valor)
+    return MetricasRendimiento(
+        fecha=fecha, periodo=periodo, centro_formacion=centro,
+        categoria_maquina_id=categoria_id, actualizado_por_sistema=True, **campos,
+    )
+
+
+def filas_diarias(dias):
+    hoy = timezone.localdate()
+    actual = foto_flota()
+    eventos = eventos_diarios(dias)
+
+    # Los días pasados conservan la foto que se tomó en su momento
+    previas = defaultdict(dict)
+    for fila in (MetricasRendimiento.objects.filter(periodo='diario', fecha__in=dias)
+                 .exclude(fecha=hoy).values('fecha', 'centro_formacion', 'categoria_maquina_id',
+                                            'horas_disponibles', *CAMPOS_FOTO)):
+        clave = (fila.pop('centro_formacion'), fila.pop('categoria_maquina_id'))
+        previas[fila.pop('fecha')][clave] = fila
+
+    filas = []
+    for dia in sorted(dias):
+        fotos = previas.get(dia) or actual
+        grupos = set(fotos) | {(centro, categoria) for d, centro, categoria in eventos if d == dia}
+        for centro, categoria in grupos:
+            valores = dict(fotos.get((centro, categoria), {}))
+            valores.update(eventos.get((dia, centro, categoria), {}))
+            filas.append(_fila(dia, 'diario', centro, categoria, valores))
+    return filas
+
+
+def filas_periodos(periodos):
+    """Filas de los periodos {(periodo, inicio)} derivadas de las filas diarias"""
+    if not periodos:
+        return []
+    primero = min(inicio for _, inicio in periodos)
+    ultimo = max(fin_periodo(periodo, inicio) for periodo, inicio in periodos)
+    acumulados = {}
+
+    diarias = (MetricasRendimiento.objects
+               .filter(periodo='diario', fecha__gte=primero, fecha__lte=ultimo)
+               .order_by('fecha')
+               .values('fecha', 'centro_formacion', 'categoria_maquina_id',
+                       'tiempo_promedio_reparacion', *CAMPOS_FOTO, *CAMPOS_SUMA))
+    for fila in diarias.iterator(chunk_size=2000):
+        for periodo in ('semanal', 'mensual', 'anual'):
+            inicio = inicio_periodo(periodo, fila['fecha'])
+            if (periodo, inicio) not in periodos:
+                continue
+            clave = (periodo, inicio, fila['centro_formacion'], fila['categoria_maquina_id'])
+            acumulado = acumulados.setdefault(clave, {campo: 0 for campo in CAMPOS_SUMA + ('horas_reparacion',)})
+            for campo in CAMPOS_SUMA:
+                acumulado[campo] += fila[campo]
+            acumulado['horas_reparacion'] += fila['tiempo_promedio_reparacion'] * fila['mantenimientos_completados']
+            # Ordenadas por fecha: queda la foto del último día
+            acumulado.update({campo: fila[campo] for campo in CAMPOS_FOTO})
+
+    filas = []
+    for (periodo, inicio, centro, categoria), valores in acumulados.items():
+        completados = valores['mantenimientos_completados']
+        valores['tiempo_promedio_reparacion'] = valores.pop('horas_reparacion') / completados if completados else 0
+        filas.append(_fila(inicio, periodo, centro, categoria, valores))
+    return filas
+
+
+def _reemplazar(periodo, fechas, filas, calculado):
+    MetricasRendimiento.objects.filter(periodo=periodo, fecha__in=fechas).delete()
+    MetricasRendimiento.objects.bulk_create(filas, batch_size=500)
+    # fecha_calculo es auto_now_add: se fija al instante de lectura, que es la
+    # marca desde la que busca cambios la siguiente ejecución
+    MetricasRendimiento.objects.filter(periodo=periodo, fecha__in=fechas).update(fecha_calculo=calculado)
+
+
+def actualizar_metricas(desde=None, completo=False):
+    """
+    Recalcula las filas diarias de los días modificados desde la última
+    ejecución (o todos con `completo`, o además todos desde la fecha `desde`)
+    y los periodos que los contienen. Devuelve un resumen de lo escrito.
+    """
+    calculado = timezone.now()
+    dias = dias_modificados(None if completo else ultima_ejecucion())
+    if desde is not None:
+        hoy = timezone.localdate()
+        dias.update(desde + timedelta(days=n) for n in range((hoy - desde).days + 1))
+    if not dias:
+        return {'dias': 0, 'periodos': 0, 'filas': 0}
+
+    diarias = filas_diarias(dias)
+    periodos = {(periodo, inicio_periodo(periodo, dia)) for dia in dias for periodo in ('semanal', 'mensual', 'anual')}
+
+    with transaction.atomic():
+        _reemplazar('diario', dias, diarias, calculado)
+        escritas = len(diarias)
+        agregadas = filas_periodos(periodos)
+        for periodo in ('semanal', 'mensual', 'anual'):
+            inicios = {inicio for p, inicio in periodos if p == periodo}
+            filas = [fila for fila in agregadas if fila.periodo == periodo]
+            _reemplazar(periodo, inicios, filas, calculado)
+            escritas += len(filas)
+
+    return {'dias': len(dias), 'periodos': len(periodos), 'filas': escritas}
+
+
+def resumen_metricas(periodo='mensual', fecha=None, centro=None, categoria=None):
+    """KPIs del periodo que contiene `fecha` (hoy por defecto) leídos de las filas consolidadas"""
+    fecha = fecha or timezone.localdate()
+    inicio = inicio_periodo(periodo, fecha)
+    filas = MetricasRendimiento.objects.filter(periodo=periodo, fecha=inicio)
+    if centro:
+        filas = filas.filter(centro_formacion=centro)
+    if categoria:
+        filas = filas.filter(categoria_maquina_id=categoria)
+
+    totales = {campo: 0 for campo in CAMPOS_SUMA + ('total_maquinas', 'maquinas_operativas')}
+    eficiencia = horas_reparacion = 0
+    calculado = None
+    for fila in filas:
+        for campo in totales:
+            totales[campo] += getattr(fila, campo)
+        eficiencia += fila.eficiencia_promedio * fila.total_maquinas
+        horas_reparacion += fila.tiempo_promedio_reparacion * fila.mantenimientos_completados
+        calculado = max(calculado, fila.fecha_calculo) if calculado else fila.fecha_calculo
+
+    total = totales['total_maquinas']
+    completados = totales['mantenimientos_completados']
+    programados = totales['mantenimientos_programados']
+    return {
+        'periodo': periodo,
+        'fecha_inicio': inicio,
+        'fecha_fin': fin_periodo(periodo, inicio),
+        'total_maquinas': total,
+        'eficiencia_promedio': _decimal(eficiencia / total if total else 0),
+        'porcentaje_disponibilidad': _decimal(totales['maquinas_operativas'] * 100 / total if total else 0),
+        'tiempo_promedio_reparacion': _decimal(horas_reparacion / completados if completados else 0),
+        'costo_mantenimiento_mes': _decimal(totales['costo_mantenimiento_total']),
+        'costo_reparaciones': _decimal(totales['costo_reparaciones']),
+        'mantenimientos_programados': programados,
+        'mantenimientos_completados': completados,
+        'tasa_cumplimiento_mantenimiento': _decimal(completados * 100 / programados if programados else 100),
+        'alertas_generadas': totales['alertas_generadas'],
+        'alertas_resueltas': totales['alertas_resueltas'],
+        'alertas_criticas': totales['alertas_criticas'],
+        'fecha_calculo': calculado,
+    }
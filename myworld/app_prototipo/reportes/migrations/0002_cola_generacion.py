@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-17 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0001_initial'),
+        ('usuarios', '0003_usuario_usuarios_us_fecha_r_d0f722_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='disponible_desde',
+            field=models.DateTimeField(blank=True, help_text='Un reintento no se toma antes de esta fecha', null=True),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='intentos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='procesado_por',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='reporte',
+            index=models.Index(fields=['estado', 'fecha_solicitud'], name='reportes_re_estado_70cfc3_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0002_cola_generacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='huella',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 de la configuración y la versión de los datos (reportes.huellas)', max_length=64),
+        ),
+    ]
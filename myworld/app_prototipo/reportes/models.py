@@ -1,5 +1,9 @@
 from django.db import models
+from django.db.models import F
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from django.utils.text import slugify
+import os
 import uuid
 
 class TipoReporte(models.Model):
@@ -64,6 +68,14 @@ class Reporte(models.Model):
     fecha_completado = models.DateTimeField(null=True, blank=True)
     tiempo_procesamiento = models.DurationField(null=True, blank=True)
 
+    # Cola de generación (management command procesar_reportes)
+    intentos = models.PositiveIntegerField(default=0)
+    disponible_desde = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Un reintento no se toma antes de esta fecha"
+    )
+    procesado_por = models.CharField(max_length=100, blank=True)
+
     # Resultados
     archivo_resultado = models.FileField(
         upload_to='reportes/resultados/',
@@ -72,6 +84,10 @@ class Reporte(models.Model):
     url_descarga = models.URLField(blank=True)
     tamaño_archivo = models.BigIntegerField(null=True, blank=True)
     total_registros = models.IntegerField(null=True, blank=True)
+    huella = models.CharField(
+        max_length=64, blank=True, db_index=True,
+        help_text="SHA-256 de la configuración y la versión de los datos (reportes.huellas)"
+    )
 
     # Metadatos
     error_mensaje = models.TextField(blank=True)
@@ -87,11 +103,29 @@ class Reporte(models.Model):
             models.Index(fields=['usuario_solicitante', '-fecha_solicitud']),
             models.Index(fields=['estado']),
             models.Index(fields=['tipo_reporte']),
+            models.Index(fields=['estado', 'fecha_solicitud']),
         ]
 
     def __str__(self):
         return f"{self.titulo} - {self.usuario_solicitante.nombre_completo}"
 
+    def puede_ver(self, user, usuario=None):
+        """Solo el solicitante (el Usuario de la petición) o el personal staff"""
+        # request.usuario es perezoso: sin perfil es falso, no None
+        return user.is_staff or bool(usuario and self.usuario_solicitante_id == usuario.pk)
+
+    @property
+    def nombre_descarga(self):
+        extension = os.path.splitext(self.archivo_resultado.name or '')[1]
+        return f"{slugify(self.titulo) or 'reporte'}{extension}"
+
+    def registrar_descarga(self):
+        # UPDATE atómico en la base: no bloquea la fila durante la transferencia
+        Reporte.objects.filter(pk=self.pk).update(
+            veces_descargado=F('veces_descargado') + 1,
+            fecha_ultima_descarga=timezone.now(),
+        )
+
 class MetricasRendimiento(models.Model):
     PERIODO_CHOICES = [
         ('diario', 'Diario'),
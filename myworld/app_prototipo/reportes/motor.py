@@ -0,0 +1,95 @@
+"""
+Motor de reportes columnar.
+
+Los datos de un reporte se leen una sola vez a una TablaColumnar (una lista
+de valores por columna) y cada formato de salida se renderiza desde esa
+misma tabla, sin volver a consultar la base.
+"""
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from components.exportacion import escribir_pdf, escribir_xlsx, generar_csv
+
+
+class TablaColumnar:
+    def __init__(self, columnas):
+        """columnas: [(nombre, encabezado)]"""
+        self.nombres = [nombre for nombre, _ in columnas]
+        self.encabezados = [encabezado for _, encabezado in columnas]
+        self.columnas = [[] for _ in columnas]
+
+    @classmethod
+    def desde_queryset(cls, queryset, columnas, conversiones=None, chunk_size=2000):
+        """
+        columnas: [(campo de values_list, encabezado, nombre)].
+        conversiones: {campo: función} aplicada a los valores no nulos.
+        """
+        conversiones = conversiones or {}
+        tabla = cls([(nombre, encabezado) for _, encabezado, nombre in columnas])
+        campos = [campo for campo, _, _ in columnas]
+        destinos = [(columna.append, conversiones.get(campo)) for columna, campo in zip(tabla.columnas, campos)]
+        for fila in queryset.values_list(*campos).iterator(chunk_size=chunk_size):
+            for (agregar, convertir), valor in zip(destinos, fila):
+                agregar(convertir(valor) if convertir is not None and valor is not None else valor)
+        return tabla
+
+    def __len__(self):
+        return len(self.columnas[0]) if self.columnas else 0
+
+    def columna(self, nombre):
+        return self.columnas[self.nombres.index(nombre)]
+
+    def filas(self):
+        return zip(*self.columnas)
+
+    def registros(self):
+        return (dict(zip(self.nombres, fila)) for fila in self.filas())
+
+    def totales(self, *nombres):
+        return {nombre: sum(valor for valor in self.columna(nombre) if valor is not None) for nombre in nombres}
+
+
+def _renderizar_pdf(tabla, archivo, titulo, metadatos):
+    escribir_pdf(archivo, tabla.encabezados, tabla.filas(), titulo=titulo)
+
+
+def _renderizar_excel(tabla, archivo, titulo, metadatos):
+    escribir_xlsx(archivo, tabla.encabezados, tabla.filas(), titulo_hoja='Reporte')
+
+
+def _renderizar_csv(tabla, archivo, titulo, metadatos):
+    for bloque in generar_csv(tabla.encabezados, tabla.filas()):
+        archivo.write(bloque.encode('utf-8'))
+
+
+def _renderizar_json(tabla, archivo, titulo, metadatos):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8', write_through=True)
+    json.dump({
+        'titulo': titulo,
+        'generado': timezone.now(),
+        **(metadatos or {}),
+        'total_registros': len(tabla),
+        'columnas': dict(zip(tabla.nombres, tabla.encabezados)),
+        'datos': list(tabla.registros()),
+    }, texto, cls=DjangoJSONEncoder, ensure_ascii=False)
+    texto.detach()
+
+
+RENDERIZADORES = {
+    'pdf': _renderizar_pdf,
+    'excel': _renderizar_excel,
+    'csv': _renderizar_csv,
+    'json': _renderizar_json,
+}
+
+
+def renderizar(tabla, formato, archivo, titulo='', metadatos=None):
+    """Escribe la tabla en un archivo binario en el formato de Reporte.FORMATO_CHOICES"""
+    try:
+        renderizador = RENDERIZADORES[formato]
+    except KeyError:
+        raise ValueError(f'Formato de reporte no soportado: {formato}')
+    renderizador(tabla, archivo, titulo, metadatos)
@@ -0,0 +1,155 @@
+"""
+Series de tiempo de costos, eventos y tiempo de parada.
+
+Cada serie sale de una sola consulta GROUP BY por tabla (Trunc del campo de
+fecha, más la categoría o el centro si se agrupa). Los periodos sin datos se
+completan con ceros y el resultado se cachea por rango hasta que cambian las
+tablas de origen.
+"""
+from collections import defaultdict
+from datetime import datetime, time as hora, timedelta
+
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from components.cache import obtener_o_calcular
+from maquinaria.models import HistorialMaquina, MantenimientoProgramado
+
+GRANULARIDADES = {
+    'dia': TruncDay,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+
+AGRUPACIONES = {
+    'categoria': 'maquina__categoria__nombre',
+    'centro': 'maquina__centro_formacion',
+}
+
+# Límite de periodos por consulta, para que un rango enorme por día no
+# genere respuestas de cientos de miles de puntos
+MAX_PERIODOS = 1000
+
+DIAS_POR_PERIODO = {'dia': 1, 'semana': 7, 'mes': 28}
+
+MODELOS_SERIE = (
+    'maquinaria.HistorialMaquina', 'maquinaria.MantenimientoProgramado', 'maquinaria.Maquina',
+    'maquinaria.CategoriaMaquina', 'maquinaria.Proveedor',
+)
+
+METRICAS = ('costo_total', 'costo_historial', 'costo_mantenimiento', 'eventos', 'mantenimientos', 'horas_parada')
+
+
+class SerieInvalida(ValueError):
+    pass
+
+
+def inicio_periodo(granularidad, dia):
+    if granularidad == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if granularidad == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+
+def siguiente_periodo(granularidad, inicio):
+    if granularidad == 'semana':
+        return inicio + timedelta(days=7)
+    if granularidad == 'mes':
+        return (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return inicio + timedelta(days=1)
+
+
+def periodos(granularidad, desde, hasta):
+    """Inicio de cada periodo entre las fechas (inclusive)"""
+    actual = inicio_periodo(granularidad, desde)
+    resultado = []
+    while actual <= hasta:
+        resultado.append(actual)
+        actual = siguiente_periodo(granularidad, actual)
+    return resultado
+
+
+def _instante(dia):
+    return timezone.make_aware(datetime.combine(dia, hora.min))
+
+
+def _agrupado(queryset, campo_fecha, truncar, desde, hasta, agrupar, **agregados):
+    """{(grupo, periodo): agregados} con un GROUP BY sobre el rango [desde, hasta]"""
+    campos = ['periodo'] + ([AGRUPACIONES[agrupar]] if agrupar else [])
+    filas = (queryset
+             .filter(**{f'{campo_fecha}__gte': _instante(desde),
+                        f'{campo_fecha}__lt': _instante(hasta + timedelta(days=1))})
+             .annotate(periodo=truncar(campo_fecha, output_field=DateField()))
+             .values(*campos).annotate(**agregados).order_by())
+    resultado = {}
+    for fila in filas:
+        grupo = fila.pop(AGRUPACIONES[agrupar]) if agrupar else None
+        resultado[(grupo, fila.pop('periodo'))] = fila
+    return resultado
+
+
+def calcular_serie_costos(desde, hasta, granularidad='mes', agrupar=None):
+    truncar = GRANULARIDADES[granularidad]
+    inicios = periodos(granularidad, desde, hasta)
+
+    historial = _agrupado(
+        HistorialMaquina.objects.all(), 'fecha_evento', truncar, desde, hasta, agrupar,
+        costo=Sum('costo_asociado'),
+        eventos=Count('id'),
+    )
+    mantenimientos = _agrupado(
+        MantenimientoProgramado.objects.filter(estado='completado'), 'fecha_fin_real',
+        truncar, desde, hasta, agrupar,
+        costo=Sum('costo_real'),
+        mantenimientos=Count('id'),
+        parada=Sum('tiempo_parada'),
+    )
+
+    valores = defaultdict(lambda: {metrica: [0] * len(inicios) for metrica in METRICAS})
+    posicion = {inicio: i for i, inicio in enumerate(inicios)}
+    for (grupo, periodo), fila in historial.items():
+        serie, i = valores[grupo], posicion[periodo]
+        serie['costo_historial'][i] = float(fila['costo'] or 0)
+        serie['eventos'][i] = fila['eventos']
+    for (grupo, periodo), fila in mantenimientos.items():
+        serie, i = valores[grupo], posicion[periodo]
+        serie['costo_mantenimiento'][i] = float(fila['costo'] or 0)
+        serie['mantenimientos'][i] = fila['mantenimientos']
+        serie['horas_parada'][i] = round(fila['parada'].total_seconds() / 3600, 2) if fila['parada'] else 0
+
+    if agrupar is None:
+        valores[None]  # la serie total existe aunque no haya datos
+    series = []
+    for grupo in sorted(valores, key=lambda g: (g is None, str(g))):
+        serie = valores[grupo]
+        serie['costo_total'] = [round(a + b, 2) for a, b in zip(serie['costo_historial'], serie['costo_mantenimiento'])]
+        series.append({'grupo': grupo if grupo is not None else 'Total', **serie})
+
+    return {
+        'granularidad': granularidad,
+        'agrupar': agrupar,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'periodos': [inicio.isoformat() for inicio in inicios],
+        'series': series,
+    }
+
+
+def serie_costos(desde, hasta, granularidad='mes', agrupar=None):
+    """Serie cacheada hasta que cambia alguna de las tablas de origen"""
+    if granularidad not in GRANULARIDADES:
+        raise SerieInvalida(f'Granularidad no válida: {granularidad}')
+    if agrupar and agrupar not in AGRUPACIONES:
+        raise SerieInvalida(f'Agrupación no válida: {agrupar}')
+    if desde > hasta:
+        raise SerieInvalida('La fecha inicial es posterior a la final')
+    if (hasta - desde).days // DIAS_POR_PERIODO[granularidad] >= MAX_PERIODOS:
+        raise SerieInvalida(f'El rango supera {MAX_PERIODOS} periodos')
+
+    return obtener_o_calcular(
+        'serie_costos', MODELOS_SERIE,
+        lambda: calcular_serie_costos(desde, hasta, granularidad, agrupar),
+        desde, hasta, granularidad, agrupar,
+    )
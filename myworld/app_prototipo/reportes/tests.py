@@ -1,3 +1,481 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from rest_framework.test import APIClient
+
+from maquinaria.models import AlertaMaquina, CategoriaMaquina, HistorialMaquina, MantenimientoProgramado, Maquina
+from maquinaria.tests import crear_maquina
+from usuarios.middleware import cache_usuarios, obtener_usuario
+from usuarios.models import TipoUsuario
+from usuarios.tests import crear_usuario
+from . import cola
+from .analitica import respuesta_seccion
+from .generacion import (datos_inventario, fuente_del_reporte, generar_reporte, huella_del_reporte,
+                         reutilizar_resultado)
+from .metricas import actualizar_metricas, resumen_metricas
+from .models import MetricasRendimiento, Reporte, TipoReporte
+from .motor import renderizar
+from .series import SerieInvalida, calcular_serie_costos, serie_costos
+from .views import descargar_reporte
+
+CACHE_LOCAL = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def generar_con_error(reporte, registrar):
+    raise RuntimeError('sin datos')
+
+
+def generar_sin_error(reporte, registrar):
+    reporte.archivo_resultado.name = f'reportes/{reporte.pk}.csv'
+    reporte.total_registros = 3
+
+
+@override_settings(CACHES=CACHE_LOCAL, REPORTES_MAX_INTENTOS=3, REPORTES_REINTENTO_SEGUNDOS=60,
+                   REPORTES_TIEMPO_MAXIMO=1800)
+class ColaReportesTests(TestCase):
+    def setUp(self):
+        self.tipo = TipoReporte.objects.create(nombre='inventario', descripcion='Inventario')
+        self.usuario = crear_usuario(TipoUsuario.objects.create(nombre='coordinador'))
+
+    def crear_reporte(self, titulo, **datos):
+        return Reporte.objects.create(tipo_reporte=self.tipo, usuario_solicitante=self.usuario, titulo=titulo,
+                                      formato='csv', **datos)
+
+    def test_reclamar_en_orden_y_una_sola_vez(self):
+        primero = self.crear_reporte('Primero')
+        segundo = self.crear_reporte('Segundo')
+        Reporte.objects.filter(pk=segundo.pk).update(fecha_solicitud=timezone.now() + timedelta(seconds=1))
+        self.crear_reporte('Completado', estado='completado')
+
+        tomado = cola.reclamar('trabajador-a')
+        self.assertEqual(tomado.pk, primero.pk)
+        self.assertEqual((tomado.estado, tomado.procesado_por, tomado.intentos), ('generando', 'trabajador-a', 1))
+
+        self.assertEqual(cola.reclamar('trabajador-b').pk, segundo.pk)
+        self.assertIsNone(cola.reclamar('trabajador-c'))
+
+    def test_reintentos_con_espera_y_error_final(self):
+        reporte = self.crear_reporte('Falla')
+        with mock.patch.object(cola, 'generar_reporte', generar_con_error), self.assertLogs(cola.logger, 'ERROR'):
+            for intento, espera in ((1, 60), (2, 120)):
+                tomado = cola.reclamar('trabajador')
+                self.assertEqual(tomado.intentos, intento)
+                antes = timezone.now()
+                self.assertFalse(cola.procesar(tomado, 'trabajador'))
+
+                reporte.refresh_from_db()
+                self.assertEqual(reporte.estado, 'pendiente')
+                self.assertEqual(reporte.error_mensaje, 'sin datos')
+                self.assertGreaterEqual(reporte.disponible_desde, antes + timedelta(seconds=espera))
+                # No se vuelve a tomar antes de la espera
+                self.assertIsNone(cola.reclamar('trabajador'))
+                Reporte.objects.filter(pk=reporte.pk).update(disponible_desde=timezone.now())
+
+            self.assertFalse(cola.procesar(cola.reclamar('trabajador'), 'trabajador'))
+
+        reporte.refresh_from_db()
+        self.assertEqual((reporte.estado, reporte.intentos), ('error', 3))
+        self.assertIsNone(cola.reclamar('trabajador'))
+
+    def test_reintento_exitoso(self):
+        reporte = self.crear_reporte('Reintento')
+        with mock.patch.object(cola, 'generar_reporte', generar_con_error), self.assertLogs(cola.logger, 'ERROR'):
+            cola.procesar(cola.reclamar('trabajador'), 'trabajador')
+        Reporte.objects.filter(pk=reporte.pk).update(disponible_desde=timezone.now())
+
+        with mock.patch.object(cola, 'generar_reporte', generar_sin_error):
+            self.assertTrue(cola.procesar(cola.reclamar('trabajador'), 'trabajador'))
+
+        reporte.refresh_from_db()
+        self.assertEqual((reporte.estado, reporte.intentos, reporte.error_mensaje), ('completado', 2, ''))
+        self.assertEqual(reporte.archivo_resultado.name, f'reportes/{reporte.pk}.csv')
+
+    def test_trabajador_que_perdio_el_reporte_no_lo_completa(self):
+        reporte = self.crear_reporte('Cancelado')
+        tomado = cola.reclamar('trabajador')
+        Reporte.objects.filter(pk=reporte.pk).update(estado='cancelado')
+
+        with mock.patch.object(cola, 'generar_reporte', generar_sin_error), self.assertLogs(cola.logger, 'WARNING'):
+            self.assertFalse(cola.procesar(tomado, 'trabajador'))
+        reporte.refresh_from_db()
+        self.assertEqual(reporte.estado, 'cancelado')
+
+    def test_recuperar_abandonados(self):
+        reporte = self.crear_reporte('Abandonado')
+        cola.reclamar('trabajador-caido')
+        Reporte.objects.filter(pk=reporte.pk).update(
+            fecha_inicio_procesamiento=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(cola.recuperar_abandonados(), 1)
+        reporte.refresh_from_db()
+        self.assertEqual((reporte.estado, reporte.procesado_por), ('pendiente', ''))
+        self.assertIsNotNone(reporte.disponible_desde)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class MotorReportesTests(TestCase):
+    def setUp(self):
+        self.tipo = TipoReporte.objects.create(nombre='Inventario general', descripcion='Inventario')
+        self.usuario = crear_usuario(TipoUsuario.objects.create(nombre='coordinador'))
+        self.tornos = CategoriaMaquina.objects.create(nombre='Tornos')
+        fresadoras = CategoriaMaquina.objects.create(nombre='Fresadoras')
+        crear_maquina(self.tornos, 1, estado='operativa', valor_adquisicion=Decimal('1500.50'))
+        crear_maquina(self.tornos, 2, estado='operativa', fecha_adquisicion=date(2020, 5, 1))
+        crear_maquina(self.tornos, 3, estado='mantenimiento')
+        crear_maquina(fresadoras, 4, estado='operativa')
+
+    def reporte(self, **datos):
+        return Reporte(tipo_reporte=self.tipo, usuario_solicitante=self.usuario, titulo='Inventario', **datos)
+
+    def test_una_consulta_y_todos_los_formatos_desde_la_tabla(self):
+        reporte = self.reporte(categorias_maquina=[self.tornos.pk], estados_maquina=['operativa'],
+                               fecha_inicio=date(2023, 1, 1))
+        with self.assertNumQueries(1):
+            tabla = datos_inventario(reporte)
+        self.assertEqual(tabla.columna('codigo_inventario'), ['MAQ-001'])
+        self.assertEqual(tabla.columna('estado'), ['Operativa'])
+        self.assertEqual(tabla.totales('valor_adquisicion'), {'valor_adquisicion': Decimal('1500.50')})
+
+        salidas = {}
+        with self.assertNumQueries(0):
+            for formato in ('pdf', 'excel', 'csv', 'json'):
+                archivo = io.BytesIO()
+                renderizar(tabla, formato, archivo, titulo='Inventario', metadatos={'fuente': 'inventario'})
+                salidas[formato] = archivo.getvalue()
+
+        self.assertTrue(salidas['pdf'].startswith(b'%PDF'))
+        self.assertTrue(salidas['excel'].startswith(b'PK'))
+        self.assertIn('MAQ-001,Máquina 1,Tornos', salidas['csv'].decode('utf-8'))
+        contenido = json.loads(salidas['json'])
+        self.assertEqual((contenido['fuente'], contenido['total_registros']), ('inventario', 1))
+        self.assertEqual(contenido['datos'][0]['valor_adquisicion'], '1500.50')
+
+        with self.assertRaises(ValueError):
+            renderizar(tabla, 'xml', io.BytesIO())
+
+    def test_fuente_por_nombre_o_parametro(self):
+        self.assertEqual(fuente_del_reporte(self.reporte()), 'inventario')
+        self.tipo.nombre = 'Costos de operación'
+        self.assertEqual(fuente_del_reporte(self.reporte()), 'costos')
+        self.assertEqual(fuente_del_reporte(self.reporte(parametros={'fuente': 'eficiencia'})), 'eficiencia')
+        self.assertEqual(fuente_del_reporte(self.reporte(parametros={'fuente': 'otra'})), 'costos')
+
+    def test_generar_completa_registros_y_tamano(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        reporte = self.reporte(formato='csv', estados_maquina=['operativa'])
+        reporte.save()
+
+        with override_settings(MEDIA_ROOT=media):
+            tabla = generar_reporte(reporte, lambda mensaje: None)
+            self.assertEqual((len(tabla), reporte.total_registros), (3, 3))
+            self.assertEqual(reporte.tamaño_archivo, reporte.archivo_resultado.size)
+            self.assertTrue(reporte.archivo_resultado.name.endswith('.csv'))
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class HuellaReportesTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        ajustes = override_settings(MEDIA_ROOT=media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.tipo = TipoReporte.objects.create(nombre='Inventario general', descripcion='Inventario')
+        self.usuario = crear_usuario(TipoUsuario.objects.create(nombre='coordinador'))
+        self.maquina = crear_maquina(CategoriaMaquina.objects.create(nombre='Tornos'), 1)
+
+    def reporte(self, **datos):
+        valores = {'formato': 'csv', 'centros_formacion': ['Centro Norte', 'Centro Industrial']}
+        valores.update(datos)
+        return Reporte.objects.create(tipo_reporte=self.tipo, usuario_solicitante=self.usuario, titulo='Mensual',
+                                      **valores)
+
+    def generar(self, reporte):
+        tabla = generar_reporte(reporte, lambda mensaje: None)
+        reporte.estado = 'completado'
+        reporte.fecha_completado = timezone.now()
+        reporte.save()
+        return tabla
+
+    def test_huella_canonica(self):
+        base = huella_del_reporte(self.reporte())
+        # El orden de los filtros y el título no cambian el archivo
+        self.assertEqual(huella_del_reporte(self.reporte(centros_formacion=['Centro Industrial', 'Centro Norte'])), base)
+        self.assertNotEqual(huella_del_reporte(self.reporte(formato='json')), base)
+        self.assertNotEqual(huella_del_reporte(self.reporte(fecha_fin=date(2025, 1, 31))), base)
+
+        self.maquina.nombre = 'Torno CNC'
+        self.maquina.save()
+        self.assertNotEqual(huella_del_reporte(self.reporte()), base)
+
+    def test_reutiliza_el_archivo_de_la_misma_huella(self):
+        primero = self.reporte()
+        self.assertIsNotNone(self.generar(primero))
+
+        # Generado por el trabajador: no vuelve a leer ni a renderizar
+        segundo = self.reporte()
+        self.assertIsNone(generar_reporte(segundo, lambda mensaje: None))
+        self.assertEqual(segundo.archivo_resultado.name, primero.archivo_resultado.name)
+
+        # Al crear la solicitud: se completa al instante
+        tercero = self.reporte(centros_formacion=['Centro Industrial', 'Centro Norte'])
+        self.assertTrue(reutilizar_resultado(tercero))
+        tercero.refresh_from_db()
+        self.assertEqual((tercero.estado, tercero.total_registros), ('completado', 1))
+        self.assertEqual(tercero.archivo_resultado.name, primero.archivo_resultado.name)
+
+    def test_archivo_borrado_no_se_reutiliza(self):
+        primero = self.reporte()
+        self.generar(primero)
+        primero.archivo_resultado.storage.delete(primero.archivo_resultado.name)
+
+        segundo = self.reporte()
+        self.assertFalse(reutilizar_resultado(segundo))
+        segundo.refresh_from_db()
+        self.assertEqual((segundo.estado, segundo.huella), ('pendiente', primero.huella))
+        self.assertIsNotNone(self.generar(segundo))
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class DescargaReportesTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        ajustes = override_settings(MEDIA_ROOT=media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        cache_usuarios.limpiar()
+        self.addCleanup(cache_usuarios.limpiar)
+
+        tipo_usuario = TipoUsuario.objects.create(nombre='instructor')
+        self.dueno = User.objects.create_user('dueno')
+        solicitante = crear_usuario(tipo_usuario, user=self.dueno)
+        self.otro = User.objects.create_user('otro')
+        crear_usuario(tipo_usuario, numero_documento='999', email='otro@sena.edu.co', user=self.otro)
+
+        self.reporte = Reporte.objects.create(
+            tipo_reporte=TipoReporte.objects.create(nombre='inventario', descripcion='Inventario'),
+            usuario_solicitante=solicitante, titulo='Inventario', formato='csv', estado='completado',
+        )
+        self.reporte.archivo_resultado.save('inventario.csv', ContentFile(b'codigo\nMAQ-001\n'))
+
+    def descargar_web(self, user):
+        request = RequestFactory().get(f'/reportes/descargar/{self.reporte.pk}/')
+        request.user = user
+        request.usuario = SimpleLazyObject(lambda: obtener_usuario(user))
+        return descargar_reporte(request, self.reporte.pk)
+
+    def descargar_api(self, user):
+        cliente = APIClient()
+        cliente.force_authenticate(user)
+        return cliente.get(f'/api/reportes/{self.reporte.pk}/descargar/')
+
+    def test_solicitante_descarga(self):
+        for respuesta in (self.descargar_web(self.dueno), self.descargar_api(self.dueno)):
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(b''.join(respuesta.streaming_content), b'codigo\nMAQ-001\n')
+        self.reporte.refresh_from_db()
+        self.assertEqual(self.reporte.veces_descargado, 2)
+
+    def test_otro_usuario_no_descarga(self):
+        sin_perfil = User.objects.create_user('sin-perfil')
+        for user in (self.otro, sin_perfil):
+            with self.subTest(user=user.username):
+                with self.assertRaises(Http404):
+                    self.descargar_web(user)
+                self.assertEqual(self.descargar_api(user).status_code, 404)
+        self.reporte.refresh_from_db()
+        self.assertEqual(self.reporte.veces_descargado, 0)
+
+    def test_staff_descarga(self):
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.assertEqual(self.descargar_web(staff).status_code, 200)
+        self.assertEqual(self.descargar_api(staff).status_code, 200)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class MetricasRendimientoTests(TestCase):
+    def setUp(self):
+        self.categoria = CategoriaMaquina.objects.create(nombre='Tornos')
+        self.maquina = crear_maquina(self.categoria, 1, estado='operativa', eficiencia=Decimal('80'))
+        crear_maquina(self.categoria, 2, estado='mantenimiento', eficiencia=Decimal('60'))
+        self.ayer = timezone.localdate() - timedelta(days=1)
+
+    def alerta(self, hace_dias=0, **datos):
+        alerta = AlertaMaquina.objects.create(maquina=self.maquina, tipo='inspeccion', titulo='Revisión',
+                                              descripcion='-', **datos)
+        AlertaMaquina.objects.filter(pk=alerta.pk).update(fecha_creacion=timezone.now() - timedelta(days=hace_dias))
+        return alerta
+
+    def test_filas_diarias_y_periodos_derivados(self):
+        self.alerta(hace_dias=1, prioridad='critica')
+        self.alerta()
+        self.alerta()
+
+        actualizar_metricas(completo=True)
+
+        diarias = dict(MetricasRendimiento.objects.filter(periodo='diario')
+                       .values_list('fecha', 'alertas_generadas'))
+        self.assertEqual(diarias, {self.ayer: 1, timezone.localdate(): 2})
+        hoy = MetricasRendimiento.objects.get(periodo='diario', fecha=timezone.localdate())
+        self.assertEqual((hoy.total_maquinas, hoy.maquinas_operativas, hoy.maquinas_mantenimiento), (2, 1, 1))
+        self.assertEqual(hoy.eficiencia_promedio, Decimal('70.00'))
+
+        # Los periodos suman los eventos de sus días (ayer y hoy pueden caer en meses distintos)
+        for periodo in ('semanal', 'mensual', 'anual'):
+            filas = MetricasRendimiento.objects.filter(periodo=periodo)
+            self.assertEqual(sum(fila.alertas_generadas for fila in filas), 3, periodo)
+            self.assertEqual(sum(fila.alertas_criticas for fila in filas), 1, periodo)
+
+        resumen = resumen_metricas('diario')
+        self.assertEqual((resumen['total_maquinas'], resumen['alertas_generadas']), (2, 2))
+        self.assertEqual(resumen['porcentaje_disponibilidad'], Decimal('50.00'))
+
+    def test_solo_recalcula_los_dias_con_cambios(self):
+        self.alerta(hace_dias=1)
+        self.assertEqual(actualizar_metricas(completo=True)['dias'], 2)
+        self.assertEqual(actualizar_metricas()['dias'], 0)
+
+        self.alerta()
+        self.assertEqual(actualizar_metricas()['dias'], 1)
+        self.assertEqual(
+            MetricasRendimiento.objects.get(periodo='diario', fecha=timezone.localdate()).alertas_generadas, 1
+        )
+        # El día anterior conserva su fila
+        self.assertEqual(MetricasRendimiento.objects.get(periodo='diario', fecha=self.ayer).alertas_generadas, 1)
+
+    def test_api_lee_las_filas_consolidadas(self):
+        self.alerta()
+        actualizar_metricas(completo=True)
+        cliente = APIClient()
+        cliente.force_authenticate(User.objects.create_user('metricas'))
+
+        with self.assertNumQueries(1):
+            datos = cliente.get('/api/metricas/resumen/', {'periodo': 'diario'}).data
+        self.assertEqual((datos['total_maquinas'], datos['alertas_generadas']), (2, 1))
+        self.assertEqual(cliente.get('/api/metricas/resumen/', {'periodo': 'horario'}).status_code, 400)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class SerieCostosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tornos = crear_maquina(CategoriaMaquina.objects.create(nombre='Tornos'), 1)
+        fresadora = crear_maquina(CategoriaMaquina.objects.create(nombre='Fresadoras'), 2,
+                                  centro_formacion='Centro Norte')
+        for maquina, fecha, costo in ((tornos, (2024, 1, 10), 100), (tornos, (2024, 1, 20), 50),
+                                      (fresadora, (2024, 3, 5), 30)):
+            self.evento(maquina, fecha, costo)
+        MantenimientoProgramado.objects.create(
+            maquina=fresadora, tipo='preventivo', titulo='Cambio de aceite', descripcion='-', estado='completado',
+            fecha_programada=self.instante(2024, 3, 14), fecha_fin_real=self.instante(2024, 3, 15),
+            duracion_estimada=timedelta(hours=2), costo_real=Decimal('200'), tiempo_parada=timedelta(minutes=90),
+        )
+
+    def instante(self, *fecha):
+        return timezone.make_aware(datetime(*fecha, 12))
+
+    def evento(self, maquina, fecha, costo):
+        evento = HistorialMaquina.objects.create(maquina=maquina, tipo_evento='reparacion', descripcion='-',
+                                                 costo_asociado=Decimal(costo))
+        HistorialMaquina.objects.filter(pk=evento.pk).update(fecha_evento=self.instante(*fecha))
+
+    def test_meses_sin_datos_en_cero(self):
+        with self.assertNumQueries(2):
+            serie = calcular_serie_costos(date(2024, 1, 1), date(2024, 4, 30))
+
+        self.assertEqual(serie['periodos'], ['2024-01-01', '2024-02-01', '2024-03-01', '2024-04-01'])
+        [total] = serie['series']
+        self.assertEqual(total['grupo'], 'Total')
+        self.assertEqual(total['costo_total'], [150, 0, 230, 0])
+        self.assertEqual(total['eventos'], [2, 0, 1, 0])
+        self.assertEqual(total['mantenimientos'], [0, 0, 1, 0])
+        self.assertEqual(total['horas_parada'], [0, 0, 1.5, 0])
+
+    def test_semanas_y_agrupacion(self):
+        serie = calcular_serie_costos(date(2024, 1, 10), date(2024, 1, 20), 'semana')
+        self.assertEqual(serie['periodos'], ['2024-01-08', '2024-01-15'])
+        self.assertEqual(serie['series'][0]['costo_total'], [100, 50])
+
+        serie = calcular_serie_costos(date(2024, 1, 1), date(2024, 3, 31), agrupar='categoria')
+        self.assertEqual({fila['grupo']: fila['costo_total'] for fila in serie['series']},
+                         {'Fresadoras': [0, 0, 230], 'Tornos': [150, 0, 0]})
+        serie = calcular_serie_costos(date(2024, 1, 1), date(2024, 3, 31), agrupar='centro')
+        self.assertEqual([fila['grupo'] for fila in serie['series']], ['Centro Industrial', 'Centro Norte'])
+
+    def test_cache_por_rango_hasta_que_cambian_los_datos(self):
+        desde, hasta = date(2024, 1, 1), date(2024, 2, 29)
+        self.assertEqual(serie_costos(desde, hasta)['series'][0]['costo_total'], [150, 0])
+        with self.assertNumQueries(0):
+            serie_costos(desde, hasta)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evento(Maquina.objects.get(codigo_inventario='MAQ-001'), (2024, 2, 1), 25)
+        self.assertEqual(serie_costos(desde, hasta)['series'][0]['costo_total'], [150, 25])
+
+    def test_parametros_invalidos(self):
+        for argumentos in ((date(2024, 2, 1), date(2024, 1, 1)),
+                           (date(2024, 1, 1), date(2024, 2, 1), 'hora'),
+                           (date(2024, 1, 1), date(2024, 2, 1), 'mes', 'proveedor'),
+                           (date(2000, 1, 1), date(2024, 1, 1), 'dia')):
+            with self.assertRaises(SerieInvalida):
+                serie_costos(*argumentos)
+
+
+@override_settings(CACHES=CACHE_LOCAL, ANALITICA_INTERVALO_SEGUNDOS=60)
+class InstantaneaAnaliticaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.categoria = CategoriaMaquina.objects.create(nombre='Tornos')
+        crear_maquina(self.categoria, 1, estado='operativa', eficiencia=Decimal('80'), horas_uso_total=10)
+        crear_maquina(self.categoria, 2, estado='operativa', eficiencia=Decimal('60'), horas_uso_total=30)
+
+    def seccion(self, nombre, **cabeceras):
+        return respuesta_seccion(RequestFactory().get('/reportes/api/', headers=cabeceras), nombre)
+
+    def test_una_instantanea_para_todas_las_secciones(self):
+        eficiencia = json.loads(self.seccion('eficiencia').content)
+        self.assertEqual(eficiencia['data'], [70.0])
+
+        with self.assertNumQueries(0):
+            estados = json.loads(self.seccion('estados').content)
+            maquinas = json.loads(self.seccion('maquinas').content)
+            costos = json.loads(self.seccion('costos').content)
+        self.assertEqual((estados['labels'], estados['data']), (['Operativa'], [2]))
+        self.assertEqual([fila['codigo'] for fila in maquinas['data']], ['MAQ-002', 'MAQ-001'])
+        self.assertEqual(len(costos['data']), 6)
+
+    def test_etag_y_304(self):
+        respuesta = self.seccion('estados')
+        self.assertEqual(respuesta['Cache-Control'], 'private, no-cache')
+        repetida = self.seccion('estados', If_None_Match=respuesta['ETag'])
+        self.assertEqual((repetida.status_code, repetida.content), (304, b''))
+
+    def test_cambios_dentro_y_fuera_del_intervalo(self):
+        etag = self.seccion('estados')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_maquina(self.categoria, 3, estado='mantenimiento')
+
+        # Dentro del intervalo se sirve la instantánea anterior
+        self.assertEqual(self.seccion('estados', If_None_Match=etag).status_code, 304)
+
+        with override_settings(ANALITICA_INTERVALO_SEGUNDOS=0):
+            respuesta = self.seccion('estados', If_None_Match=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertEqual(json.loads(respuesta.content)['data'], [2, 1])
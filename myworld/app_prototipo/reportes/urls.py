@@ -41,6 +41,7 @@ urlpatterns = [
     path('api/widget/<int:widget_id>/datos/', views.datos_widget_api, name='api_datos_widget'),
     path('api/grafico/eficiencia/', views.grafico_eficiencia_api, name='api_grafico_eficiencia'),
     path('api/grafico/costos/', views.grafico_costos_api, name='api_grafico_costos'),
+    path('api/serie/costos/', views.serie_costos_api, name='api_serie_costos'),
     path('api/grafico/estados/', views.grafico_estados_api, name='api_grafico_estados'),
     path('api/tabla/maquinas/', views.tabla_maquinas_api, name='api_tabla_maquinas'),
 
@@ -4,19 +4,29 @@ from django.http import JsonResponse, HttpResponse, Http404
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.paginator import Paginator
-from django.db.models import Count, Q, Avg, Sum, Max, Min
+from django.db.models import Q
 from django.contrib import messages
 from datetime import date, timedelta
+import hashlib
 import json
 import uuid
 from .models import Reporte, TipoReporte, MetricasRendimiento
+from .generacion import reutilizar_resultado
+from components.descargas import respuesta_descarga
+from .series import serie_costos
+from .analitica import respuesta_seccion
+from components.models import Widget
+from components.widgets import datos_widget, permitido
 
 @login_required
 def dashboard_reportes_view(request):
     """Dashboard principal de reportes con estadísticas reales"""
     try:
-        from maquinaria.models import Maquina, AlertaMaquina, HistorialMaquina, CategoriaMaquina
+        from maquinaria.models import Maquina, CategoriaMaquina
+        from maquinaria.estadisticas import FleetStats
 
         # Estadísticas de reportes
         total_reportes = Reporte.objects.count()
@@ -33,9 +43,7 @@ def dashboard_reportes_view(request):
         ).order_by('-fecha_solicitud')[:5]
 
         # Estadísticas básicas de maquinaria
-        total_maquinas = Maquina.objects.count()
-        total_alertas = AlertaMaquina.objects.count()
-        alertas_activas = AlertaMaquina.objects.filter(estado='activa').count()
+        stats = FleetStats.calcular()
 
         # Categorías para filtros
         categorias = CategoriaMaquina.objects.filter(activa=True)
@@ -50,9 +58,9 @@ def dashboard_reportes_view(request):
             'tipos_disponibles': tipos_disponibles,
             'reportes_programados': reportes_programados,
             'reportes_recientes': reportes_recientes,
-            'total_maquinas': total_maquinas,
-            'total_alertas': total_alertas,
-            'alertas_activas': alertas_activas,
+            'total_maquinas': stats.total_maquinas,
+            'total_alertas': stats.total_alertas,
+            'alertas_activas': stats.alertas_activas,
             'categorias': categorias,
             'centros_formacion': centros_formacion,
         }
@@ -123,13 +131,10 @@ def crear_reporte_web(request):
 
             # Determinar usuario solicitante
             if request.user.is_authenticated:
-                try:
-                    usuario_solicitante = Usuario.objects.get(user=request.user)
-                except Usuario.DoesNotExist:
-                    usuario_solicitante = Usuario.objects.first()
-                    if not usuario_solicitante:
-                        messages.error(request, 'No hay usuarios en el sistema')
-                        return redirect('reportes:generar_reporte')
+                usuario_solicitante = request.usuario or Usuario.objects.first()
+                if not usuario_solicitante:
+                    messages.error(request, 'No hay usuarios en el sistema')
+                    return redirect('reportes:generar_reporte')
             else:
                 usuario_solicitante = Usuario.objects.first()
                 if not usuario_solicitante:
@@ -151,7 +156,11 @@ def crear_reporte_web(request):
                 estado='pendiente'
             )
 
-            messages.success(request, f'Reporte "{nombre_reporte}" creado exitosamente. ID: {reporte.id}')
+            # Si ya existe un resultado para la misma configuración y datos, queda listo al instante
+            if reutilizar_resultado(reporte):
+                messages.success(request, f'Reporte "{nombre_reporte}" listo para descargar. ID: {reporte.id}')
+            else:
+                messages.success(request, f'Reporte "{nombre_reporte}" creado exitosamente. ID: {reporte.id}')
             return redirect('reportes:lista_reportes')
 
         except TipoReporte.DoesNotExist:
@@ -217,16 +226,13 @@ def crear_reporte_api(request):
                     }, status=400)
             elif request.user.is_authenticated:
                 # Si el usuario está autenticado, usar su instancia de Usuario
-                try:
-                    usuario_solicitante = Usuario.objects.get(user=request.user)
-                except Usuario.DoesNotExist:
-                    # Si no existe Usuario para este User, crear uno básico o usar el primer usuario
-                    usuario_solicitante = Usuario.objects.first()
-                    if not usuario_solicitante:
-                        return JsonResponse({
-                            'success': False,
-                            'error': 'No hay usuarios en el sistema'
-                        }, status=400)
+                # (o el primer usuario si no existe Usuario para este User)
+                usuario_solicitante = request.usuario or Usuario.objects.first()
+                if not usuario_solicitante:
+                    return JsonResponse({
+                        'success': False,
+                        'error': 'No hay usuarios en el sistema'
+                    }, status=400)
             else:
                 # Para testing sin autenticación, usar el primer usuario disponible
                 usuario_solicitante = Usuario.objects.first()
@@ -250,6 +256,7 @@ def crear_reporte_api(request):
                 estados_maquina=[estado_maquina] if estado_maquina else [],
                 estado='pendiente'
             )
+            reutilizar_resultado(reporte)
 
             # Devolver JSON (es API)
             return JsonResponse({
@@ -345,7 +352,7 @@ def detalle_reporte_view(request, pk):
         reporte = get_object_or_404(Reporte, id=pk)
 
         # Verificar que el usuario puede ver este reporte
-        if reporte.usuario_solicitante != request.user and not request.user.is_staff:
+        if not reporte.puede_ver(request.user, request.usuario):
             raise Http404("No tienes permiso para ver este reporte")
 
         context = {
@@ -361,7 +368,18 @@ def detalle_reporte_view(request, pk):
 
 @login_required
 def descargar_reporte(request, pk):
-    return JsonResponse({'success': True, 'url': '/media/reportes/placeholder.pdf'})
+    """Descarga el archivo de un reporte completado (admite Range y peticiones condicionales)"""
+    reporte = get_object_or_404(Reporte, pk=pk)
+    if not reporte.puede_ver(request.user, request.usuario):
+        raise Http404("No tienes permiso para descargar este reporte")
+    if reporte.estado != 'completado' or not reporte.archivo_resultado:
+        messages.warning(request, 'El reporte todavía no tiene un archivo para descargar')
+        return redirect('reportes:lista_reportes')
+    try:
+        return respuesta_descarga(request, reporte.archivo_resultado, reporte.nombre_descarga,
+                                  al_descargar=reporte.registrar_descarga)
+    except FileNotFoundError:
+        raise Http404('El archivo del reporte no existe')
 
 @login_required
 def tipos_reporte_view(request):
@@ -403,137 +421,91 @@ def analisis_predicciones_view(request):
 def analisis_comparativo_view(request):
     return render(request, 'reportes/analisis_comparativo.html', {'title': 'Análisis Comparativo'})
 
+def _exportar_inventario(request, formato):
+    """Descarga del inventario con los filtros de ExportarMaquinasForm recibidos por GET"""
+    from maquinaria.forms import ExportarMaquinasForm
+    from maquinaria.exportacion import exportar_maquinas
+
+    datos = request.GET.copy()
+    datos['formato'] = formato
+    form = ExportarMaquinasForm(datos)
+    if not form.is_valid():
+        messages.error(request, 'Filtros de exportación inválidos')
+        return redirect('reportes:lista_reportes')
+    return exportar_maquinas(
+        formato,
+        categorias=form.cleaned_data['categorias'],
+        incluir_inactivas=form.cleaned_data['incluir_inactivas'],
+    )
+
 @login_required
 def exportar_excel_view(request):
-    return HttpResponse('Excel export placeholder', content_type='application/vnd.ms-excel')
+    return _exportar_inventario(request, 'excel')
 
 @login_required
 def exportar_pdf_view(request):
-    return HttpResponse('PDF export placeholder', content_type='application/pdf')
+    return _exportar_inventario(request, 'pdf')
 
 @login_required
 def exportar_csv_view(request):
-    return HttpResponse('CSV export placeholder', content_type='text/csv')
+    return _exportar_inventario(request, 'csv')
 
 @login_required
 def datos_widget_api(request, widget_id):
-    return JsonResponse({'data': [], 'widget_id': widget_id})
+    """Datos de un widget (components.widgets); 304 si el navegador ya los tiene"""
+    widget = get_object_or_404(Widget, pk=widget_id, activo=True)
+    if not permitido(widget, request.user, request.usuario or None):
+        return JsonResponse({'error': 'No tiene permisos para este widget'}, status=403)
+    contenido = json.dumps(datos_widget(widget), cls=DjangoJSONEncoder)
+    etag = '"{}"'.format(hashlib.md5(contenido.encode('utf-8')).hexdigest())
+    respuesta = get_conditional_response(request, etag=etag)
+    if respuesta is None:
+        respuesta = HttpResponse(contenido, content_type='application/json')
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = 'private, no-cache'
+    return respuesta
 
 @login_required
 def grafico_eficiencia_api(request):
     """API para gráfico de eficiencia de máquinas"""
-    try:
-        from maquinaria.models import Maquina, CategoriaMaquina
-
-        # Eficiencia por categoría
-        categorias_eficiencia = CategoriaMaquina.objects.annotate(
-            avg_eficiencia=Avg('maquina__eficiencia')
-        ).filter(avg_eficiencia__isnull=False)
-
-        labels = []
-        data = []
-        colors = []
-
-        for categoria in categorias_eficiencia:
-            labels.append(categoria.nombre)
-            data.append(round(categoria.avg_eficiencia, 1))
-            colors.append(categoria.color)
-
-        return JsonResponse({
-            'labels': labels,
-            'data': data,
-            'colors': colors
-        })
-
-    except ImportError:
-        return JsonResponse({'labels': [], 'data': [], 'colors': []})
+    return respuesta_seccion(request, 'eficiencia')
 
 @login_required
 def grafico_costos_api(request):
-    """API para gráfico de costos de mantenimiento"""
-    try:
-        from maquinaria.models import HistorialMaquina
-        from django.db.models import Sum
-
-        # Costos por mes (últimos 6 meses)
-        hoy = date.today()
-        labels = []
-        data = []
-
-        for i in range(6):
-            mes_fecha = hoy - timedelta(days=30*i)
-            mes_nombre = mes_fecha.strftime('%B')
+    """API para gráfico de costos de mantenimiento (últimos 6 meses)"""
+    return respuesta_seccion(request, 'costos')
 
-            # Calcular costos del mes
-            costos_mes = HistorialMaquina.objects.filter(
-                fecha_evento__year=mes_fecha.year,
-                fecha_evento__month=mes_fecha.month,
-                costo_asociado__isnull=False
-            ).aggregate(total=Sum('costo_asociado'))['total'] or 0
-
-            labels.insert(0, mes_nombre)
-            data.insert(0, float(costos_mes))
-
-        return JsonResponse({
-            'labels': labels,
-            'data': data
-        })
-
-    except ImportError:
-        return JsonResponse({'labels': [], 'data': []})
+@login_required
+def serie_costos_api(request):
+    """
+    Costos, eventos y horas de parada por día, semana o mes.
+    Parámetros: desde, hasta (AAAA-MM-DD), granularidad (dia|semana|mes),
+    agrupar (categoria|centro).
+    """
+    try:
+        hasta = date.fromisoformat(request.GET['hasta']) if request.GET.get('hasta') else timezone.localdate()
+        desde = date.fromisoformat(request.GET['desde']) if request.GET.get('desde') else hasta - timedelta(days=365)
+    except ValueError:
+        return JsonResponse({'error': 'Las fechas deben tener el formato AAAA-MM-DD'}, status=400)
+    try:
+        serie = serie_costos(
+            desde, hasta,
+            granularidad=request.GET.get('granularidad', 'mes'),
+            agrupar=request.GET.get('agrupar') or None,
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(serie)
 
 @login_required
 def grafico_estados_api(request):
     """API para gráfico de estados de máquinas"""
-    try:
-        from maquinaria.models import Maquina
-
-        estados_data = Maquina.objects.values('estado').annotate(
-            count=Count('id')
-        ).order_by('-count')
-
-        labels = []
-        data = []
-        colors = ['#28a745', '#ffc107', '#dc3545', '#17a2b8', '#6c757d']
-
-        for i, estado in enumerate(estados_data):
-            labels.append(estado['estado'].replace('_', ' ').title())
-            data.append(estado['count'])
-
-        return JsonResponse({
-            'labels': labels,
-            'data': data,
-            'colors': colors[:len(labels)]
-        })
-
-    except ImportError:
-        return JsonResponse({'labels': [], 'data': [], 'colors': []})
+    return respuesta_seccion(request, 'estados')
 
 @login_required
 def tabla_maquinas_api(request):
-    """API para tabla de máquinas con datos reales"""
-    try:
-        from maquinaria.models import Maquina
-
-        maquinas = Maquina.objects.select_related('categoria', 'proveedor').all()[:20]
-
-        data = []
-        for maquina in maquinas:
-            data.append({
-                'codigo': maquina.codigo_inventario,
-                'nombre': maquina.nombre,
-                'categoria': maquina.categoria.nombre if maquina.categoria else '-',
-                'estado': maquina.get_estado_display(),
-                'condicion': maquina.get_condicion_display(),
-                'eficiencia': f"{maquina.eficiencia}%",
-                'horas_uso': maquina.horas_uso_total,
-                'ultimo_mantenimiento': maquina.fecha_ultimo_mantenimiento.strftime('%Y-%m-%d') if maquina.fecha_ultimo_mantenimiento else '-',
-            })
-
-        return JsonResponse({'data': data})
-
-    except ImportError:
-        return JsonResponse({'data': []})
+    """API para tabla de las máquinas con más horas de uso"""
+    return respuesta_seccion(request, 'maquinas')
 
 @login_required
 def personalizar_dashboard_view(request):
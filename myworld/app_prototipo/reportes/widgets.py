@@ -0,0 +1,38 @@
+"""Proveedores de datos de widgets (components.widgets) de reportes y analítica"""
+import json
+from datetime import timedelta
+
+from django.utils import timezone
+
+from components.widgets import proveedor
+from .analitica import SECCIONES, obtener_instantanea
+from .metricas import resumen_metricas
+from .series import serie_costos
+
+
+def _seccion(nombre):
+    def datos(parametros):
+        return json.loads(obtener_instantanea()['secciones'][nombre]['contenido'])
+    return datos
+
+
+for _nombre in SECCIONES:
+    proveedor(_nombre)(_seccion(_nombre))
+
+
+@proveedor('serie_costos')
+def serie_costos_widget(parametros):
+    """Parámetros: dias (rango hasta hoy), granularidad, agrupar"""
+    hasta = timezone.localdate()
+    desde = hasta - timedelta(days=int(parametros.get('dias', 365)))
+    return serie_costos(desde, hasta, parametros.get('granularidad', 'mes'), parametros.get('agrupar'))
+
+
+@proveedor('resumen_metricas')
+def resumen_metricas_widget(parametros):
+    """Parámetros: periodo, centro, categoria"""
+    return resumen_metricas(
+        periodo=parametros.get('periodo', 'mensual'),
+        centro=parametros.get('centro'),
+        categoria=parametros.get('categoria'),
+    )
@@ -1,8 +1,23 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
 from .models import Usuario
 
+
+def clave_sin_usuario(identificador):
+    """
+    Clave de cache para identificadores sin Usuario asociado. Se usa el
+    identificador exacto que se consulta (la búsqueda distingue mayúsculas),
+    para que un fallo no bloquee una variante que sí corresponde a un usuario.
+    """
+    resumen = hashlib.sha256(identificador.encode('utf-8')).hexdigest()
+    return f'auth:sin_usuario:{resumen}'
+
+
 class UsuarioBackend(BaseBackend):
     """
     Custom authentication backend for SENA users
@@ -10,60 +25,60 @@ class UsuarioBackend(BaseBackend):
     """
 
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            # Try to find user by numero_documento first
-            usuario = Usuario.objects.get(numero_documento=username)
-
-            # Try to get or create Django user
-            django_user, created = User.objects.get_or_create(
-                username=username,
-                defaults={
-                    'first_name': usuario.nombres,
-                    'last_name': usuario.apellidos,
-                    'email': usuario.email,
-                    'is_active': usuario.estado == 'activo',
-                    'is_staff': usuario.tipo_usuario.nombre in ['administrador', 'coordinador'] if usuario.tipo_usuario else False
-                }
-            )
-
-            # If user was just created, set password
-            if created:
-                django_user.set_password(password)
-                django_user.save()
-
-            # Check password
-            if django_user.check_password(password) and django_user.is_active:
-                return django_user
-
-        except Usuario.DoesNotExist:
-            # Try to authenticate by email
-            try:
-                usuario = Usuario.objects.get(email=username)
-                django_user, created = User.objects.get_or_create(
-                    username=usuario.numero_documento,
-                    defaults={
-                        'first_name': usuario.nombres,
-                        'last_name': usuario.apellidos,
-                        'email': usuario.email,
-                        'is_active': usuario.estado == 'activo',
-                        'is_staff': usuario.tipo_usuario.nombre in ['administrador', 'coordinador'] if usuario.tipo_usuario else False
-                    }
-                )
-
-                if created:
-                    django_user.set_password(password)
-                    django_user.save()
-
-                if django_user.check_password(password) and django_user.is_active:
-                    return django_user
-
-            except Usuario.DoesNotExist:
-                pass
+        if not username or password is None:
+            return None
+
+        # Identificadores recientes sin Usuario: no se consulta la base
+        clave_negativa = clave_sin_usuario(username)
+        if cache.get(clave_negativa):
+            return None
+
+        # Documento o email en una sola consulta; si ambos coinciden con
+        # usuarios distintos gana el documento, como antes
+        usuario = Usuario.objects.select_related('tipo_usuario', 'user').filter(
+            Q(numero_documento=username) | Q(email=username)
+        ).order_by(
+            Case(When(numero_documento=username, then=Value(0)), default=Value(1), output_field=IntegerField())
+        ).first()
+
+        if usuario is None:
+            cache.set(clave_negativa, True, getattr(settings, 'AUTH_CACHE_NEGATIVO_SEGUNDOS', 60))
+            return None
+
+        django_user = usuario.user
+        if django_user is None:
+            django_user = self._vincular_user(usuario, password)
+
+        # Check password
+        if django_user.check_password(password) and django_user.is_active:
+            return django_user
 
         return None
 
+    def _vincular_user(self, usuario, password):
+        """Asocia (o crea) el User de Django del Usuario la primera vez que inicia sesión"""
+        django_user, created = User.objects.get_or_create(
+            username=usuario.numero_documento,
+            defaults={
+                'first_name': usuario.nombres,
+                'last_name': usuario.apellidos,
+                'email': usuario.email,
+                'is_active': usuario.estado == 'activo',
+                'is_staff': usuario.tipo_usuario.nombre in ['administrador', 'coordinador'] if usuario.tipo_usuario else False
+            }
+        )
+
+        # If user was just created, set password
+        if created:
+            django_user.set_password(password)
+            django_user.save()
+
+        usuario.user = django_user
+        usuario.save(update_fields=['user'])
+        return django_user
+
     def get_user(self, user_id):
         try:
             return User.objects.get(pk=user_id)
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
@@ -88,6 +88,10 @@ class Command(BaseCommand):
             django_instructor.set_password('instructor123')
             django_instructor.save()
 
+        # Link Django users to their Usuario profiles
+        Usuario.objects.filter(pk=admin_user.pk).update(user=django_admin)
+        Usuario.objects.filter(pk=test_user.pk).update(user=django_instructor)
+
         self.stdout.write(
             self.style.SUCCESS('Test users created successfully!')
         )
@@ -0,0 +1,101 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils.functional import SimpleLazyObject
+
+from .models import Usuario
+
+
+class CacheUsuarios:
+    """
+    Cache LRU en proceso de perfiles Usuario indexado por id del User de Django.
+    Las entradas expiran tras USUARIOS_CACHE_TTL segundos para acotar la
+    desactualización entre procesos; dentro del proceso se invalidan al
+    guardar o eliminar el Usuario.
+    """
+
+    def __init__(self, tamano_maximo=1024, ttl=300):
+        self.tamano_maximo = tamano_maximo
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, user_id):
+        """Devuelve (encontrado, usuario); usuario puede ser None si no tiene perfil"""
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is None:
+                return False, None
+            username, usuario, expira = entrada
+            if expira < time.monotonic():
+                del self._entradas[user_id]
+                return False, None
+            self._entradas.move_to_end(user_id)
+            return True, usuario
+
+    def guardar(self, user_id, username, usuario):
+        with self._lock:
+            self._entradas[user_id] = (username, usuario, time.monotonic() + self.ttl)
+            self._entradas.move_to_end(user_id)
+            while len(self._entradas) > self.tamano_maximo:
+                self._entradas.popitem(last=False)
+
+    def invalidar_usuario(self, usuario):
+        """Elimina las entradas del perfil o de su número de documento"""
+        with self._lock:
+            for user_id, (username, cacheado, _) in list(self._entradas.items()):
+                if username == usuario.numero_documento or user_id == usuario.user_id or (
+                    cacheado is not None and cacheado.pk == usuario.pk
+                ):
+                    del self._entradas[user_id]
+
+    def invalidar_user(self, user_id):
+        with self._lock:
+            self._entradas.pop(user_id, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_usuarios = CacheUsuarios(
+    tamano_maximo=getattr(settings, 'USUARIOS_CACHE_TAMANO', 1024),
+    ttl=getattr(settings, 'USUARIOS_CACHE_TTL', 300),
+)
+
+
+def obtener_usuario(user):
+    """Perfil Usuario asociado a un User autenticado, o None"""
+    if not user.is_authenticated:
+        return None
+
+    encontrado, usuario = cache_usuarios.obtener(user.pk)
+    if not encontrado:
+        usuario = Usuario.objects.select_related('tipo_usuario').filter(
+            Q(user_id=user.pk) | Q(numero_documento=user.username)
+        ).order_by(F('user_id').desc(nulls_last=True)).first()
+        cache_usuarios.guardar(user.pk, user.username, usuario)
+
+    # Copia para que las modificaciones de una petición no afecten al cache
+    return copy.copy(usuario) if usuario is not None else None
+
+
+class UsuarioMiddleware:
+    """
+    Agrega request.usuario: el perfil Usuario del usuario autenticado,
+    resuelto una sola vez por petición y solo si se utiliza.
+
+    request.usuario es perezoso y se evalúa como falso cuando el usuario no
+    tiene perfil; al asignarlo a una ForeignKey se usa `request.usuario or None`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.usuario = SimpleLazyObject(lambda: obtener_usuario(request.user))
+        return self.get_response(request)
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-17 22:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def vincular_users(apps, schema_editor):
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    User = apps.get_model('auth', 'User')
+
+    users = dict(User.objects.values_list('username', 'id'))
+    usuarios = []
+    for usuario in Usuario.objects.filter(user__isnull=True).only('id', 'numero_documento'):
+        user_id = users.get(usuario.numero_documento)
+        if user_id is not None:
+            usuario.user_id = user_id
+            usuarios.append(usuario)
+    Usuario.objects.bulk_update(usuarios, ['user'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='user',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usuario', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(vincular_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 23:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_usuario_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['-fecha_registro', 'id'], name='usuarios_us_fecha_r_d0f722_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 
@@ -63,6 +64,14 @@ class Usuario(models.Model):
     tema_oscuro = models.BooleanField(default=False)
     idioma = models.CharField(max_length=10, default='es')
 
+    # Cuenta de autenticación de Django asociada
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='usuario'
+    )
+
     # Metadatos
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -76,6 +85,7 @@ class Usuario(models.Model):
             models.Index(fields=['numero_documento']),
             models.Index(fields=['email']),
             models.Index(fields=['estado']),
+            models.Index(fields=['-fecha_registro', 'id']),
         ]
 
     def __str__(self):
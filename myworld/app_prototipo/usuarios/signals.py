@@ -0,0 +1,29 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Usuario
+from .middleware import cache_usuarios
+from .authentication import clave_sin_usuario
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_cache_usuario(sender, instance, **kwargs):
+    cache_usuarios.invalidar_usuario(instance)
+
+
+@receiver(post_save, sender=Usuario)
+def olvidar_busqueda_fallida(sender, instance, **kwargs):
+    # El documento o email pudo haber fallado un login reciente
+    cache.delete_many([
+        clave_sin_usuario(instance.numero_documento),
+        clave_sin_usuario(instance.email),
+    ])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_cache_user(sender, instance, **kwargs):
+    cache_usuarios.invalidar_user(instance.pk)
@@ -1,3 +1,120 @@
-from django.test import TestCase
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from .authentication import UsuarioBackend, clave_sin_usuario
+from .middleware import cache_usuarios, obtener_usuario
+from .models import TipoUsuario, Usuario
+
+CACHE_LOCAL = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def crear_usuario(tipo, **datos):
+    valores = {
+        'numero_documento': '1020304050',
+        'nombres': 'Ana',
+        'apellidos': 'Prueba',
+        'email': 'ana@sena.edu.co',
+        'tipo_usuario': tipo,
+        'centro_formacion': 'Centro Industrial',
+        'estado': 'activo',
+    }
+    valores.update(datos)
+    return Usuario.objects.create(**valores)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ObtenerUsuarioTests(TestCase):
+    def setUp(self):
+        cache_usuarios.limpiar()
+        self.addCleanup(cache_usuarios.limpiar)
+        self.tipo = TipoUsuario.objects.create(nombre='instructor')
+
+    def test_resuelve_por_vinculo_o_documento_y_reutiliza(self):
+        user = User.objects.create_user('1020304050')
+        usuario = crear_usuario(self.tipo)
+
+        self.assertEqual(obtener_usuario(user).pk, usuario.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(obtener_usuario(user).tipo_usuario.nombre, 'instructor')
+
+        # Cada petición recibe su propia copia
+        obtener_usuario(user).nombres = 'Modificado'
+        self.assertEqual(obtener_usuario(user).nombres, 'Ana')
+
+    def test_prefiere_el_perfil_vinculado(self):
+        user = User.objects.create_user('1020304050')
+        crear_usuario(self.tipo)
+        vinculado = crear_usuario(self.tipo, numero_documento='999', email='otra@sena.edu.co', user=user)
+        self.assertEqual(obtener_usuario(user).pk, vinculado.pk)
+
+    def test_sin_perfil_y_anonimo(self):
+        user = User.objects.create_user('sin-perfil')
+        self.assertIsNone(obtener_usuario(user))
+        with self.assertNumQueries(0):
+            self.assertIsNone(obtener_usuario(user))
+        self.assertIsNone(obtener_usuario(AnonymousUser()))
+
+    def test_guardar_el_perfil_invalida_el_cache(self):
+        user = User.objects.create_user('1020304050')
+        self.assertIsNone(obtener_usuario(user))
+
+        usuario = crear_usuario(self.tipo)
+        self.assertEqual(obtener_usuario(user).pk, usuario.pk)
+
+        usuario.nombres = 'Ana María'
+        usuario.save()
+        self.assertEqual(obtener_usuario(user).nombres, 'Ana María')
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class UsuarioBackendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.backend = UsuarioBackend()
+        self.tipo = TipoUsuario.objects.create(nombre='instructor')
+
+    def autenticar(self, username, password='clave-segura'):
+        return self.backend.authenticate(None, username=username, password=password)
+
+    def test_login_con_documento_y_email(self):
+        usuario = crear_usuario(self.tipo)
+        user = self.autenticar('1020304050')
+        self.assertIsNotNone(user)
+        usuario.refresh_from_db()
+        self.assertEqual(usuario.user_id, user.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.autenticar('ana@sena.edu.co'), user)
+        self.assertIsNone(self.autenticar('ana@sena.edu.co', 'otra'))
+
+    def test_documento_tiene_prioridad_sobre_email(self):
+        # El email de un usuario más reciente coincide con el documento de otro
+        dueno = crear_usuario(self.tipo, numero_documento='555', email='dueno@sena.edu.co')
+        crear_usuario(self.tipo, numero_documento='111', email='555')
+
+        user = self.autenticar('555')
+        self.assertIsNotNone(user)
+        dueno.refresh_from_db()
+        self.assertEqual(dueno.user_id, user.pk)
+
+    def test_identificador_desconocido_no_consulta_de_nuevo(self):
+        self.assertIsNone(self.autenticar('nadie@sena.edu.co'))
+        self.assertTrue(cache.get(clave_sin_usuario('nadie@sena.edu.co')))
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.autenticar('nadie@sena.edu.co'))
+
+    def test_variante_sin_usuario_no_bloquea_al_usuario_real(self):
+        crear_usuario(self.tipo)
+        self.assertIsNone(self.autenticar('ANA@sena.edu.co'))
+        self.assertIsNotNone(self.autenticar('ana@sena.edu.co'))
+
+    def test_registrar_usuario_limpia_el_fallo_cacheado(self):
+        self.assertIsNone(self.autenticar('ana@sena.edu.co'))
+        self.assertIsNone(self.autenticar('1020304050'))
+
+        crear_usuario(self.tipo)
+
+        self.assertIsNone(cache.get(clave_sin_usuario('ana@sena.edu.co')))
+        self.assertIsNone(cache.get(clave_sin_usuario('1020304050')))
+        self.assertIsNotNone(self.autenticar('ana@sena.edu.co'))
@@ -8,7 +8,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models import Q, Count
-from django.core.paginator import Paginator
+from components.paginacion import KeysetPaginator
 
 from .models import Usuario, TipoUsuario, SesionUsuario
 from .forms import (
@@ -35,8 +35,8 @@ def login_view(request):
                 login(request, user)
 
                 # Registrar sesión
-                try:
-                    usuario = Usuario.objects.get(numero_documento=username)
+                usuario = request.usuario
+                if usuario:
                     SesionUsuario.objects.create(
                         usuario=usuario,
                         token_sesion=request.session.session_key or '',
@@ -45,9 +45,7 @@ def login_view(request):
                     )
                     # Actualizar último acceso
                     usuario.ultimo_acceso = timezone.now()
-                    usuario.save()
-                except Usuario.DoesNotExist:
-                    pass
+                    usuario.save(update_fields=['ultimo_acceso'])
 
                 messages.success(request, f'¡Bienvenido!')
                 return redirect('usuarios:dashboard')
@@ -62,14 +60,11 @@ def login_view(request):
 @login_required
 def logout_view(request):
     """Vista de cierre de sesión"""
-    try:
-        usuario = Usuario.objects.get(numero_documento=request.user.username)
-        usuario.sesiones.filter(activa=True).update(
+    if request.usuario:
+        request.usuario.sesiones.filter(activa=True).update(
             fecha_fin=timezone.now(),
             activa=False
         )
-    except Usuario.DoesNotExist:
-        pass
 
     logout(request)
     messages.info(request, 'Has cerrado sesión correctamente')
@@ -87,15 +82,16 @@ def dashboard_view(request):
     maquinas_fuera_servicio = 0
 
     try:
-        from maquinaria.models import Maquina, AlertaMaquina
+        from maquinaria.estadisticas import FleetStats
 
         # Estadísticas principales
-        total_maquinas = Maquina.objects.count()
-        maquinas_operativas = Maquina.objects.filter(estado='operativa').count()
-        maquinas_mantenimiento = Maquina.objects.filter(estado='mantenimiento').count()
-        maquinas_disponibles = Maquina.objects.filter(estado='disponible').count()
-        maquinas_fuera_servicio = Maquina.objects.filter(estado='fuera_servicio').count()
-        alertas_activas = AlertaMaquina.objects.filter(estado='activa').count()
+        stats = FleetStats.calcular()
+        total_maquinas = stats.total_maquinas
+        maquinas_operativas = stats.maquinas_operativas
+        maquinas_mantenimiento = stats.maquinas_mantenimiento
+        maquinas_disponibles = stats.maquinas_disponibles
+        maquinas_fuera_servicio = stats.maquinas_fuera_servicio
+        alertas_activas = stats.alertas_activas
 
     except ImportError:
         pass
@@ -109,11 +105,11 @@ def dashboard_view(request):
         pass
 
     # Estadísticas adicionales
-    try:
-        usuario_actual = Usuario.objects.get(numero_documento=request.user.username)
+    usuario_actual = request.usuario or None
+    if usuario_actual is not None:
+        from maquinaria.models import Maquina
         maquinas_asignadas = Maquina.objects.filter(responsable=usuario_actual).count()
-    except Usuario.DoesNotExist:
-        usuario_actual = None
+    else:
         maquinas_asignadas = 0
 
     context = {
@@ -134,9 +130,8 @@ def dashboard_view(request):
 @login_required
 def perfil_view(request):
     """Vista del perfil de usuario"""
-    try:
-        usuario = Usuario.objects.get(numero_documento=request.user.username)
-    except Usuario.DoesNotExist:
+    usuario = request.usuario or None
+    if usuario is None:
         messages.error(request, 'Perfil de usuario no encontrado')
         return redirect('usuarios:dashboard')
 
@@ -184,9 +179,9 @@ def lista_usuarios_view(request):
         if centro_formacion:
             usuarios = usuarios.filter(centro_formacion__icontains=centro_formacion)
 
-    paginator = Paginator(usuarios.order_by('-fecha_registro'), 20)
-    page = request.GET.get('page')
-    usuarios = paginator.get_page(page)
+    paginator = KeysetPaginator(usuarios, ('-fecha_registro', 'id'), per_page=20,
+                                contar=request.GET.get('contar') == '1')
+    usuarios = paginator.get_page(request.GET.get('cursor'))
 
     return render(request, 'usuarios/lista_usuarios.html', {
         'form': form,
@@ -206,10 +201,7 @@ def crear_usuario_view(request):
         form = UsuarioForm(request.POST, request.FILES)
         if form.is_valid():
             usuario = form.save(commit=False)
-            try:
-                usuario.created_by = Usuario.objects.get(numero_documento=request.user.username)
-            except Usuario.DoesNotExist:
-                pass
+            usuario.created_by = request.usuario or None
             usuario.save()
             messages.success(request, f'Usuario {usuario.nombre_completo} creado correctamente')
             return redirect('usuarios:lista')